@@ -0,0 +1,124 @@
+"""
+Benchmark for businesses/crud.py::nearby_businesses (GET /businesses/nearby).
+
+Seeds a SQLite database with businesses clustered around a few hundred city
+centres and times k-nearest queries against the geohash index, next to a
+linear scan that computes the distance to every business. The indexed query
+reads only the cells around the query point, so its latency depends on local
+density rather than on the table size.
+
+Usage:
+    python bench_nearby.py --sizes 100000 1000000 --runs 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "businesses")
+
+
+def setup_database():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-nearby-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SERVICE_DIR)
+
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    return database, models
+
+
+def random_point(cities, rng: random.Random):
+    lat, lon = rng.choice(cities)
+    # Roughly a 20km wide city around each centre
+    return lat + rng.gauss(0, 0.05), lon + rng.gauss(0, 0.07)
+
+
+def seed_businesses(database, models, start: int, size: int, cities, rng: random.Random, batch: int = 50_000):
+    for offset in range(start, start + size, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, start + size)):
+            lat, lon = random_point(cities, rng)
+            rows.append({
+                "business_name": f"business {i}", "location": "bench", "address": f"{i} Main St",
+                "category": "food", "description": "benchmark row", "latitude": lat, "longitude": lon,
+            })
+        with database.engine.begin() as conn:
+            conn.execute(models.Business.__table__.insert(), rows)
+
+
+def linear_scan(database, models, geo, lat: float, lon: float, radius: float, k: int):
+    with database.engine.connect() as conn:
+        rows = conn.execute(
+            models.Business.__table__.select()
+            .with_only_columns(models.Business.business_id, models.Business.latitude, models.Business.longitude)
+            .where(models.Business.latitude.isnot(None))
+        )
+        hits = [(geo.haversine(lat, lon, blat, blon), business_id) for business_id, blat, blon in rows]
+    return sorted(hit for hit in hits if hit[0] <= radius)[:k]
+
+
+def time_calls(call, queries) -> dict:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        call(*query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[max(int(len(timings) * 0.95) - 1, 0)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--scan-runs", type=int, default=5, help="Linear scans are slow; time fewer of them")
+    parser.add_argument("--radius", type=float, default=1000, help="Meters")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--cities", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database, models = setup_database()
+    import crud
+    import geo
+
+    rng = random.Random(args.seed)
+    cities = [(rng.uniform(-50, 60), rng.uniform(-130, 150)) for _ in range(args.cities)]
+
+    print(f"{'rows':>10} {'method':>10} {'p50 ms':>10} {'p95 ms':>10}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        started = time.perf_counter()
+        seed_businesses(database, models, seeded, size - seeded, cities, rng)
+        seeded = size
+        print(f"Seeded {size} rows in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+        queries = [random_point(cities, rng) + (args.radius, args.k) for _ in range(args.runs)]
+
+        def indexed(lat, lon, radius, k):
+            db = database.SessionLocal()
+            try:
+                crud.nearby_businesses(db, lat, lon, radius, k)
+            finally:
+                db.close()
+
+        result = time_calls(indexed, queries)
+        print(f"{size:>10} {'geohash':>10} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f}")
+
+        result = time_calls(
+            lambda lat, lon, radius, k: linear_scan(database, models, geo, lat, lon, radius, k),
+            queries[:args.scan_runs],
+        )
+        print(f"{size:>10} {'scan':>10} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
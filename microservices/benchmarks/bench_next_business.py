@@ -0,0 +1,96 @@
+"""
+Benchmark for businesses/crud.py::get_next_business.
+
+Seeds a SQLite database with locations of growing size and times how long it
+takes to pick the next business. With sampling done in the database the
+latency should stay flat as the location grows.
+
+Usage:
+    python bench_next_business.py --sizes 1000 10000 100000 --runs 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "businesses")
+
+
+def setup_database():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-next-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SERVICE_DIR)
+
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    return database, models
+
+
+def seed_location(database, models, location: str, size: int):
+    rows = [
+        {
+            "business_name": f"{location} business {i}",
+            "location": location,
+            "address": f"{i} Main St",
+            "category": "food",
+            "description": "benchmark row",
+        }
+        for i in range(size)
+    ]
+    with database.engine.begin() as conn:
+        conn.execute(models.Business.__table__.insert(), rows)
+
+
+def time_next_business(database, crud, location: str, existing_ids, runs: int) -> dict:
+    timings = []
+    db = database.SessionLocal()
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            crud.get_next_business(db, location=location, existing_ids=existing_ids)
+            timings.append(time.perf_counter() - start)
+            db.expunge_all()
+    finally:
+        db.close()
+
+    timings.sort()
+    return {
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "max_ms": timings[-1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--existing", type=int, default=50, help="Number of ids to exclude per call")
+    args = parser.parse_args()
+
+    database, models = setup_database()
+    import crud
+
+    print(f"{'location size':>14} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10}")
+    for size in args.sizes:
+        location = f"city-{size}"
+        seed_location(database, models, location, size)
+
+        with database.engine.connect() as conn:
+            ids = [row[0] for row in conn.execute(
+                models.Business.__table__.select()
+                .with_only_columns(models.Business.business_id)
+                .where(models.Business.location == location)
+            )]
+        existing_ids = random.sample(ids, min(args.existing, len(ids)))
+
+        result = time_next_business(database, crud, location, existing_ids, args.runs)
+        print(f"{size:>14} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} {result['max_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
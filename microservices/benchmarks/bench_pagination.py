@@ -0,0 +1,79 @@
+"""
+Benchmark for paging through lists/crud.py::get_lists.
+
+Seeds a SQLite database with lists and compares the cost of fetching an early
+and a deep page with offset paging and with keyset (cursor) paging. Cursor
+pages should cost the same no matter how deep they are.
+
+Usage:
+    python bench_pagination.py --rows 200000 --page-size 10 --deep-page 10000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lists")
+
+
+def setup_database(rows: int):
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-pagination-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SERVICE_DIR)
+
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    batch = 50_000
+    with database.engine.begin() as conn:
+        for start in range(0, rows, batch):
+            conn.execute(models.List.__table__.insert(), [
+                {"user_id": 1, "location": "NYC", "date": date(2024, 6, 1), "description": f"list {i}"}
+                for i in range(start, min(start + batch, rows))
+            ])
+    return database
+
+
+def best_of(runs: int, fn) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--deep-page", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.deep_page * args.page_size > args.rows:
+        parser.error("--rows must cover --deep-page * --page-size")
+
+    database = setup_database(args.rows)
+    import crud
+    import pagination
+
+    db = database.SessionLocal()
+    try:
+        print(f"{'page':>8} {'offset ms':>12} {'cursor ms':>12}")
+        for page in (1, args.deep_page):
+            skip = (page - 1) * args.page_size
+            # The cursor a client would hold after reading the previous pages (ids start at 1)
+            cursor = pagination.encode_cursor(skip) if skip else ""
+            offset_ms = best_of(args.runs, lambda: crud.get_lists(db, skip=skip, limit=args.page_size))
+            cursor_ms = best_of(args.runs, lambda: crud.get_lists_page(db, cursor=cursor, limit=args.page_size))
+            print(f"{page:>8} {offset_ms:>12.3f} {cursor_ms:>12.3f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Benchmark for GET /businesses/search (businesses/search.py).
+
+Seeds a SQLite database with businesses of growing size and compares the
+full-text backends with the naive `LIKE '%term%'` scan they replace. The
+scan has to read every row, so its latency grows with the table; the
+indexed backends only touch the postings of the query terms.
+
+Usage:
+    python bench_search.py --sizes 10000 100000 1000000 --runs 100
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "businesses")
+
+# Searchable words, each used by roughly 1% of businesses; the rest of the text is filler
+WORDS = [
+    "pizza", "coffee", "vegan", "bakery", "sushi", "tacos", "books", "vintage", "garden", "noodle",
+    "brunch", "bistro", "grill", "market", "records", "yoga", "cinema", "museum", "tea", "ramen",
+]
+CATEGORIES = ["food", "coffee", "shopping", "arts", "fitness"]
+FILLER = [f"w{i}" for i in range(20_000)]
+QUERIES = ["pizza", "vegan bakery", "coffee books", "sushi", "ramen noodle"]
+
+
+def text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) if rng.random() < 0.01 else rng.choice(FILLER) for _ in range(words))
+
+
+def setup_database():
+    db_path = os.path.join(tempfile.mkdtemp(prefix="bench-search-"), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, SERVICE_DIR)
+
+    import database
+    import models
+
+    models.Base.metadata.create_all(bind=database.engine)
+    return database, models
+
+
+def seed_businesses(database, models, start: int, size: int, rng: random.Random):
+    rows = [
+        {
+            "business_name": text(rng, 2).title(),
+            "location": f"city-{rng.randrange(50)}",
+            "address": f"{i} Main St",
+            "category": rng.choice(CATEGORIES),
+            "description": text(rng, 12),
+        }
+        for i in range(start, start + size)
+    ]
+    with database.engine.begin() as conn:
+        conn.execute(models.Business.__table__.insert(), rows)
+
+
+def like_scan(database, models, query: str, limit: int = 20):
+    """
+    What search would be without an index: every term must appear in some searched
+    column, and ranking needs every match, so all rows are read.
+    """
+    from sqlalchemy import or_
+
+    db = database.SessionLocal()
+    try:
+        q = db.query(models.Business.business_id)
+        for term in query.split():
+            pattern = f"%{term}%"
+            q = q.filter(or_(
+                models.Business.business_name.ilike(pattern),
+                models.Business.category.ilike(pattern),
+                models.Business.description.ilike(pattern),
+            ))
+        return q.order_by(models.Business.business_name.ilike(f"%{query.split()[0]}%").desc()).limit(limit).all()
+    finally:
+        db.close()
+
+
+def time_calls(call, runs: int) -> dict:
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        call(QUERIES[i % len(QUERIES)])
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "p50_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database, models = setup_database()
+    import crud
+    import search
+
+    rng = random.Random(args.seed)
+    print(f"{'rows':>10} {'backend':>14} {'p50 ms':>10} {'p95 ms':>10} {'setup s':>8}")
+    seeded = 0
+    for size in sorted(args.sizes):
+        seed_businesses(database, models, seeded, size - seeded, rng)
+        seeded = size
+
+        backends = {}
+        for mode in ("auto", "memory"):
+            start = time.perf_counter()
+            backend = search.make_backend(database.engine, database.SessionLocal, mode=mode)
+            backends[backend.name] = (backend, time.perf_counter() - start)
+
+        for name, (backend, setup_seconds) in backends.items():
+            def call(query, backend=backend):
+                db = database.SessionLocal()
+                try:
+                    crud.search_businesses(db, backend, query, location=None, category=None, limit=20, offset=0)
+                finally:
+                    db.close()
+            result = time_calls(call, args.runs)
+            print(f"{size:>10} {name:>14} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} {setup_seconds:>8.2f}")
+
+        result = time_calls(lambda query: like_scan(database, models, query), args.runs)
+        print(f"{size:>10} {'like-scan':>14} {result['p50_ms']:>10.3f} {result['p95_ms']:>10.3f} {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Before/after benchmark for the tracing middleware.
+
+Runs the same small FastAPI app behind the previous BaseHTTPMiddleware-based
+tracing (four synchronous file log writes per request, full header dump and
+buffered body) and behind the pure ASGI `tracing.TracingMiddleware` (one JSON
+record handed to a background writer thread), and reports request latency.
+
+Usage:
+    python bench_tracing.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "businesses")
+sys.path.insert(0, SERVICE_DIR)
+
+import tracing  # noqa: E402
+
+legacy_logger = logging.getLogger("legacy_tracing")
+
+
+class LegacyTracingMiddleware(BaseHTTPMiddleware):
+    # The middleware as it was before the pure ASGI rewrite
+    async def dispatch(self, request: Request, call_next):
+        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
+        request.state.correlation_id = correlation_id
+
+        start_time = time.time()
+
+        legacy_logger.info(f"Request Start: {request.method} {request.url}")
+        legacy_logger.info(f"Correlation ID: {correlation_id} - {request.method} {request.url}")
+        legacy_logger.info(f"Headers: {request.headers}")
+        if request.method in ["POST", "PUT", "PATCH"]:
+            body = await request.body()
+            legacy_logger.info(f"Body: {body.decode('utf-8') if body else None}")
+
+        response = await call_next(request)
+        response.headers["X-Correlation-ID"] = correlation_id
+
+        process_time = time.time() - start_time
+        legacy_logger.info(
+            f"Request End: {request.method} {request.url} - "
+            f"Status Code: {response.status_code} - Time: {process_time:.4f}s"
+        )
+        return response
+
+
+def make_app(middleware, **options) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware, **options)
+
+    @app.post("/items")
+    async def create_item(request: Request):
+        await request.body()
+        return {"correlation_id": request.state.correlation_id}
+
+    return app
+
+
+async def drive(app: FastAPI, total: int, concurrency: int, payload: bytes) -> list:
+    timings = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = iter(range(total))
+
+        async def worker():
+            for _ in remaining:
+                start = time.perf_counter()
+                await client.post("/items", content=payload, headers={"Content-Type": "application/json"})
+                timings.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(timings)
+
+
+def summarize(name: str, timings: list, elapsed: float):
+    def pct(p):
+        return timings[min(int(len(timings) * p), len(timings) - 1)] * 1000
+
+    print(
+        f"{name:<8} {len(timings) / elapsed:>10.0f} req/s "
+        f"p50 {pct(0.50):>7.3f} ms  p95 {pct(0.95):>7.3f} ms  p99 {pct(0.99):>7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--body-bytes", type=int, default=1024)
+    parser.add_argument("--sample-rate", type=float, default=tracing.TRACE_SAMPLE_RATE)
+    args = parser.parse_args()
+
+    log_dir = tempfile.mkdtemp(prefix="bench-tracing-")
+    payload = b'{"data": "' + b"x" * args.body_bytes + b'"}'
+
+    # Before: synchronous file writes on the event loop thread
+    legacy_handler = logging.FileHandler(os.path.join(log_dir, "legacy.log"))
+    legacy_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    legacy_logger.addHandler(legacy_handler)
+    legacy_logger.setLevel(logging.INFO)
+    legacy_logger.propagate = False
+
+    # After: JSON records queued to a background writer thread
+    tracing.configure_logging(os.path.join(log_dir, "tracing.log"), console=False)
+
+    results = {}
+    for name, app in (
+        ("before", make_app(LegacyTracingMiddleware)),
+        ("after", make_app(tracing.TracingMiddleware, sample_rate=args.sample_rate)),
+    ):
+        start = time.perf_counter()
+        timings = asyncio.run(drive(app, args.requests, args.concurrency, payload))
+        results[name] = (timings, time.perf_counter() - start)
+
+    tracing.stop_logging()
+    for name, (timings, elapsed) in results.items():
+        summarize(name, timings, elapsed)
+
+
+if __name__ == "__main__":
+    main()
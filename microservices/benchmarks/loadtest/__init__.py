@@ -0,0 +1,8 @@
+"""
+Reproducible load test for the microservices.
+
+Seeds local SQLite databases, runs the services in-process (composite calls
+reach the other services through ASGI transports, the weather upstream is a
+local stub) and drives each endpoint with a concurrent async load generator.
+Results are written as JSON so runs can be compared; see `python -m loadtest -h`.
+"""
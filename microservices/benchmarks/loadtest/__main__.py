@@ -0,0 +1,160 @@
+"""
+Seeds SQLite databases, runs the services in-process and reports throughput
+and p50/p95/p99 latency per endpoint as JSON.
+
+Usage (from the benchmarks directory):
+    python -m loadtest --output results.json
+    python -m loadtest --businesses 1000000 --lists 200000 --requests 5000 --concurrency 64
+    python -m loadtest --scenarios businesses. --baseline results.json --max-regression 25
+
+With --baseline, p95 latency is compared per scenario and the exit status is 1
+if any scenario got slower than --max-regression percent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from loadtest import loadgen, scenarios, seed, services
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=services.SERVICES_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_scenarios(stack: services.ServiceStack, selected: list, context: scenarios.Context, args) -> dict:
+    results = {}
+    for scenario in selected:
+        transport = stack.transport(scenario.service)
+        async with httpx.AsyncClient(transport=transport, base_url=f"http://{scenario.service}.local") as client:
+            if args.warmup:
+                await loadgen.drive(client, scenario.requests(context, 0, args.warmup), args.concurrency)
+            summary = await loadgen.drive(
+                client, scenario.requests(context, args.warmup, args.requests), args.concurrency
+            )
+        results[scenario.name] = {"service": scenario.service, "kind": scenario.kind, **summary}
+        print(
+            f"{scenario.name:<40} {summary['throughput_rps']:>9} req/s  "
+            f"p50 {summary['latency_ms']['p50']:>8} ms  p95 {summary['latency_ms']['p95']:>8} ms  "
+            f"p99 {summary['latency_ms']['p99']:>8} ms  errors {summary['errors']}",
+            file=sys.stderr,
+        )
+    return results
+
+
+async def run(args, workdir: str, selected: list) -> dict:
+    stack = services.ServiceStack(
+        os.path.join(workdir, "main.db"), os.path.join(workdir, "composite.db"), workdir
+    )
+    spec = seed.SeedSpec(
+        users=args.users, businesses=args.businesses, lists=args.lists,
+        itineraries_per_list=args.itineraries_per_list, locations=args.locations, seed=args.seed,
+    )
+    started = time.perf_counter()
+    seeded = {
+        "main": seed.seed_main(os.path.join(workdir, "main.db"), spec),
+        "composite": seed.seed_composite(os.path.join(workdir, "composite.db"), spec),
+    }
+    seed_seconds = round(time.perf_counter() - started, 2)
+    print(f"Seeded in {seed_seconds}s: {json.dumps(seeded)}", file=sys.stderr)
+
+    context = scenarios.Context(
+        spec=spec,
+        total=args.warmup + args.requests,
+        encode_cursor=stack.services["lists"].modules["pagination"].encode_cursor,
+    )
+    async with stack:
+        results = await run_scenarios(stack, selected, context, args)
+    return {"seeded": seeded, "seed_seconds": seed_seconds, "scenarios": results}
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    """
+    Returns a line per scenario whose p95 grew by more than `max_regression` percent.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None or not previous["latency_ms"]["p95"]:
+            continue
+        change = (current["latency_ms"]["p95"] / previous["latency_ms"]["p95"] - 1) * 100
+        print(f"{name:<40} p95 {previous['latency_ms']['p95']:>8} -> {current['latency_ms']['p95']:>8} ms "
+              f"({change:+.1f}%)", file=sys.stderr)
+        if change > max_regression:
+            regressions.append(f"{name}: p95 up {change:.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--businesses", type=int, default=20_000)
+    parser.add_argument("--lists", type=int, default=5_000)
+    parser.add_argument("--itineraries-per-list", type=int, default=10)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=1_000, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=100, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--scenarios", default="", help="Comma-separated name prefixes to run (default: all but opt-in scenarios)")
+    parser.add_argument("--workdir", help="Where databases and logs go (default: a new temp directory)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="Previous JSON report to compare p95 latency against")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="Allowed p95 increase in percent")
+    args = parser.parse_args()
+
+    total = args.warmup + args.requests
+    if args.lists < 3 * total or args.businesses < 3 * total:
+        parser.error("--lists and --businesses must be at least 3x (--warmup + --requests) for the delete pools")
+
+    prefixes = [prefix.strip() for prefix in args.scenarios.split(",") if prefix.strip()]
+    selected = scenarios.select(prefixes)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="loadtest-")
+    os.makedirs(workdir, exist_ok=True)
+    for name in ("main.db", "composite.db"):
+        if os.path.exists(os.path.join(workdir, name)):
+            parser.error(f"{workdir} already has {name}; use an empty --workdir so runs start from the same data")
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "workdir")},
+        },
+        **asyncio.run(run(args, workdir, selected)),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
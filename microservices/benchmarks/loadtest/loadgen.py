@@ -0,0 +1,71 @@
+"""
+Closed-loop async load generator.
+
+`concurrency` workers share one iterator of requests; each sends its next
+request as soon as the previous one completes. Latency is measured per request
+around the client call.
+"""
+import asyncio
+import math
+import time
+from collections import Counter
+from typing import Iterator, List
+
+import httpx
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(p / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(timings: List[float], status_codes: Counter, errors: int, elapsed: float) -> dict:
+    timings = sorted(timings)
+    to_ms = lambda seconds: round(seconds * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "status_codes": dict(sorted(status_codes.items())),
+        "throughput_rps": round(len(timings) / elapsed, 1) if elapsed else None,
+        "latency_ms": {
+            "p50": to_ms(percentile(timings, 50)),
+            "p95": to_ms(percentile(timings, 95)),
+            "p99": to_ms(percentile(timings, 99)),
+            "mean": to_ms(sum(timings) / len(timings)) if timings else 0.0,
+            "max": to_ms(timings[-1]) if timings else 0.0,
+        },
+    }
+
+
+async def drive(client: httpx.AsyncClient, requests: Iterator[dict], concurrency: int) -> dict:
+    """
+    Sends every request from `requests` (keyword arguments for
+    `client.request`) and returns the summary. Responses with status >= 400
+    and exceptions count as errors.
+    """
+    timings = []
+    status_codes = Counter()
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for request in requests:
+            start = time.perf_counter()
+            try:
+                response = await client.request(**request)
+                status_codes[str(response.status_code)] += 1
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception as e:
+                status_codes[type(e).__name__] += 1
+                errors += 1
+            timings.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(timings, status_codes, errors, time.perf_counter() - started)
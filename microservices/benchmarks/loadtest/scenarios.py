@@ -0,0 +1,234 @@
+"""
+One scenario per endpoint.
+
+A scenario turns (request index, rng) into the keyword arguments of one
+`httpx.AsyncClient.request` call. Read scenarios run first, then writes, then
+deletes, each consuming its own reserved range of seeded rows, so a run with
+the same arguments always sends the same requests against the same data.
+"""
+import json
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Iterator
+
+from loadtest import seed
+
+READ, WRITE, DELETE = "read", "write", "delete"
+
+
+@dataclass
+class Context:
+    spec: seed.SeedSpec
+    total: int  # Requests per scenario, warmup included
+    encode_cursor: Callable[[int], str]
+
+
+@dataclass
+class Scenario:
+    name: str
+    service: str
+    kind: str
+    build: Callable[[Context, int, random.Random], dict]
+    default: bool = True  # Opt-in scenarios only run when --scenarios names them
+
+    def requests(self, context: Context, start: int, count: int) -> Iterator[dict]:
+        rng = random.Random(f"{context.spec.seed}-{self.name}-{start}")
+        for index in range(start, start + count):
+            yield self.build(context, index, rng)
+
+
+def random_business(context: Context, rng: random.Random) -> int:
+    # The top of the id range is reserved for delete_business
+    return rng.randint(1, context.spec.businesses - context.total)
+
+
+def random_list(context: Context, rng: random.Random) -> int:
+    # The top of the list range is reserved for delete_list, the bottom for delete_itinerary
+    return rng.randint(context.total + 1, context.spec.lists - context.total)
+
+
+def random_day(rng: random.Random) -> str:
+    return (date(2024, 6, 1) + timedelta(days=rng.randint(0, 30))).isoformat()
+
+
+def business_fields(index: int, rng: random.Random, context: Context) -> dict:
+    location = context.spec.location(rng.randrange(context.spec.locations))
+    return {
+        "business_name": f"Load test business {index}",
+        "location": location,
+        "address": f"{index} Load St, {location}",
+        "category": rng.choice(seed.CATEGORIES),
+        "description": "Created by the load test",
+    }
+
+
+def seeded_itinerary(context: Context, index: int) -> tuple:
+    """
+    The index-th seeded (list_id, business_id) pair, walking lists from the bottom.
+    """
+    per_list = min(context.spec.itineraries_per_list, context.spec.businesses)
+    list_id = index // per_list + 1
+    return list_id, seed.list_business_ids(context.spec, list_id)[index % per_list]
+
+
+def new_itinerary(context: Context, index: int) -> tuple:
+    """
+    A (list_id, business_id) pair that is neither seeded nor produced for another index.
+    """
+    list_id = random_list(context, random.Random(f"{context.spec.seed}-add-{index}"))
+    existing = set(seed.list_business_ids(context.spec, list_id))
+    # Walk down from the top of the business ids; index keeps pairs unique
+    business_id = context.spec.businesses - index
+    while business_id in existing:
+        business_id -= context.total
+    return list_id, business_id
+
+
+def free_slot(first_hour: int, last_hour: int, index: int) -> str:
+    """
+    A one-minute slot between `first_hour` and `last_hour`, distinct per request
+    index (until the range runs out) and outside the seeded itineraries
+    (09:00-17:00), so composite writes don't conflict.
+    """
+    minute = first_hour * 60 + index % ((last_hour - first_hour) * 60)
+    return f"{minute // 60:02d}:{minute % 60:02d}-{(minute + 1) // 60:02d}:{(minute + 1) % 60:02d}"
+
+
+SCENARIOS = [
+    # Businesses service
+    Scenario("businesses.get_business", "businesses", READ, lambda c, i, rng: {
+        "method": "GET", "url": f"/businesses/{random_business(c, rng)}",
+    }),
+    Scenario("businesses.get_businesses_batch", "businesses", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/businesses",
+        "params": {"ids": ",".join(str(random_business(c, rng)) for _ in range(50))},
+    }),
+    Scenario("businesses.get_next_business", "businesses", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/businesses/next/",
+        "params": {
+            "location": c.spec.location(rng.randrange(c.spec.locations)),
+            "existing_ids": ",".join(str(random_business(c, rng)) for _ in range(10)),
+        },
+    }),
+    Scenario("businesses.search", "businesses", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/businesses/search",
+        "params": {"q": rng.choice(seed.CATEGORIES), "location": c.spec.location(rng.randrange(c.spec.locations))},
+    }),
+    Scenario("businesses.create_business", "businesses", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": "/businesses/", "params": business_fields(i, rng, c),
+    }),
+    Scenario("businesses.update_business", "businesses", WRITE, lambda c, i, rng: {
+        "method": "PUT", "url": f"/businesses/{random_business(c, rng)}", "json": business_fields(i, rng, c),
+    }),
+    Scenario("businesses.bulk_import", "businesses", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": "/businesses/bulk",
+        "headers": {"Content-Type": "application/x-ndjson"},
+        "content": "\n".join(json.dumps(business_fields(i * 100 + n, rng, c)) for n in range(100)).encode(),
+    }),
+
+    # Lists service
+    Scenario("lists.get_lists_offset", "lists", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/lists/", "params": {"skip": rng.randrange(c.spec.lists - 10), "limit": 10},
+    }),
+    Scenario("lists.get_lists_cursor", "lists", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/lists/",
+        "params": {"cursor": c.encode_cursor(rng.randrange(1, c.spec.lists - 10)), "limit": 10},
+    }),
+    Scenario("lists.get_itineraries", "lists", READ, lambda c, i, rng: {
+        "method": "GET", "url": f"/lists/{random_list(c, rng)}/itineraries/", "params": {"cursor": "", "limit": 50},
+    }),
+    Scenario("lists.get_weather", "lists", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/weather/",
+        "params": {"location": c.spec.location(rng.randrange(c.spec.locations)), "date": random_day(rng)},
+    }),
+    Scenario("lists.get_weather_batch", "lists", READ, lambda c, i, rng: {
+        "method": "POST", "url": "/weather/batch",
+        "json": {"items": [
+            {"location": c.spec.location(rng.randrange(c.spec.locations)), "date": random_day(rng)} for _ in range(20)
+        ]},
+    }),
+    Scenario("lists.export_itineraries", "lists", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/export/itineraries", "params": {"list_id": random_list(c, rng)},
+        "headers": {"Accept-Encoding": "gzip"},
+    }),
+    Scenario("lists.create_list", "lists", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": "/lists/",
+        "params": {
+            "user_id": rng.randint(1, c.spec.users), "location": c.spec.location(rng.randrange(c.spec.locations)),
+            "date": random_day(rng), "description": f"Load test list {i}",
+        },
+    }),
+    Scenario("lists.add_itinerary", "lists", WRITE, lambda c, i, rng: (lambda pair: {
+        "method": "POST", "url": f"/lists/{pair[0]}/itineraries/", "params": {"business_id": pair[1]},
+    })(new_itinerary(c, i))),
+    Scenario("lists.add_itineraries_bulk", "lists", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": f"/lists/{random_list(c, rng)}/itineraries/bulk",
+        "json": {"business_ids": [random_business(c, rng) for _ in range(30)]},
+    }),
+    Scenario("lists.update_list_description", "lists", WRITE, lambda c, i, rng: {
+        "method": "PUT", "url": f"/lists/{random_list(c, rng)}/description", "params": {"description": f"Updated {i}"},
+    }),
+    Scenario("lists.delete_itinerary", "lists", DELETE, lambda c, i, rng: (lambda pair: {
+        "method": "DELETE", "url": f"/lists/{pair[0]}/itineraries/{pair[1]}",
+    })(seeded_itinerary(c, i))),
+    # Runs after delete_itinerary: deleting a business also deletes its itineraries
+    Scenario("businesses.delete_business", "businesses", DELETE, lambda c, i, rng: {
+        "method": "DELETE", "url": f"/businesses/{c.spec.businesses - i}",
+    }),
+    Scenario("lists.delete_list", "lists", DELETE, lambda c, i, rng: {
+        "method": "DELETE", "url": f"/lists/{c.spec.lists - i}",
+    }),
+
+    # Composite (orchestrator) service
+    Scenario("composite.read_itineraries", "composite", READ, lambda c, i, rng: {
+        "method": "GET", "url": f"/itineraries/{random_list(c, rng)}",
+        "params": {"day": rng.choice(seed.DAYS)} if i % 2 else {},
+    }),
+    # The orchestrator fetches queue candidates with GET <business url>?address=&limit=, which the
+    # businesses service doesn't serve; these only report errors, so they're left out unless named
+    Scenario("composite.queue_start", "composite", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": "/queue/start/",
+        "params": {"address": c.spec.location(rng.randrange(c.spec.locations)), "session_id": f"load-{i % 100}"},
+    }, default=False),
+    Scenario("composite.queue_next_business", "composite", WRITE, lambda c, i, rng: {
+        "method": "GET", "url": "/queue/next-business/", "params": {"session_id": f"load-{i % 100}"},
+    }, default=False),
+    Scenario("composite.create_itinerary", "composite", WRITE, lambda c, i, rng: {
+        "method": "POST", "url": "/itineraries/",
+        "json": {
+            "list_id": random_list(c, rng), "business_id": random_business(c, rng),
+            "day": rng.choice(seed.DAYS), "times": free_slot(17, 24, i),
+        },
+    }),
+    Scenario("composite.update_itinerary_times", "composite", WRITE, lambda c, i, rng: {
+        "method": "PUT", "url": f"/itineraries/{rng.randint(1, c.spec.lists * c.spec.itineraries_per_list // 2)}/times",
+        "params": {"times": free_slot(0, 9, i)},
+    }),
+    Scenario("composite.delete_itinerary", "composite", DELETE, lambda c, i, rng: {
+        "method": "DELETE", "url": f"/itineraries/{c.spec.lists * min(c.spec.itineraries_per_list, c.spec.businesses) - i}",
+    }),
+
+    # Composite fan-out service
+    Scenario("composite2.view_full_list", "composite2", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/composite/view_full_list", "params": {"list_id": random_list(c, rng)},
+    }),
+    Scenario("composite2.serve_next", "composite2", READ, lambda c, i, rng: {
+        "method": "GET", "url": "/composite/serve_next",
+        "params": {"list_id": random_list(c, rng), "location": c.spec.location(rng.randrange(c.spec.locations))},
+    }),
+]
+
+KIND_ORDER = {READ: 0, WRITE: 1, DELETE: 2}
+
+
+def select(prefixes: list) -> list:
+    """
+    The scenarios whose names start with any of `prefixes` (every default
+    scenario when there are none), reads first, then writes, then deletes.
+    """
+    chosen = (
+        s for s in SCENARIOS
+        if any(s.name.startswith(prefix) for prefix in prefixes) or (not prefixes and s.default)
+    )
+    return sorted(chosen, key=lambda s: KIND_ORDER[s.kind])
@@ -0,0 +1,156 @@
+"""
+Bulk seeding of the service databases.
+
+Rows are generated from a seeded random.Random, so the same arguments always
+produce the same data. Inserts go through sqlite3 executemany in large
+transactions with journaling relaxed, which loads millions of rows in seconds;
+the schema itself (tables and indexes) comes from each service's models.
+"""
+import random
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterator
+
+CATEGORIES = ("restaurant", "cafe", "museum", "park", "bar", "gallery", "theater", "market")
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+BATCH_SIZE = 50_000
+
+
+@dataclass(frozen=True)
+class SeedSpec:
+    users: int = 1_000
+    businesses: int = 20_000
+    lists: int = 5_000
+    itineraries_per_list: int = 10
+    locations: int = 50
+    seed: int = 42
+
+    def location(self, index: int) -> str:
+        return f"City {index % self.locations}"
+
+
+def _batched(rows: Iterator[tuple]) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]) -> int:
+    count = 0
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+        count += len(batch)
+    return count
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("BEGIN")
+    return conn
+
+
+def _finish(conn: sqlite3.Connection):
+    conn.execute("COMMIT")
+    conn.execute("ANALYZE")
+    # WAL lets the services read while another request writes
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+
+def list_business_ids(spec: SeedSpec, list_id: int) -> list:
+    """
+    The business ids seeded into a list; derived from the seed so callers can
+    reproduce them without querying.
+    """
+    rng = random.Random(f"{spec.seed}-list-{list_id}")
+    count = min(spec.itineraries_per_list, spec.businesses)
+    return sorted(rng.sample(range(1, spec.businesses + 1), count))
+
+
+def seed_main(path: str, spec: SeedSpec) -> dict:
+    """
+    Fills the database shared by the businesses and lists services.
+    """
+    rng = random.Random(spec.seed)
+    conn = _connect(path)
+    counts = {}
+    counts["users"] = _insert(
+        conn,
+        "INSERT INTO users (user_id, first_name, middle_name, last_name, email) VALUES (?, ?, NULL, ?, ?)",
+        ((i, f"First{i}", f"Last{i}", f"user{i}@example.com") for i in range(1, spec.users + 1)),
+    )
+    counts["businesses"] = _insert(
+        conn,
+        "INSERT INTO businesses (business_id, business_name, location, address, category, description) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i,
+                f"Business {i}",
+                spec.location(i),
+                f"{rng.randint(1, 9999)} Main St, {spec.location(i)}",
+                rng.choice(CATEGORIES),
+                f"Seeded business number {i}",
+            )
+            for i in range(1, spec.businesses + 1)
+        ),
+    )
+    start = date(2024, 6, 1)
+    counts["lists"] = _insert(
+        conn,
+        "INSERT INTO lists (list_id, user_id, location, date, description) VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                i,
+                rng.randint(1, spec.users),
+                spec.location(i),
+                (start + timedelta(days=rng.randint(0, 90))).isoformat(),
+                f"Seeded list {i}",
+            )
+            for i in range(1, spec.lists + 1)
+        ),
+    )
+    counts["itineraries"] = _insert(
+        conn,
+        "INSERT INTO itineraries (list_id, business_id) VALUES (?, ?)",
+        (
+            (list_id, business_id)
+            for list_id in range(1, spec.lists + 1)
+            for business_id in list_business_ids(spec, list_id)
+        ),
+    )
+    _finish(conn)
+    return counts
+
+
+def seed_composite(path: str, spec: SeedSpec) -> dict:
+    """
+    Fills the composite service's database (its own lists and timed itineraries).
+    """
+    rng = random.Random(f"{spec.seed}-composite")
+    conn = _connect(path)
+    counts = {}
+    counts["lists"] = _insert(
+        conn,
+        "INSERT INTO lists (list_id, creator_id) VALUES (?, ?)",
+        ((i, rng.randint(1, spec.users)) for i in range(1, spec.lists + 1)),
+    )
+    counts["itineraries"] = _insert(
+        conn,
+        "INSERT INTO itineraries (list_id, business_id, day, times) VALUES (?, ?, ?, ?)",
+        (
+            (list_id, business_id, DAYS[index % len(DAYS)], f"{9 + index % 8:02d}:00-{10 + index % 8:02d}:00")
+            for list_id in range(1, spec.lists + 1)
+            for index, business_id in enumerate(list_business_ids(spec, list_id))
+        ),
+    )
+    _finish(conn)
+    return counts
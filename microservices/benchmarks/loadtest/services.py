@@ -0,0 +1,125 @@
+"""
+Runs the services in one process.
+
+Each service is a directory of flat modules imported by bare name (`crud`,
+`database`, `models`, ...), so the names collide between services. A service
+is loaded by importing its `main` with its directory first on sys.path; its
+modules are then removed from sys.modules so the next service gets its own
+copies. The loaded modules stay reachable through the app and `Service.modules`.
+"""
+import importlib
+import os
+import sys
+from contextlib import AsyncExitStack
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import httpx
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+SERVICES_DIR = os.path.abspath(SERVICES_DIR)
+
+# Base URLs handed to the composite clients; requests never leave the process
+SERVICE_URLS = {
+    "business": "http://businesses.local",
+    "list": "http://lists.local",
+}
+
+
+@dataclass
+class Service:
+    name: str
+    app: object
+    modules: dict = field(default_factory=dict)
+
+
+def load_service(name: str, database_url: str, workdir: str) -> Service:
+    service_dir = os.path.join(SERVICES_DIR, name)
+    os.environ["DATABASE_URL"] = database_url
+    before = set(sys.modules)
+    cwd = os.getcwd()
+    sys.path.insert(0, service_dir)
+    os.chdir(workdir)  # Services open log files relative to the working directory
+    try:
+        main = importlib.import_module("main")
+    finally:
+        os.chdir(cwd)
+        sys.path.remove(service_dir)
+        loaded = {
+            module_name: sys.modules[module_name]
+            for module_name in set(sys.modules) - before
+            if os.path.dirname(os.path.abspath(getattr(sys.modules[module_name], "__file__", None) or "")) == service_dir
+        }
+        for module_name in loaded:
+            del sys.modules[module_name]
+
+    service = Service(name, main.app, loaded)
+    if "models" in loaded and "database" in loaded:
+        loaded["models"].Base.metadata.create_all(bind=loaded["database"].engine)
+    return service
+
+
+def stub_weather_client() -> httpx.AsyncClient:
+    """
+    Stands in for Nominatim and open-meteo with fixed, instant answers.
+    """
+
+    def handler(request: httpx.Request):
+        if "start_date" not in request.url.params:
+            return httpx.Response(200, json=[{"lat": "40.7128", "lon": "-74.0060"}])
+        start = date.fromisoformat(request.url.params["start_date"])
+        end = date.fromisoformat(request.url.params["end_date"])
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        return httpx.Response(200, json={
+            "daily": {"time": days, "temperature_2m_max": [25.0] * len(days), "temperature_2m_min": [15.0] * len(days)}
+        })
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class ServiceStack:
+    """
+    Loads the services, runs their lifespans and wires composite clients and the
+    weather cache to in-process transports. Use as an async context manager.
+    """
+
+    def __init__(self, main_db: str, composite_db: str, workdir: str):
+        self.workdir = workdir
+        self.services = {
+            "businesses": load_service("businesses", f"sqlite:///{main_db}", workdir),
+            "lists": load_service("lists", f"sqlite:///{main_db}", workdir),
+            "composite": load_service("composite", f"sqlite:///{composite_db}", workdir),
+            "composite2": load_service("composite2", f"sqlite:///{composite_db}", workdir),
+        }
+        self._stack = AsyncExitStack()
+
+    def transport(self, name: str) -> httpx.ASGITransport:
+        return httpx.ASGITransport(app=self.services[name].app)
+
+    async def __aenter__(self):
+        for service in self.services.values():
+            await self._stack.enter_async_context(service.app.router.lifespan_context(service.app))
+
+        # Every service reconfigured the root logger on import; keep one quiet writer
+        tracing_modules = [s.modules["tracing"] for s in self.services.values() if "tracing" in s.modules]
+        for tracing in tracing_modules:
+            tracing.stop_logging()
+        if tracing_modules:
+            tracing_modules[0].configure_logging(os.path.join(self.workdir, "tracing.log"), console=False)
+
+        transports = {"business": self.transport("businesses"), "list": self.transport("lists")}
+        for name in ("composite", "composite2"):
+            clients = self.services[name].modules["clients"]
+            await clients.close_clients()
+            clients.start_clients(SERVICE_URLS, transports=transports)
+
+        weather_cache = self.services["lists"].modules["weather_cache"]
+        await weather_cache.close()
+        weather_cache.start(stub_weather_client())
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._stack.aclose()
+        for service in self.services.values():
+            if "tracing" in service.modules:
+                service.modules["tracing"].stop_logging()
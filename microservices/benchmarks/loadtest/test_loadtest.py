@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+from collections import Counter
+
+from loadtest import __main__ as cli
+from loadtest import loadgen, scenarios, seed
+
+BENCHMARKS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def context(**spec):
+    return scenarios.Context(spec=seed.SeedSpec(**spec), total=20, encode_cursor=str)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+
+    assert loadgen.percentile(values, 50) == 50.0
+    assert loadgen.percentile(values, 99) == 99.0
+    assert loadgen.percentile([], 95) == 0.0
+
+
+def test_summary_counts_requests_and_errors():
+    summary = loadgen.summarize([0.002, 0.001, 0.003], Counter({"200": 2, "500": 1}), 1, 0.5)
+
+    assert summary["requests"] == 3
+    assert summary["throughput_rps"] == 6.0
+    assert summary["latency_ms"]["p50"] == 2.0
+
+
+def test_opt_in_scenarios_only_run_when_named():
+    default = [s.name for s in scenarios.select([])]
+    named = [s.name for s in scenarios.select(["composite.queue"])]
+
+    assert "composite.queue_start" not in default
+    assert "businesses.get_business" in default
+    assert named == ["composite.queue_start", "composite.queue_next_business"]
+
+
+def test_selection_runs_reads_then_writes_then_deletes():
+    kinds = [s.kind for s in scenarios.select(["lists."])]
+
+    assert kinds == sorted(kinds, key=scenarios.KIND_ORDER.get)
+    assert kinds[0] == scenarios.READ and kinds[-1] == scenarios.DELETE
+
+
+def test_requests_are_reproducible():
+    scenario = next(s for s in scenarios.SCENARIOS if s.name == "composite.create_itinerary")
+
+    first = list(scenario.requests(context(businesses=100, lists=100), 0, 5))
+    again = list(scenario.requests(context(businesses=100, lists=100), 0, 5))
+
+    assert first == again
+    assert len({request["json"]["times"] for request in first}) == 5
+
+
+def test_seeded_list_membership_is_derived_from_the_seed():
+    spec = seed.SeedSpec(businesses=50, itineraries_per_list=5)
+
+    assert seed.list_business_ids(spec, 3) == seed.list_business_ids(spec, 3)
+    assert len(set(seed.list_business_ids(spec, 3))) == 5
+    assert seed.list_business_ids(spec, 3) != seed.list_business_ids(seed.SeedSpec(businesses=50, seed=7), 3)
+
+
+def test_compare_reports_p95_regressions():
+    def report(p95):
+        return {"scenarios": {"a": {"latency_ms": {"p95": p95}}}}
+
+    assert cli.compare(report(12.0), report(10.0), max_regression=25) == []
+    assert cli.compare(report(13.0), report(10.0), max_regression=25) == ["a: p95 up 30.0%"]
+
+
+def test_small_run_covers_every_default_scenario(tmp_path):
+    output = tmp_path / "results.json"
+    subprocess.run(
+        [sys.executable, "-m", "loadtest", "--users", "10", "--businesses", "60", "--lists", "60",
+         "--requests", "10", "--warmup", "0", "--concurrency", "4",
+         "--workdir", str(tmp_path / "work"), "--output", str(output)],
+        cwd=BENCHMARKS_DIR, check=True, capture_output=True,
+    )
+    results = json.loads(output.read_text())
+
+    assert sorted(results["scenarios"]) == sorted(s.name for s in scenarios.select([]))
+    for name, result in results["scenarios"].items():
+        assert result["requests"] == 10, name
+        # Exceptions are counted under their class name
+        assert all(code.isdigit() and not code.startswith("5") for code in result["status_codes"]), name
@@ -0,0 +1,63 @@
+"""
+Streams a CSV or NDJSON file of businesses to the bulk import endpoint.
+
+Usage:
+    python bulk_import.py businesses.csv
+    python bulk_import.py businesses.ndjson --url http://127.0.0.1:8002 --batch-size 5000
+
+CSV files need a header row with the BusinessCreate field names
+(business_name, location, address, category, description).
+"""
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+CONTENT_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CHUNK_SIZE = 64 * 1024
+
+
+def read_chunks(path: str):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def guess_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    return "ndjson" if extension in (".ndjson", ".jsonl") else "csv"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV or NDJSON file to import")
+    parser.add_argument("--url", default=os.getenv("BUSINESS_SERVICE_URL", "http://127.0.0.1:8002").split("#")[0].strip())
+    parser.add_argument("--format", choices=sorted(CONTENT_TYPES), help="Defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per transaction")
+    parser.add_argument("--max-errors", type=int, default=100, help="Row errors to list in the report")
+    args = parser.parse_args()
+
+    data_format = args.format or guess_format(args.path)
+    response = httpx.post(
+        f"{args.url.rstrip('/')}/businesses/bulk",
+        params={"batch_size": args.batch_size, "max_errors": args.max_errors},
+        headers={"Content-Type": CONTENT_TYPES[data_format]},
+        content=read_chunks(args.path),
+        timeout=None,
+    )
+    if response.status_code != 200:
+        print(f"Import failed ({response.status_code}): {response.text}", file=sys.stderr)
+        sys.exit(1)
+
+    result = response.json()
+    print(json.dumps(result, indent=2))
+    sys.exit(1 if result["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
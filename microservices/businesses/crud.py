@@ -1,10 +1,16 @@
-from typing import List
+from typing import Callable, List, Optional, Tuple
 
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 import logging
 import models
 import schemas
 import random
+import geo
+import geocoding
+import group_commit
+import search
 
 def create_business(db: Session, business_data: schemas.BusinessCreate):
     db_business = models.Business(**business_data.model_dump())
@@ -14,11 +20,61 @@ def create_business(db: Session, business_data: schemas.BusinessCreate):
     #logging.info(f"Correlation ID: {correlation_id} - Created business with ID: {db_business.business_id}")
     return db_business
 
+def create_businesses(db: Session, items: List[schemas.BusinessCreate]):
+    """
+    Inserts many businesses without committing and returns them with their ids;
+    used by the group-commit writer.
+    """
+    return group_commit.insert_returning(db, models.Business, [item.model_dump() for item in items])
+
+def bulk_create_businesses(db: Session, rows: List[Tuple[int, dict]]):
+    """
+    Inserts validated business rows in a single transaction using executemany.
+    `rows` holds (row_number, data) pairs. If the batch fails, it is retried row
+    by row so one bad row does not sink the others.
+    Returns (inserted_count, [(row_number, error), ...]).
+    """
+    try:
+        db.execute(insert(models.Business), [data for _, data in rows])
+        db.commit()
+        return len(rows), []
+    except SQLAlchemyError:
+        db.rollback()
+
+    inserted = 0
+    errors = []
+    for row_number, data in rows:
+        try:
+            db.execute(insert(models.Business), [data])
+            db.commit()
+            inserted += 1
+        except SQLAlchemyError as e:
+            db.rollback()
+            errors.append((row_number, str(getattr(e, "orig", None) or e)))
+    logging.info(f"Bulk insert of {len(rows)} businesses fell back to single rows, {len(errors)} failed")
+    return inserted, errors
+
 def get_business(db: Session, business_id: int):
     business = db.query(models.Business).filter(models.Business.business_id == business_id).first()
     #logging.info(f"Correlation ID: {correlation_id} - Retrieved business with ID: {business_id}")
     return business
 
+def get_businesses_by_ids(db: Session, business_ids: List[int]):
+    """
+    Fetches many businesses with one IN query and returns them in the order of
+    `business_ids`. Unknown ids are skipped and duplicates are returned once.
+    """
+    unique_ids = list(dict.fromkeys(business_ids))
+    if not unique_ids:
+        return []
+    businesses = (
+        db.query(models.Business)
+        .filter(models.Business.business_id.in_(unique_ids))
+        .all()
+    )
+    by_id = {b.business_id: b for b in businesses}
+    return [by_id[business_id] for business_id in unique_ids if business_id in by_id]
+
 def delete_business(db: Session, business_id: int, correlation_id: str):
     business = db.query(models.Business).filter(models.Business.business_id == business_id).first()
     if business:
@@ -29,62 +85,152 @@ def delete_business(db: Session, business_id: int, correlation_id: str):
     logging.warning(f"Correlation ID: {correlation_id} - Business with ID: {business_id} not found")
     return None
 
-def update_business(db: Session, business_id: int, business_data: schemas.BusinessUpdate, correlation_id: str):
+def update_business(db: Session, business_id: int, business_data: schemas.BusinessUpdate, correlation_id: str,
+                    on_write: Optional[Callable[[List[int]], None]] = None):
+    """
+    Applies the fields set in `business_data`. A new address or location
+    without new coordinates clears the old ones (and the geohash) and queues
+    the address for geocoding, or copies its coordinates if it is already
+    geocoded, in the same transaction as the update.
+
+    `on_write` receives the ids of businesses that got coordinates from an
+    already geocoded address, e.g. to drop them from a response cache.
+    """
     db_business = db.query(models.Business).filter(models.Business.business_id == business_id).first()
     if db_business:
-        for key, value in business_data.model_dump(exclude_unset=True).items():
+        changes = business_data.model_dump(exclude_unset=True)
+        moved = (
+            changes.get("address", db_business.address) != db_business.address
+            or changes.get("location", db_business.location) != db_business.location
+        )
+        regeocode = moved and "latitude" not in changes and "longitude" not in changes
+        if regeocode:
+            changes.update(latitude=None, longitude=None)
+        for key, value in changes.items():
             setattr(db_business, key, value)
+        updated = []
+        if regeocode:
+            db.flush()
+            updated = geocoding.enqueue_address(db, db_business.address, db_business.location)
         db.commit()
+        if updated and on_write is not None:
+            on_write(updated)
         db.refresh(db_business)
         logging.info(f"Correlation ID: {correlation_id} - Updated business with ID: {business_id}")
         return db_business
     logging.warning(f"Correlation ID: {correlation_id} - Business with ID: {business_id} not found")
     return None
 
-def get_next_business(db: Session, location: str, existing_ids: List[int]):
-    # Fetch all businesses in the given location
-    businesses_in_location = (
-        db.query(models.Business)
-        .filter(models.Business.location == location)
-        .all()
-    )
+def nearby_businesses(db: Session, lat: float, lon: float, radius: float, k: int,
+                      location: Optional[str] = None, exclude_ids: Optional[List[int]] = None):
+    """
+    Returns up to `k` (business, distance in meters) pairs within `radius`
+    meters of (lat, lon), nearest first. Businesses without coordinates are
+    never returned.
 
-    # Filter out businesses already in the list
-    available_businesses = [
-        b for b in businesses_in_location if b.business_id not in existing_ids
-    ]
+    Candidates come from geohash prefix ranges on the indexed geohash column:
+    the query cell and its eight neighbours. The search starts a few levels
+    finer than `radius` needs and widens one level at a time until `k`
+    businesses are found within the radius the block is known to cover, so in
+    dense areas only a small neighbourhood is read.
+    """
+    coarsest = geo.precision_for(lat, radius)
+    finest = min(coarsest + 3, geo.GEOHASH_PRECISION)
+    hits = []
+    for precision in range(finest, coarsest - 1, -1):
+        ranges = [
+            and_(models.Business.geohash >= cell, models.Business.geohash < cell + geo.PREFIX_END)
+            for cell in geo.block(lat, lon, precision)
+        ]
+        query = db.query(
+            models.Business.business_id, models.Business.latitude, models.Business.longitude
+        ).filter(or_(*ranges))
+        if location is not None:
+            query = query.filter(models.Business.location == location)
+        if exclude_ids:
+            query = query.filter(models.Business.business_id.notin_(set(exclude_ids)))
 
-    # Return a random business if available
-    if available_businesses:
-        return random.choice(available_businesses)
-    return None
+        # Everything within `covered` is in the block; farther candidates may have closer peers outside it
+        covered = radius if precision == coarsest else min(geo.covered_radius(lat, precision), radius)
+        hits = []
+        for business_id, business_lat, business_lon in query:
+            distance = geo.haversine(lat, lon, business_lat, business_lon)
+            if distance <= covered:
+                hits.append((distance, business_id))
+        if len(hits) >= k:
+            break
+
+    hits = sorted(hits)[:k]
+    businesses = {b.business_id: b for b in get_businesses_by_ids(db, [business_id for _, business_id in hits])}
+    return [(businesses[business_id], distance) for distance, business_id in hits if business_id in businesses]
+
+def get_next_business(db: Session, location: str, existing_ids: List[int], near: Optional[Tuple[float, float]] = None, radius: float = 5000):
     """
-    # Validate that list_id is an integer
-    if not isinstance(list_id, int):
-        raise ValueError("list_id must be an integer.")
+    Picks one random business in `location` that is not in `existing_ids`.
+    With `near` as (lat, lon), the nearest such business within `radius`
+    meters is picked instead, falling back to a random one if none is.
 
-    # Fetch all businesses in the given location
-    businesses_in_location = (
-        db.query(models.Business)
-        .filter(models.Business.location == location)
-        .all()
-    )
+    Sampling happens in the database: a random pivot is drawn between the lowest
+    and highest business_id in the location, and the first eligible row at or
+    after the pivot is returned (wrapping around to the start if needed). Both
+    lookups walk the (location, business_id) index, so the cost does not grow
+    with the number of businesses in the location.
 
-    # Fetch businesses already in the list
-    business_ids_in_list = (
-        db.query(models.Itinerary.business_id)
-        .filter(models.Itinerary.list_id == list_id)
-        .all()
-    )
-    business_ids_in_list = {b_id[0] for b_id in business_ids_in_list}  # Unpack from tuples
+    The pick is not uniform: a row's chance is proportional to the gap in ids
+    before it (back to the previous eligible row of the location). Ids are
+    shared by all locations and excluded ids are skipped, so when locations'
+    ids interleave unevenly or `existing_ids` cluster, the row after a large gap
+    can be many times more likely than its neighbours. Callers that need
+    near-uniform picks should sample by rank (a count and a random offset) instead.
+    """
+    if near is not None:
+        nearest = nearby_businesses(db, near[0], near[1], radius, 1, location=location, exclude_ids=existing_ids)
+        if nearest:
+            return nearest[0][0]
+
+    in_location = models.Business.location == location
 
-    # Exclude businesses already in the list
-    available_businesses = [
-        b for b in businesses_in_location if b.business_id not in business_ids_in_list
-    ]
+    # Step 1: Find the id range of the location (one index seek per end)
+    ids_in_location = db.query(models.Business.business_id).filter(in_location)
+    low = ids_in_location.order_by(models.Business.business_id).limit(1).scalar()
+    if low is None:
+        return None
+    high = ids_in_location.order_by(models.Business.business_id.desc()).limit(1).scalar()
 
-    # Return a random business if available
-    if available_businesses:
-        return random.choice(available_businesses)
-    return None"""
+    # Step 2: Take the first eligible business at or after a random pivot
+    query = db.query(models.Business).filter(in_location)
+    if existing_ids:
+        query = query.filter(models.Business.business_id.notin_(set(existing_ids)))
+
+    pivot = random.randint(low, high)
+    business = (
+        query.filter(models.Business.business_id >= pivot)
+        .order_by(models.Business.business_id)
+        .first()
+    )
 
+    # Step 3: Wrap around if every eligible business sits below the pivot
+    if business is None:
+        business = (
+            query.filter(models.Business.business_id < pivot)
+            .order_by(models.Business.business_id)
+            .first()
+        )
+    return business
+
+def search_businesses(db: Session, backend, query: str, location: Optional[str], category: Optional[str], limit: int, offset: int):
+    """
+    Ranked full-text search over business_name, category and description.
+    Every term in `query` must match. Returns ([(business, score), ...], next_offset);
+    next_offset is None on the last page.
+    """
+    terms = search.tokenize(query)
+    if not terms:
+        return [], None
+    # Ask for one extra hit to know whether another page follows
+    hits = backend.search(db, terms, location, category, limit + 1, offset)
+    next_offset = offset + limit if len(hits) > limit else None
+    hits = hits[:limit]
+    businesses = {b.business_id: b for b in get_businesses_by_ids(db, [business_id for business_id, _ in hits])}
+    # A hit can vanish between the index lookup and the fetch if the business was just deleted
+    return [(businesses[business_id], score) for business_id, score in hits if business_id in businesses], next_offset
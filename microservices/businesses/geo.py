@@ -0,0 +1,122 @@
+import math
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Column, Float, String, inspect, text
+
+# Precision of the stored geohash; 9 characters is a cell of about 4.8m x 4.8m
+GEOHASH_PRECISION = 9
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every BASE32 character, so [cell, cell + PREFIX_END) is every hash starting with cell
+PREFIX_END = "{"
+EARTH_RADIUS_M = 6371008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bits alternate between longitude and latitude, longitude first
+    while len(chars) < precision:
+        coordinate, bounds = (lon, lon_range) if even else (lat, lat_range)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_for(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """
+    Returns the (latitude, longitude) size in degrees of a cell at `precision`.
+    """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def block(lat: float, lon: float, precision: int) -> List[str]:
+    """
+    The cell holding (lat, lon) and its (up to) eight neighbours.
+    """
+    lat_size, lon_size = cell_size(precision)
+    cells = []
+    for dy in (-1, 0, 1):
+        neighbour_lat = lat + dy * lat_size
+        if not -90 <= neighbour_lat <= 90:
+            continue
+        for dx in (-1, 0, 1):
+            neighbour_lon = (lon + dx * lon_size + 180) % 360 - 180
+            cell = encode(neighbour_lat, neighbour_lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def covered_radius(lat: float, precision: int) -> float:
+    """
+    Distance in meters from (lat, lon) that the 3x3 block at `precision` is
+    guaranteed to cover: at least one cell in every direction.
+    """
+    lat_size, lon_size = cell_size(precision)
+    # Longitude cells narrow towards the poles; use the narrowest row of the block
+    widest_lat = min(abs(lat) + 2 * lat_size, 90.0)
+    return min(lat_size, lon_size * math.cos(math.radians(widest_lat))) * METERS_PER_DEGREE
+
+
+def precision_for(lat: float, radius: float) -> int:
+    """
+    The finest precision whose 3x3 block still covers `radius` meters around a point at `lat`.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        if covered_radius(lat, precision) >= radius:
+            return precision
+    return 1
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """
+    Great-circle distance in meters.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def ensure_columns(engine, table):
+    """
+    Adds the coordinate columns and geohash index to a businesses table created
+    before they existed. create_all() doesn't alter existing tables.
+    """
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    new_columns = [
+        Column("latitude", Float, nullable=True),
+        Column("longitude", Float, nullable=True),
+        Column("geohash", String(GEOHASH_PRECISION), nullable=True),
+    ]
+    with engine.begin() as conn:
+        for column in new_columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NULL"))
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,79 @@
+"""
+Geocodes the addresses of businesses without coordinates, writing results
+back in batches. Progress is kept in the geocode_jobs table: stop it at any
+time and run it again to carry on. Retried addresses become due later; run
+again (or use --wait) to pick them up.
+
+Usage:
+    python geocode_backfill.py
+    python geocode_backfill.py --rate 1 --concurrency 2 --limit 1000
+    python geocode_backfill.py --retry-failed --wait
+"""
+import argparse
+import asyncio
+import logging
+import sys
+
+from sqlalchemy import update
+
+import database
+import geocoding
+import models
+
+
+def reset_failed():
+    db = database.SessionLocal()
+    try:
+        result = db.execute(
+            update(models.GeocodeJob)
+            .where(models.GeocodeJob.status == geocoding.FAILED)
+            .values(status=geocoding.PENDING, attempts=0, next_attempt_at=0.0)
+        )
+        db.commit()
+        return result.rowcount
+    finally:
+        db.close()
+
+
+async def backfill(args) -> dict:
+    models.GeocodeJob.__table__.create(bind=database.engine, checkfirst=True)
+    if args.retry_failed:
+        print(f"Requeued {reset_failed()} failed addresses", file=sys.stderr)
+
+    async with geocoding.make_client() as client:
+        pipeline = geocoding.GeocodePipeline(
+            geocoding.NominatimGeocoder(client, args.url),
+            rate=args.rate, concurrency=args.concurrency, write_batch=args.write_batch,
+        )
+        print(f"Queued {await pipeline.enqueue()} new addresses", file=sys.stderr)
+        while True:
+            await pipeline.run(limit=args.limit)
+            counts = await pipeline.counts()
+            print(f"Run: {pipeline.progress()}\nJobs: {counts}", file=sys.stderr)
+            if not args.wait or not counts[geocoding.PENDING] or args.limit:
+                return counts
+            # Retries are due after their backoff
+            await asyncio.sleep(geocoding.GEOCODE_RETRY_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=geocoding.NOMINATIM_URL)
+    parser.add_argument("--rate", type=float, default=geocoding.GEOCODE_RATE_PER_SECOND, help="Requests per second")
+    parser.add_argument("--concurrency", type=int, default=geocoding.GEOCODE_CONCURRENCY)
+    parser.add_argument("--write-batch", type=int, default=geocoding.GEOCODE_WRITE_BATCH)
+    parser.add_argument("--limit", type=int, help="Stop after this many addresses")
+    parser.add_argument("--retry-failed", action="store_true", help="Give failed addresses another round of attempts")
+    parser.add_argument("--wait", action="store_true", help="Keep going until no address is pending")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(backfill(args))
+    except KeyboardInterrupt:
+        print("Interrupted; run again to resume", file=sys.stderr)
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
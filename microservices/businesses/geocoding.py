@@ -0,0 +1,427 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import and_, bindparam, exists, func, insert, literal, select, tuple_, update
+from starlette.concurrency import run_in_threadpool
+
+import database
+import geo
+import models
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+# Nominatim's usage policy allows one request per second and requires an identifying User-Agent
+GEOCODE_USER_AGENT = os.getenv("GEOCODE_USER_AGENT", "business-list-geocoder/1.0")
+GEOCODE_RATE_PER_SECOND = float(os.getenv("GEOCODE_RATE_PER_SECOND", "1"))
+# Requests in flight at once; the rate limit still applies across all of them
+GEOCODE_CONCURRENCY = int(os.getenv("GEOCODE_CONCURRENCY", "2"))
+# Attempts before an address is marked failed; retries back off exponentially from GEOCODE_RETRY_SECONDS
+GEOCODE_MAX_ATTEMPTS = int(os.getenv("GEOCODE_MAX_ATTEMPTS", "5"))
+GEOCODE_RETRY_SECONDS = float(os.getenv("GEOCODE_RETRY_SECONDS", "30"))
+# Results written back per transaction; at most this many lookups are repeated after a crash
+GEOCODE_WRITE_BATCH = int(os.getenv("GEOCODE_WRITE_BATCH", "100"))
+# Pending jobs read from the queue table at a time
+GEOCODE_CLAIM_BATCH = int(os.getenv("GEOCODE_CLAIM_BATCH", "500"))
+
+PENDING, DONE, NOT_FOUND, FAILED = "pending", "done", "not_found", "failed"
+
+
+class RetryableGeocodeError(Exception):
+    """
+    The lookup may succeed later (network error, 5xx, 429). `retry_after` is in seconds if the server said.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class NominatimGeocoder:
+    """
+    Looks addresses up with the same request as lists/crud.py::fetch_lat_lon,
+    qualified by the business location (the city) as "address, location".
+    Returns (lat, lon), or None when Nominatim has no match.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, url: str = NOMINATIM_URL):
+        self.client = client
+        self.url = url
+
+    async def geocode(self, address: str, location: str) -> Optional[Tuple[float, float]]:
+        try:
+            response = await self.client.get(
+                self.url, params={"q": f"{address}, {location}", "format": "json", "limit": 1}
+            )
+        except httpx.HTTPError as e:
+            raise RetryableGeocodeError(f"{type(e).__name__}: {e}")
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get("retry-after")
+            raise RetryableGeocodeError(
+                f"HTTP {response.status_code}",
+                float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        if response.status_code != 200:
+            raise ValueError(f"HTTP {response.status_code}")
+        results = response.json()
+        if not results:
+            return None
+        return float(results[0]["lat"]), float(results[0]["lon"])
+
+
+def make_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_connections=GEOCODE_CONCURRENCY, max_keepalive_connections=GEOCODE_CONCURRENCY),
+        headers={"User-Agent": GEOCODE_USER_AGENT},
+    )
+
+
+class RateLimiter:
+    """
+    Spaces request starts at least 1/rate seconds apart across all workers.
+    `pause()` pushes the next slot back, e.g. for a Retry-After header.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot = max(now, self._next_slot) + self.interval
+
+    def pause(self, seconds: float):
+        self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+@dataclass
+class Result:
+    address: str
+    location: str
+    status: str
+    attempts: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    error: Optional[str] = None
+    next_attempt_at: float = 0.0
+
+
+def _set_coordinates(db, rows: Iterable[Tuple[int, float, float]]) -> List[int]:
+    """
+    Sets (business_id, latitude, longitude) rows in one executemany, without
+    committing. Returns the ids of the businesses that were updated.
+    """
+    updates = [
+        {"b_id": business_id, "b_latitude": lat, "b_longitude": lon, "b_geohash": geo.geohash_for(lat, lon)}
+        for business_id, lat, lon in rows
+    ]
+    if updates:
+        table = models.Business.__table__
+        db.execute(
+            table.update()
+            .where(table.c.business_id == bindparam("b_id"))
+            .values(latitude=bindparam("b_latitude"), longitude=bindparam("b_longitude"), geohash=bindparam("b_geohash")),
+            updates,
+        )
+    return [row["b_id"] for row in updates]
+
+
+def _same_place():
+    return and_(
+        models.GeocodeJob.address == models.Business.address,
+        models.GeocodeJob.location == models.Business.location,
+    )
+
+
+def _copy_done(db, places: Optional[List[Tuple[str, str]]] = None) -> List[int]:
+    """
+    Copies the coordinates of done jobs (only those for the (address, location)
+    `places`, if given) onto businesses at that place still missing them,
+    without committing.
+    """
+    statement = (
+        select(models.Business.business_id, models.GeocodeJob.latitude, models.GeocodeJob.longitude)
+        .join(models.GeocodeJob, _same_place())
+        .where(models.Business.latitude.is_(None), models.GeocodeJob.status == DONE)
+    )
+    if places is not None:
+        statement = statement.where(tuple_(models.Business.address, models.Business.location).in_(places))
+    return _set_coordinates(db, db.execute(statement))
+
+
+def enqueue_missing(db) -> Tuple[int, List[int]]:
+    """
+    Gives businesses without coordinates those of their address when it is
+    already geocoded (the business was added or moved after the lookup), then
+    adds a pending job for every other distinct (address, location) of a
+    business without coordinates that has no job yet.
+    Returns the number of new jobs and the ids of the businesses that got coordinates.
+    """
+    updated = _copy_done(db)
+    missing = (
+        select(models.Business.address, models.Business.location, literal(PENDING), literal(0), literal(0.0))
+        .where(models.Business.latitude.is_(None), ~exists().where(_same_place()))
+        .distinct()
+    )
+    result = db.execute(
+        insert(models.GeocodeJob).from_select(
+            ["address", "location", "status", "attempts", "next_attempt_at"], missing
+        )
+    )
+    db.commit()
+    return result.rowcount, updated
+
+
+def enqueue_address(db, address: str, location: str) -> List[int]:
+    """
+    Same as `enqueue_missing` for one address, e.g. after a business moved there:
+    copies the coordinates of a done job, or adds a pending job if there is none,
+    without committing. Returns the ids of the businesses that got coordinates.
+    """
+    updated = _copy_done(db, [(address, location)])
+    if db.get(models.GeocodeJob, (address, location)) is None:
+        db.add(models.GeocodeJob(address=address, location=location, status=PENDING, attempts=0, next_attempt_at=0.0))
+    return updated
+
+
+def job_counts(db) -> dict:
+    rows = db.execute(select(models.GeocodeJob.status, func.count()).group_by(models.GeocodeJob.status))
+    counts = {status: 0 for status in (PENDING, DONE, NOT_FOUND, FAILED)}
+    counts.update(dict(rows.all()))
+    return counts
+
+
+def claim_due(db, after: Tuple[str, str], limit: int) -> List[Tuple[str, str, int]]:
+    """
+    Pending jobs that are due, in (address, location) order after `after`,
+    as (address, location, attempts).
+    """
+    rows = db.execute(
+        select(models.GeocodeJob.address, models.GeocodeJob.location, models.GeocodeJob.attempts)
+        .where(
+            models.GeocodeJob.status == PENDING,
+            models.GeocodeJob.next_attempt_at <= time.time(),
+            tuple_(models.GeocodeJob.address, models.GeocodeJob.location) > tuple_(*after),
+        )
+        .order_by(models.GeocodeJob.address, models.GeocodeJob.location)
+        .limit(limit)
+    )
+    return [tuple(row) for row in rows]
+
+
+def write_results(db, results: Iterable[Result]) -> List[int]:
+    """
+    Stores job outcomes and copies found coordinates onto every business at
+    that (address, location) still missing them, in one transaction.
+    Returns the ids of the businesses that were updated.
+    """
+    results = list(results)
+    now = time.time()
+    db.execute(update(models.GeocodeJob), [
+        {
+            "address": r.address, "location": r.location, "status": r.status, "attempts": r.attempts, "latitude": r.latitude,
+            "longitude": r.longitude, "last_error": r.error, "next_attempt_at": r.next_attempt_at, "updated_at": now,
+        }
+        for r in results
+    ])
+
+    found = {(r.address, r.location): r for r in results if r.status == DONE}
+    updated = []
+    if found:
+        businesses = db.execute(
+            select(models.Business.business_id, models.Business.address, models.Business.location)
+            .where(
+                tuple_(models.Business.address, models.Business.location).in_(list(found)),
+                models.Business.latitude.is_(None),
+            )
+        )
+        updated = _set_coordinates(db, [
+            (business_id, found[address, location].latitude, found[address, location].longitude)
+            for business_id, address, location in businesses
+        ])
+    db.commit()
+    return updated
+
+
+class GeocodePipeline:
+    """
+    Backfills business coordinates from the geocode_jobs table.
+
+    One reader claims due pending jobs from the table, `concurrency` workers
+    geocode them behind a shared rate limiter, and one writer stores results
+    in batches. Retryable failures go back to pending with exponential backoff
+    until `max_attempts`. All state is in the table, so a stopped run resumes
+    where it left off; only results not yet written (less than one batch) are
+    looked up again.
+
+    `on_write` receives the ids of businesses that got coordinates, e.g. to
+    drop them from a response cache.
+    """
+
+    def __init__(
+        self,
+        geocoder,
+        session_factory=None,
+        rate: float = GEOCODE_RATE_PER_SECOND,
+        concurrency: int = GEOCODE_CONCURRENCY,
+        max_attempts: int = GEOCODE_MAX_ATTEMPTS,
+        retry_seconds: float = GEOCODE_RETRY_SECONDS,
+        write_batch: int = GEOCODE_WRITE_BATCH,
+        claim_batch: int = GEOCODE_CLAIM_BATCH,
+        on_write: Optional[Callable[[List[int]], None]] = None,
+    ):
+        self.geocoder = geocoder
+        self.session_factory = session_factory or database.SessionLocal
+        self.limiter = RateLimiter(rate)
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.write_batch = write_batch
+        self.claim_batch = claim_batch
+        self.on_write = on_write
+        self.running = False
+        self.started_at = None
+        self.counters = {"requests": 0, DONE: 0, NOT_FOUND: 0, FAILED: 0, "retried": 0, "businesses_updated": 0}
+
+    def _with_session(self, work, *args):
+        db = self.session_factory()
+        try:
+            return work(db, *args)
+        finally:
+            db.close()
+
+    async def enqueue(self) -> int:
+        """
+        Queues new addresses and returns how many; businesses whose address is
+        already geocoded get its coordinates straight away.
+        """
+        added, updated = await run_in_threadpool(self._with_session, enqueue_missing)
+        if updated and self.on_write is not None:
+            self.on_write(updated)
+        return added
+
+    async def counts(self) -> dict:
+        return await run_in_threadpool(self._with_session, job_counts)
+
+    async def _lookup(self, address: str, location: str, attempts: int) -> Result:
+        await self.limiter.acquire()
+        self.counters["requests"] += 1
+        attempts += 1
+        try:
+            coordinates = await self.geocoder.geocode(address, location)
+        except RetryableGeocodeError as e:
+            if e.retry_after:
+                self.limiter.pause(e.retry_after)
+            if attempts >= self.max_attempts:
+                self.counters[FAILED] += 1
+                return Result(address, location, FAILED, attempts, error=str(e))
+            self.counters["retried"] += 1
+            delay = max(self.retry_seconds * 2 ** (attempts - 1), e.retry_after or 0)
+            return Result(address, location, PENDING, attempts, error=str(e), next_attempt_at=time.time() + delay)
+        except Exception as e:
+            # Malformed responses and 4xx errors won't improve on retry
+            self.counters[FAILED] += 1
+            return Result(address, location, FAILED, attempts, error=f"{type(e).__name__}: {e}")
+        if coordinates is None:
+            self.counters[NOT_FOUND] += 1
+            return Result(address, location, NOT_FOUND, attempts)
+        self.counters[DONE] += 1
+        return Result(address, location, DONE, attempts, latitude=coordinates[0], longitude=coordinates[1])
+
+    async def _flush(self, results: List[Result]):
+        if not results:
+            return
+        updated = await run_in_threadpool(self._with_session, write_results, results)
+        self.counters["businesses_updated"] += len(updated)
+        if updated and self.on_write is not None:
+            self.on_write(updated)
+
+    async def run(self, limit: Optional[int] = None) -> dict:
+        """
+        Processes due pending jobs (at most `limit`) and returns the run's counters,
+        which `progress()` reports until the next run starts.
+        Jobs that are retried become due later and are left for the next run.
+        """
+        self.running = True
+        self.started_at = time.time()
+        self.counters = dict.fromkeys(self.counters, 0)
+        jobs: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def read():
+            after, claimed = ("", ""), 0
+            while limit is None or claimed < limit:
+                size = self.claim_batch if limit is None else min(self.claim_batch, limit - claimed)
+                batch = await run_in_threadpool(self._with_session, claim_due, after, size)
+                if not batch:
+                    break
+                for job in batch:
+                    await jobs.put(job)
+                claimed += len(batch)
+                after = batch[-1][:2]
+            for _ in range(self.concurrency):
+                await jobs.put(None)
+
+        async def work():
+            while True:
+                job = await jobs.get()
+                if job is None:
+                    break
+                await results.put(await self._lookup(*job))
+
+        async def write():
+            pending = []
+            while True:
+                result = await results.get()
+                if result is None:
+                    break
+                pending.append(result)
+                if len(pending) >= self.write_batch:
+                    await self._flush(pending)
+                    pending = []
+                    logging.info(f"Geocoding progress: {self.progress()}")
+            await self._flush(pending)
+
+        writer = asyncio.create_task(write())
+        try:
+            await asyncio.gather(read(), *(work() for _ in range(self.concurrency)))
+        finally:
+            # Also on cancellation: keep what was already looked up
+            await results.put(None)
+            await asyncio.shield(writer)
+            self.running = False
+        logging.info(f"Geocoding run finished: {self.progress()}")
+        return dict(self.counters)
+
+    def progress(self) -> dict:
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            **self.counters,
+            "running": self.running,
+            "elapsed_seconds": round(elapsed, 1),
+            "requests_per_second": round(self.counters["requests"] / elapsed, 3) if elapsed else 0.0,
+        }
+
+
+async def backfill_forever(pipeline: GeocodePipeline, interval: float):
+    """
+    Enqueues newly seen addresses and runs the pipeline every `interval` seconds.
+    """
+    while True:
+        try:
+            await pipeline.enqueue()
+            await pipeline.run()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Geocoding backfill failed, retrying in {interval}s: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,183 @@
+import codecs
+import csv
+import json
+import os
+from typing import AsyncIterator, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+import crud
+import schemas
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines"}
+# Largest CSV record (all its lines) held in memory; longer ones, e.g. from a stray quote, are row errors
+MAX_RECORD_BYTES = int(os.getenv("INGEST_MAX_RECORD_BYTES", str(1024 * 1024)))
+
+
+def detect_format(content_type: Optional[str]) -> Optional[str]:
+    """
+    Maps a Content-Type header to "csv" or "ndjson". Returns None if unsupported.
+    """
+    if not content_type:
+        return None
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in CSV_CONTENT_TYPES:
+        return "csv"
+    if media_type in NDJSON_CONTENT_TYPES:
+        return "ndjson"
+    return None
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Splits a stream of UTF-8 byte chunks into lines without buffering the whole body.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        start = 0
+        while True:
+            end = pending.find("\n", start)
+            if end == -1:
+                break
+            yield pending[start:end].rstrip("\r")
+            start = end + 1
+        pending = pending[start:]
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_rows(
+    lines: AsyncIterator[str], max_record_bytes: int = MAX_RECORD_BYTES
+) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yields (row_number, dict) for every CSV record after the header, or
+    (row_number, error message) for records that cannot be parsed.
+
+    A record continues onto the next line while it has an unclosed quote,
+    tracked by a running count of quotes so each line is scanned once. A
+    record longer than `max_record_bytes` is reported as an error and its
+    remaining lines are skipped without being kept, so an unterminated quote
+    can't pull the rest of the upload into memory.
+    """
+    header = None
+    parts = []  # Lines of the record being read
+    size = 0
+    quotes = 0
+    oversized = False
+    row_number = 0
+    async for line in lines:
+        quotes += line.count('"')
+        size += len(line.encode()) + 1
+        if oversized:
+            if quotes % 2 == 0:
+                oversized, size, quotes = False, 0, 0
+            continue
+        parts.append(line)
+        if quotes % 2:
+            if size > max_record_bytes:
+                row_number += 1
+                yield row_number, f"Record exceeds {max_record_bytes} bytes (unterminated quote?)"
+                parts, oversized = [], True
+            continue  # Quoted field spans multiple lines
+
+        current = "\n".join(parts)
+        parts, size, quotes = [], 0, 0
+        if not current.strip():
+            continue
+        values = next(csv.reader([current]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield row_number, dict(zip(header, values))
+
+    if parts:
+        yield row_number + 1, "Unterminated quoted field"
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[int, object]]:
+    """
+    Yields (row_number, dict) for every JSON object line, or
+    (row_number, error message) for lines that are not JSON objects.
+    """
+    row_number = 0
+    async for line in lines:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(value, dict):
+            yield row_number, "Expected a JSON object"
+            continue
+        yield row_number, value
+
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+
+async def import_businesses(
+    chunks: AsyncIterator[bytes],
+    data_format: str,
+    db: Session,
+    batch_size: int = 1000,
+    max_errors: int = 100,
+) -> schemas.BulkImportResult:
+    """
+    Streams rows out of `chunks`, validates each one against BusinessCreate and
+    inserts them `batch_size` rows per transaction. Invalid rows are reported and
+    skipped; at most `max_errors` of them are listed in the result.
+    Only one batch is held in memory at a time.
+    """
+    lines = iter_lines(chunks)
+    rows = iter_csv_rows(lines) if data_format == "csv" else iter_ndjson_rows(lines)
+
+    result = schemas.BulkImportResult()
+    batch = []
+
+    def record_error(row_number: int, message: str):
+        result.failed += 1
+        if len(result.errors) < max_errors:
+            result.errors.append(schemas.BulkImportError(row=row_number, error=message))
+
+    async def flush():
+        inserted, errors = await run_in_threadpool(crud.bulk_create_businesses, db, batch)
+        result.inserted += inserted
+        for row_number, message in errors:
+            record_error(row_number, message)
+        batch.clear()
+
+    async for row_number, row in rows:
+        if isinstance(row, str):
+            record_error(row_number, row)
+            continue
+        try:
+            business = schemas.BusinessCreate(**row)
+        except ValidationError as e:
+            record_error(row_number, format_validation_error(e))
+            continue
+
+        batch.append((row_number, business.model_dump()))
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+    return result
@@ -1,20 +1,31 @@
-import uuid
-from urllib.request import Request
-
-from fastapi import FastAPI, HTTPException, Depends, Query
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query, Response
 from typing import List, Optional
 import crud
 import database
+import geo
+import geocoding
+import group_commit
+import ingest
+import models
+import response_cache
+import schema_check
 import schemas
+import search
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.responses import FileResponse
 import logging
-import time
+import metrics
+import profiling
+import tracing
 #from dotenv import load_dotenv
 import set_env
 import os
+import threading
 import uvicorn
 
 """
@@ -23,7 +34,102 @@ dotenv_path = os.path.join(os.path.dirname(__file__), '..', ".env")
 load_dotenv(dotenv_path)
 """
 
-app = FastAPI(debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tables created before businesses had coordinates get the new columns and index
+    try:
+        geo.ensure_columns(database.engine, models.Business.__table__)
+    except Exception as e:
+        logging.warning(f"Coordinate columns not added: {e}")
+    # Warn early if the database is missing indexes the hot queries rely on
+    for engine in database.registry.engines().values():
+        schema_check.warn_missing_indexes(engine, models.Base.metadata)
+    # Create or catch up the full-text index now rather than on the first search
+    try:
+        get_search_backend()
+    except Exception as e:
+        logging.warning(f"Search index setup deferred: {e}")
+    # Work queue of the geocoding backfill; the loop itself is opt-in
+    try:
+        models.GeocodeJob.__table__.create(bind=database.engine, checkfirst=True)
+    except Exception as e:
+        logging.warning(f"Geocode job table not created: {e}")
+    geocode_client = geocoding.make_client()
+    geocode_pipeline.geocoder = geocoding.NominatimGeocoder(geocode_client)
+    backfill = None
+    if GEOCODE_BACKFILL:
+        backfill = asyncio.create_task(geocoding.backfill_forever(geocode_pipeline, GEOCODE_BACKFILL_INTERVAL_SECONDS))
+    # Opt-in: concurrent creates share a transaction (see group_commit.GroupCommitWriter)
+    if group_commit.GROUP_COMMIT:
+        create_writer.start()
+    yield
+    create_writer.stop()
+    if backfill is not None:
+        backfill.cancel()
+        try:
+            await backfill
+        except asyncio.CancelledError:
+            pass
+    await geocode_client.aclose()
+
+app = FastAPI(debug=True, lifespan=lifespan)
+
+# Upper bound on ids accepted by the multi-get endpoint
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", "500"))
+# Largest radius (meters) and result count accepted by /businesses/nearby
+NEARBY_MAX_RADIUS_M = float(os.getenv("NEARBY_MAX_RADIUS_M", "50000"))
+NEARBY_MAX_K = int(os.getenv("NEARBY_MAX_K", "100"))
+# How far /businesses/next/ looks for a nearby business when given coordinates
+NEXT_BUSINESS_RADIUS_M = float(os.getenv("NEXT_BUSINESS_RADIUS_M", "5000"))
+
+# Serialized GET /businesses/{id} responses, invalidated on update and delete
+business_cache = response_cache.LRUCache()
+
+# Fill in missing business coordinates in the background (see geocoding.GeocodePipeline)
+GEOCODE_BACKFILL = os.getenv("GEOCODE_BACKFILL", "false").lower() in ("1", "true", "yes")
+GEOCODE_BACKFILL_INTERVAL_SECONDS = float(os.getenv("GEOCODE_BACKFILL_INTERVAL_SECONDS", "300"))
+
+# Newly geocoded businesses must not be served from the response cache without their coordinates
+def invalidate_businesses(business_ids):
+    for business_id in business_ids:
+        business_cache.invalidate(business_id)
+
+geocode_pipeline = geocoding.GeocodePipeline(geocoder=None, on_write=invalidate_businesses)
+
+def count_geocode_jobs():
+    db = database.SessionLocal()
+    try:
+        return {(status,): count for status, count in geocoding.job_counts(db).items()}
+    except SQLAlchemyError:
+        # The job table doesn't exist until the lifespan has run
+        return {}
+    finally:
+        db.close()
+
+metrics.registry.register(metrics.Gauge(
+    "geocode_jobs", "Geocoding backfill jobs by status.", ("status",), count_geocode_jobs
+))
+metrics.registry.register(metrics.Gauge(
+    "geocode_requests_per_second", "Geocoder request rate of the current or last backfill run.", (),
+    lambda: {(): geocode_pipeline.progress()["requests_per_second"]},
+))
+
+# Batches POST /businesses/ inserts when GROUP_COMMIT is on; on_commit notes each write for its client's read routing
+create_writer = group_commit.GroupCommitWriter(
+    database.SessionLocal, crud.create_businesses, name="businesses", on_commit=database.registry.record_write
+)
+metrics.track_group_commit(create_writer)
+
+# Full-text search backend, set up on first use (see search.make_backend)
+search_backend = None
+search_backend_lock = threading.Lock()
+
+def get_search_backend():
+    global search_backend
+    with search_backend_lock:
+        if search_backend is None:
+            search_backend = search.make_backend(database.engine, database.SessionLocal)
+        return search_backend
 
 # Setup CORS using environment variables, if needed
 app.add_middleware(
@@ -35,46 +141,19 @@ app.add_middleware(
 )
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("tracing.log"),  # Log to a file
-        logging.StreamHandler(),            # Log to the console
-    ],
-)
+# Structured JSON logs, written by a background thread
+tracing.configure_logging("tracing.log")
 
-# Custom Logging, Tracing, and Correlation ID Middleware
-class TracingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-        request.state.correlation_id = correlation_id
-
-        # Start timing the request
-        start_time = time.time()
-
-        # Log request details
-        logging.info(f"Request Start: {request.method} {request.url}")
-        logging.info(f"Correlation ID: {correlation_id} - {request.method} {request.url}")
-        logging.info(f"Headers: {request.headers}")
-        if request.method in ["POST", "PUT", "PATCH"]:
-            body = await request.body()
-            logging.info(f"Body: {body.decode('utf-8') if body else None}")
-
-        # Process the request and get the response
-        response = await call_next(request)
-        response.headers["X-Correlation-ID"] = correlation_id
-
-        # End timing and log response details
-        process_time = time.time() - start_time
-        logging.info(
-            f"Request End: {request.method} {request.url} - "
-            f"Status Code: {response.status_code} - Time: {process_time:.4f}s"
-        )
+# Keeps each client's reads on the primary for a moment after it writes
+app.add_middleware(database.ReadYourWritesMiddleware, registry=database.registry)
+
+# Opt-in profiling (X-Profile header or PROFILE_SAMPLE_RATE); inside tracing so profiles are named by correlation ID
+app.add_middleware(profiling.ProfilingMiddleware)
 
-        return response
+# Logging, Tracing, and Correlation ID Middleware
+app.add_middleware(tracing.TracingMiddleware)
 
-app.add_middleware(TracingMiddleware)
+metrics.instrument(app, database.registry.engines())
 
 # Dependency to get a database session
 def get_db():
@@ -84,10 +163,46 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get a session for read-only endpoints (may be a replica)
+def get_read_db():
+    db = database.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @app.get("/")
 async def root():
     return {"message": "Tracing middleware is active!"}
 
+@app.get("/admin/geocode")
+def get_geocode_status(db: Session = Depends(get_db)):
+    """
+    Geocoding backfill progress: jobs by status, and counters and throughput of the current or last run.
+    """
+    return {"enabled": GEOCODE_BACKFILL, "jobs": geocoding.job_counts(db), "run": geocode_pipeline.progress()}
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """
+    Lists saved request profiles, newest first. Requires `X-Profile: <PROFILE_TOKEN>`.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{file}")
+def download_profile(file: str, request: Request):
+    """
+    Downloads one profile: `.prof` files load in pstats/snakeviz, `.folded` in speedscope/flamegraph.pl.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    path = profiling.profile_path(file)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=file)
+
 
 @app.post("/businesses/", response_model=schemas.Business, status_code=201)
 def create_business(
@@ -96,6 +211,8 @@ def create_business(
     address: str,
     category: str,
     description: str,
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
     db: Session = Depends(get_db)
 ):
     # Call the CRUD function to create the business
@@ -104,23 +221,146 @@ def create_business(
         location=location,
         address=address,
         category=category,
-        description=description
+        description=description,
+        latitude=latitude,
+        longitude=longitude
     )
+    if create_writer.running:
+        return create_writer.write(business_data)
     created_business = crud.create_business(db=db, business_data=business_data)
     return created_business
 
 
+@app.post("/businesses/bulk", response_model=schemas.BulkImportResult)
+async def bulk_import_businesses(
+    request: Request,
+    batch_size: int = Query(1000, ge=1, le=50000),
+    max_errors: int = Query(100, ge=0, le=10000),
+    db: Session = Depends(get_db)
+):
+    """
+    Streams a CSV (with header row) or NDJSON body and inserts the businesses in
+    transactions of `batch_size` rows. Rows that fail validation or insertion are
+    reported in the response without aborting the import.
+    """
+    data_format = ingest.detect_format(request.headers.get("content-type"))
+    if data_format is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type must be text/csv or application/x-ndjson."
+        )
+    result = await ingest.import_businesses(
+        request.stream(), data_format, db, batch_size=batch_size, max_errors=max_errors
+    )
+    logging.info(
+        f"Correlation ID: {request.state.correlation_id} - Bulk import finished: "
+        f"{result.inserted} inserted, {result.failed} failed"
+    )
+    return result
+
+
+@app.get("/businesses", response_model=List[schemas.Business])
+def get_businesses(ids: str, db: Session = Depends(get_read_db)):
+    """
+    Looks up many businesses at once, e.g. `/businesses?ids=3,1,2`.
+    Results follow the order of `ids`; ids that don't exist are left out.
+    """
+    try:
+        business_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers.")
+    if len(business_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids can be requested at once.")
+    return crud.get_businesses_by_ids(db, business_ids=business_ids)
+
+
+@app.get("/businesses/search", response_model=schemas.BusinessSearchPage)
+def search_businesses(
+    q: str,
+    location: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=search.MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0, le=10000),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Ranked search over business_name, category and description, e.g.
+    `/businesses/search?q=vegan+bakery&location=Boston`. Every word must match;
+    name matches rank above category matches, which rank above description matches.
+    Pass `next_offset` back as `offset` for the next page.
+    """
+    if not search.tokenize(q):
+        raise HTTPException(status_code=400, detail="q must contain at least one word.")
+    backend = get_search_backend()
+    hits, next_offset = crud.search_businesses(
+        db, backend, q, location=location, category=category, limit=limit, offset=offset
+    )
+    items = [
+        schemas.BusinessSearchHit(**schemas.Business.model_validate(business, from_attributes=True).model_dump(), score=score)
+        for business, score in hits
+    ]
+    return {"items": items, "next_offset": next_offset, "backend": backend.name}
+
+
+@app.get("/businesses/nearby", response_model=List[schemas.NearbyBusiness])
+def get_nearby_businesses(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(1000, gt=0, description="Meters"),
+    k: int = Query(10, ge=1),
+    location: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    """
+    The `k` nearest businesses within `radius` meters of (lat, lon), nearest
+    first, each with its `distance_m`. Businesses without coordinates are left out.
+    """
+    if radius > NEARBY_MAX_RADIUS_M:
+        raise HTTPException(status_code=400, detail=f"radius can be at most {NEARBY_MAX_RADIUS_M:g} meters.")
+    if k > NEARBY_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k can be at most {NEARBY_MAX_K}.")
+    hits = crud.nearby_businesses(db, lat, lon, radius, k, location=location)
+    return [
+        schemas.NearbyBusiness(**schemas.Business.model_validate(business, from_attributes=True).model_dump(), distance_m=distance)
+        for business, distance in hits
+    ]
+
+
+@app.get("/businesses/cache/stats")
+def get_business_cache_stats():
+    return business_cache.stats()
+
+
 @app.get("/businesses/{business_id}", response_model=schemas.Business)
-def get_business(business_id: int, db: Session = Depends(get_db)):
+def get_business(business_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Served from an in-process LRU cache when possible; the database is only
+    queried on a miss. Misses read from the primary, since a lagging replica
+    would keep a stale body cached until the next write. Responses carry a
+    strong ETag; a matching `If-None-Match` gets an empty 304.
+    """
     #correlation_id = request.state.correlation_id
-    business = crud.get_business(db, business_id=business_id)
-    if business is None:
-        raise HTTPException(status_code=404, detail="Business not found")
-    return business
+    cached = business_cache.get(business_id)
+    if cached is None:
+        token = business_cache.token()
+        business = crud.get_business(db, business_id=business_id)
+        if business is None:
+            raise HTTPException(status_code=404, detail="Business not found")
+        body = schemas.Business.model_validate(business, from_attributes=True).model_dump_json().encode()
+        etag = business_cache.put(business_id, body, token)
+    else:
+        body, etag = cached
+
+    if response_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        business_cache.record_not_modified()
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
 @app.delete("/businesses/{business_id}", response_model=schemas.Business)
 def delete_business(business_id: int, db: Session = Depends(get_db), request: Request = None):
     correlation_id = request.state.correlation_id
     business = crud.delete_business(db=db, business_id=business_id, correlation_id=correlation_id)
+    business_cache.invalidate(business_id)
     if business is None:
         raise HTTPException(status_code=404, detail="Business not found")
     return business
@@ -128,7 +368,11 @@ def delete_business(business_id: int, db: Session = Depends(get_db), request: Re
 @app.put("/businesses/{business_id}", response_model=schemas.Business)
 def update_business(business_id: int, business_data: schemas.BusinessUpdate, db: Session = Depends(get_db), request: Request = None):
     correlation_id = request.state.correlation_id
-    updated_business = crud.update_business(db=db, business_id=business_id, business_data=business_data, correlation_id=correlation_id)
+    updated_business = crud.update_business(
+        db=db, business_id=business_id, business_data=business_data, correlation_id=correlation_id,
+        on_write=invalidate_businesses,
+    )
+    business_cache.invalidate(business_id)
     if updated_business is None:
         raise HTTPException(status_code=404, detail="Business not found")
     return updated_business
@@ -137,13 +381,22 @@ def update_business(business_id: int, business_data: schemas.BusinessUpdate, db:
 def get_next_business(
     location: str,
     existing_ids: str,
-    db: Session = Depends(get_db)
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    db: Session = Depends(get_read_db)
 ):
+    """
+    A business in `location` that is not in `existing_ids` ("*" for none);
+    the nearest one to (lat, lon) when both are given, otherwise a random one.
+    """
     existing_ids_list = []
     if existing_ids!="*":
         existing_ids_list = list(map(int, existing_ids.split(",")))
 
-    next_business = crud.get_next_business(db=db, location=location, existing_ids=existing_ids_list)
+    near = (lat, lon) if lat is not None and lon is not None else None
+    next_business = crud.get_next_business(
+        db=db, location=location, existing_ids=existing_ids_list, near=near, radius=NEXT_BUSINESS_RADIUS_M
+    )
     if next_business is None:
         raise HTTPException(
             status_code=404,
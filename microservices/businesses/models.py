@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP, Date, Boolean
+from sqlalchemy import Column, Float, Index, Integer, String, Text, ForeignKey, TIMESTAMP, Date, Boolean, event
 from sqlalchemy.orm import relationship
 from database import Base
+import geo
 
 
 class User(Base):
@@ -32,13 +33,13 @@ class List(Base):
     __tablename__ = "lists"
 
     list_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     location = Column(String(255), nullable=False)
     date = Column(Date, nullable=False)
     description = Column(Text, nullable=True)
 
     user = relationship("User", back_populates="lists")
-    itineraries = relationship("Itinerary", back_populates="list")
+    itineraries = relationship("Itinerary", back_populates="list", cascade="all, delete-orphan")
 
 
 class Itinerary(Base):
@@ -53,6 +54,14 @@ class Itinerary(Base):
 
 class Business(Base):
     __tablename__ = "businesses"
+    __table_args__ = (
+        # get_next_business filters on location and seeks/orders by business_id
+        Index("ix_businesses_location_business_id", "location", "business_id"),
+        # nearby_businesses scans geohash prefix ranges
+        Index("ix_businesses_geohash", "geohash"),
+        # The geocoding backfill writes coordinates back by (address, location)
+        Index("ix_businesses_address_location", "address", "location"),
+    )
 
     business_id = Column(Integer, primary_key=True, index=True)
     business_name = Column(String(255), nullable=False)
@@ -60,5 +69,44 @@ class Business(Base):
     address = Column(String(255), nullable=False)
     category = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
-
-    itineraries = relationship("Itinerary", back_populates="business")
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Derived from latitude/longitude; the default also covers bulk (executemany) inserts
+    geohash = Column(
+        String(geo.GEOHASH_PRECISION),
+        nullable=True,
+        default=lambda context: geo.geohash_for(
+            context.get_current_parameters().get("latitude"), context.get_current_parameters().get("longitude")
+        ),
+    )
+
+    itineraries = relationship("Itinerary", back_populates="business", cascade="all, delete-orphan")
+
+
+@event.listens_for(Business, "before_update")
+def update_geohash(mapper, connection, business):
+    business.geohash = geo.geohash_for(business.latitude, business.longitude)
+
+
+class GeocodeJob(Base):
+    """
+    One row per distinct business (address, location) waiting for (or done
+    with) geocoding; the same street address in two cities is two jobs.
+    The table is the geocoding backfill's work queue, so an interrupted run
+    resumes from it.
+    """
+    __tablename__ = "geocode_jobs"
+    __table_args__ = (
+        # The backfill claims due pending jobs in (address, location) order
+        Index("ix_geocode_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    address = Column(String(255), primary_key=True)
+    location = Column(String(255), primary_key=True)
+    status = Column(String(16), nullable=False, default="pending")  # pending, done, not_found, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(Float, nullable=False, default=0.0)  # Unix timestamp
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    last_error = Column(Text, nullable=True)
+    updated_at = Column(Float, nullable=True)  # Unix timestamp
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+
+# Total size of cached response bodies before the least recently used are dropped
+BUSINESS_CACHE_MAX_BYTES = int(os.getenv("BUSINESS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Bounds staleness when another worker or service changes a business
+BUSINESS_CACHE_TTL_SECONDS = float(os.getenv("BUSINESS_CACHE_TTL_SECONDS", "300"))
+
+
+def make_etag(body: bytes) -> str:
+    """
+    Strong ETag: any change to the serialized body changes the tag.
+    """
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Evaluates an If-None-Match header against `etag` (weak comparison, as RFC 9110 requires).
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class LRUCache:
+    """
+    Serialized responses keyed by id, bounded by the total size of their bodies.
+
+    Readers take a `token()` before querying the database and hand it to
+    `put()`; if the key was invalidated in between, the possibly stale body is
+    not stored.
+    """
+
+    def __init__(self, max_bytes: int = BUSINESS_CACHE_MAX_BYTES, ttl: float = BUSINESS_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[bytes, str, float]]" = OrderedDict()
+        self._size = 0
+        self._invalidations = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] < time.monotonic():
+                if entry is not None:
+                    self._discard(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def token(self) -> int:
+        return self._invalidations
+
+    def put(self, key: Hashable, body: bytes, token: int) -> str:
+        etag = make_etag(body)
+        with self._lock:
+            if token != self._invalidations or len(body) > self.max_bytes:
+                return etag
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (body, etag, time.monotonic() + self.ttl)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+        return etag
+
+    def record_not_modified(self):
+        """
+        Counts a conditional request answered with 304.
+        """
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._invalidations += 1
+            if key in self._entries:
+                self._discard(key)
+
+    def _discard(self, key: Hashable):
+        body = self._entries.pop(key)[0]
+        self._size -= len(body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "not_modified": self.not_modified,
+            }
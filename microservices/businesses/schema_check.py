@@ -0,0 +1,91 @@
+import logging
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import MetaData, event, inspect
+
+
+def declared_indexes(metadata: MetaData) -> Dict[str, Dict[str, Tuple[str, ...]]]:
+    """
+    Returns {table: {index name: column names}} for every index the models declare.
+    """
+    declared = {}
+    for table in metadata.sorted_tables:
+        declared[table.name] = {
+            index.name: tuple(column.name for column in index.columns) for index in table.indexes
+        }
+    return declared
+
+
+def missing_indexes(engine, metadata: MetaData) -> List[str]:
+    """
+    Compares the live database to the models. An index counts as present when
+    the live table has an index (or primary key) on the same columns in the
+    same order, whatever it is called. Returns one message per problem.
+    """
+    inspector = inspect(engine)
+    problems = []
+    for table, indexes in declared_indexes(metadata).items():
+        if not inspector.has_table(table):
+            problems.append(f"{table}: table does not exist")
+            continue
+        live = {tuple(index["column_names"]) for index in inspector.get_indexes(table)}
+        primary_key = inspector.get_pk_constraint(table).get("constrained_columns")
+        if primary_key:
+            live.add(tuple(primary_key))
+        for name, columns in indexes.items():
+            if columns not in live:
+                problems.append(f"{table}: missing index {name} ({', '.join(columns)})")
+    return problems
+
+
+def warn_missing_indexes(engine, metadata: MetaData):
+    """
+    Logs a warning per missing table or index; used at service startup.
+    """
+    try:
+        problems = missing_indexes(engine, metadata)
+    except Exception as e:
+        logging.warning(f"Index check skipped: {e}")
+        return
+    for problem in problems:
+        logging.warning(f"Schema check: {problem}")
+
+
+def capture_statements(engine, run: Callable[[], object]) -> List[tuple]:
+    """
+    Runs `run` and returns the (statement, parameters) pairs it sent to `engine`.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def explain(engine, statement: str, parameters) -> List[str]:
+    """
+    Returns the database's plan for a captured statement, one line per row.
+    """
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+    return [" | ".join(str(value) for value in row) for row in rows]
+
+
+def explain_queries(engine, queries: Dict[str, Callable[[], object]]) -> Dict[str, List[tuple]]:
+    """
+    Runs each named query and returns {name: [(statement, plan lines), ...]}.
+    """
+    plans = {}
+    for name, run in queries.items():
+        plans[name] = [
+            (statement, explain(engine, statement, parameters))
+            for statement, parameters in capture_statements(engine, run)
+        ]
+    return plans
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from datetime import date
 from typing import Optional
 
@@ -60,12 +60,20 @@ class List(ListBase):
         orm_mode = True
 
 
+def blank_to_none(value):
+    # CSV imports send empty cells as ""
+    return None if value == "" else value
+
 class BusinessBase(BaseModel):
     business_name: str
     location: str
     address: str
     category: str
     description: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    _blank_coordinates = field_validator("latitude", "longitude", mode="before")(blank_to_none)
 
 
 class BusinessCreate(BusinessBase):
@@ -83,16 +91,38 @@ class BusinessUpdate(BaseModel):
     address: Optional[str] = None
     category: Optional[str] = None
     description: Optional[str] = None
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
     class Config:
         orm_mode = True
 
+class BulkImportError(BaseModel):
+    row: int
+    error: str
+
+class BulkImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: list[BulkImportError] = []
+
 class Business(BusinessBase):
     business_id: int
 
     class Config:
         orm_mode = True
 
+class BusinessSearchHit(Business):
+    score: float
+
+class BusinessSearchPage(BaseModel):
+    items: list[BusinessSearchHit]
+    next_offset: Optional[int] = None
+    backend: str
+
+class NearbyBusiness(Business):
+    distance_m: float
+
 class ItineraryBase(BaseModel):
     list_id: int
     business_id: int
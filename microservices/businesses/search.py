@@ -0,0 +1,310 @@
+import abc
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, inspect, select, text
+
+import models
+
+# "auto" picks FTS5 on SQLite and FULLTEXT on MySQL; "memory" forces the in-process index
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# Largest page a search may ask for
+MAX_SEARCH_LIMIT = 100
+# Matches in business_name count more than in category, which count more than in description
+FIELD_WEIGHTS = {"business_name": 10.0, "category": 5.0, "description": 1.0}
+SEARCHED_FIELDS = tuple(FIELD_WEIGHTS)
+
+FTS_TABLE = "businesses_fts"
+FULLTEXT_INDEX = "ft_businesses_text"
+
+
+def tokenize(value: str) -> List[str]:
+    """
+    Lowercases, strips accents and splits on anything that isn't a letter or
+    digit, roughly like FTS5's unicode61 tokenizer, so all backends agree on terms.
+    """
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return re.findall(r"\w+", stripped)
+
+
+class SearchBackend(abc.ABC):
+    """
+    A backend returns (business_id, score) pairs for businesses matching every
+    term of the query, best first; ties are broken by business_id so paging is stable.
+    """
+
+    name = ""
+
+    def setup(self, engine):
+        pass
+
+    @abc.abstractmethod
+    def search(self, db, terms: List[str], location: Optional[str], category: Optional[str],
+               limit: int, offset: int) -> List[Tuple[int, float]]:
+        pass
+
+
+class SQLiteFTS5Search(SearchBackend):
+    """
+    FTS5 table over the searched columns, using the businesses table as
+    external content (the text is not stored twice) and ranked with bm25.
+    Triggers keep it in sync with every insert, update and delete, including
+    bulk imports and writes made by other processes.
+    """
+
+    name = "sqlite-fts5"
+
+    TRIGGERS = {
+        "businesses_fts_insert": f"""
+            CREATE TRIGGER businesses_fts_insert AFTER INSERT ON businesses BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, business_name, category, description)
+                VALUES (new.business_id, new.business_name, new.category, new.description);
+            END""",
+        "businesses_fts_delete": f"""
+            CREATE TRIGGER businesses_fts_delete AFTER DELETE ON businesses BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, business_name, category, description)
+                VALUES ('delete', old.business_id, old.business_name, old.category, old.description);
+            END""",
+        "businesses_fts_update": f"""
+            CREATE TRIGGER businesses_fts_update AFTER UPDATE ON businesses BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, business_name, category, description)
+                VALUES ('delete', old.business_id, old.business_name, old.category, old.description);
+                INSERT INTO {FTS_TABLE}(rowid, business_name, category, description)
+                VALUES (new.business_id, new.business_name, new.category, new.description);
+            END""",
+    }
+
+    def setup(self, engine):
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "business_name, category, description, "
+                "content='businesses', content_rowid='business_id', tokenize='unicode61 remove_diacritics 2')"
+            ))
+            existing = set(conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'businesses'"
+            )).scalars())
+            missing = [name for name in self.TRIGGERS if name not in existing]
+            for name in missing:
+                conn.execute(text(self.TRIGGERS[name]))
+            # Without the triggers rows may have changed unseen (first run, or the table was recreated)
+            if missing:
+                logging.info(f"Rebuilding {FTS_TABLE} from the businesses table")
+                conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    def search(self, db, terms, location, category, limit, offset):
+        weights = ", ".join(str(FIELD_WEIGHTS[field]) for field in SEARCHED_FIELDS)
+        # Quoted terms are matched literally, so FTS5 query syntax in user input is inert
+        params = {"match": " ".join(f'"{term}"' for term in terms), "limit": limit, "offset": offset}
+        filters = ""
+        if location is not None:
+            filters += " AND b.location = :location"
+            params["location"] = location
+        if category is not None:
+            filters += " AND b.category = :category"
+            params["category"] = category
+        rows = db.execute(text(
+            f"SELECT b.business_id, -bm25({FTS_TABLE}, {weights}) AS score "
+            f"FROM {FTS_TABLE} JOIN businesses b ON b.business_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match{filters} "
+            "ORDER BY score DESC, b.business_id LIMIT :limit OFFSET :offset"
+        ), params)
+        return [(business_id, score) for business_id, score in rows]
+
+
+class MySQLFulltextSearch(SearchBackend):
+    """
+    InnoDB FULLTEXT index over the searched columns, which MySQL maintains on
+    every write. Terms are required with boolean mode (`+term`); the relevance
+    score is MySQL's own. Note that InnoDB ignores stopwords and terms shorter
+    than innodb_ft_min_token_size (3 by default).
+    """
+
+    name = "mysql-fulltext"
+
+    def setup(self, engine):
+        indexes = {index["name"] for index in inspect(engine).get_indexes("businesses")}
+        if FULLTEXT_INDEX not in indexes:
+            logging.info(f"Creating FULLTEXT index {FULLTEXT_INDEX} on businesses")
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE businesses ADD FULLTEXT INDEX {FULLTEXT_INDEX} ({', '.join(SEARCHED_FIELDS)})"
+                ))
+
+    def search(self, db, terms, location, category, limit, offset):
+        match = f"MATCH ({', '.join(SEARCHED_FIELDS)}) AGAINST (:match IN BOOLEAN MODE)"
+        params = {"match": " ".join(f'+"{term}"' for term in terms), "limit": limit, "offset": offset}
+        filters = ""
+        if location is not None:
+            filters += " AND location = :location"
+            params["location"] = location
+        if category is not None:
+            filters += " AND category = :category"
+            params["category"] = category
+        rows = db.execute(text(
+            f"SELECT business_id, {match} AS score FROM businesses "
+            f"WHERE {match}{filters} "
+            "ORDER BY score DESC, business_id LIMIT :limit OFFSET :offset"
+        ), params)
+        return [(business_id, float(score)) for business_id, score in rows]
+
+
+class InvertedIndexSearch(SearchBackend):
+    """
+    In-process inverted index for databases without a full-text index.
+
+    Built from the table at startup and kept in sync with writes made through
+    `session_factory` (ORM creates, updates and deletes are applied on commit;
+    bulk inserts are caught up by reading rows past the highest indexed id).
+    Writes from other processes are not seen, so use it for development or a
+    single-process deployment only. Scores are field-weighted TF-IDF.
+    """
+
+    name = "memory"
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self.postings: Dict[str, Dict[int, float]] = defaultdict(dict)  # term -> {business_id: weighted tf}
+        self.documents: Dict[int, Tuple[List[str], str, str]] = {}  # business_id -> (terms, location, category)
+        self.high_water = 0
+        self._lock = threading.Lock()
+
+    def setup(self, engine):
+        with self._lock:
+            self.postings.clear()
+            self.documents.clear()
+            self.high_water = 0
+        self.catch_up()
+        for name, listener in (
+            ("after_flush", self._collect_flush),
+            ("do_orm_execute", self._collect_statement),
+            ("after_commit", self._apply),
+            ("after_rollback", self._discard),
+        ):
+            if not event.contains(self.session_factory, name, listener):
+                event.listen(self.session_factory, name, listener)
+
+    def _add(self, business_id: int, values: dict):
+        weights = defaultdict(float)
+        for field in SEARCHED_FIELDS:
+            for term in tokenize(values[field] or ""):
+                weights[term] += FIELD_WEIGHTS[field]
+        for term, weight in weights.items():
+            self.postings[term][business_id] = weight
+        self.documents[business_id] = (list(weights), values["location"], values["category"])
+        self.high_water = max(self.high_water, business_id)
+
+    def _remove(self, business_id: int):
+        document = self.documents.pop(business_id, None)
+        if document is None:
+            return
+        for term in document[0]:
+            postings = self.postings[term]
+            postings.pop(business_id, None)
+            if not postings:
+                del self.postings[term]
+        # SQLite hands the highest id out again once it is deleted
+        if business_id == self.high_water:
+            self.high_water = max(self.documents, default=0)
+
+    def catch_up(self, batch_size: int = 10000):
+        """
+        Indexes rows with an id above the highest one seen so far.
+        """
+        columns = [getattr(models.Business, field) for field in ("business_id", "location") + SEARCHED_FIELDS]
+        db = self.session_factory()
+        try:
+            statement = (
+                select(*columns)
+                .where(models.Business.business_id > self.high_water)
+                .order_by(models.Business.business_id)
+                .execution_options(yield_per=batch_size)
+            )
+            for row in db.execute(statement).mappings():
+                with self._lock:
+                    self._add(row["business_id"], row)
+        finally:
+            db.close()
+
+    def _collect_flush(self, session, flush_context):
+        # Keyed by backend so each instance listening on the factory sees every change
+        changes = session.info.setdefault((self, "changes"), {})
+        for instance in session.new | session.dirty:
+            if isinstance(instance, models.Business):
+                changes[instance.business_id] = {
+                    field: getattr(instance, field) for field in ("location",) + SEARCHED_FIELDS
+                }
+        for instance in session.deleted:
+            if isinstance(instance, models.Business):
+                changes[instance.business_id] = None
+
+    def _collect_statement(self, orm_execute_state):
+        if orm_execute_state.is_insert and orm_execute_state.bind_mapper is inspect(models.Business):
+            orm_execute_state.session.info[(self, "catch_up")] = True
+
+    def _apply(self, session):
+        changes = session.info.pop((self, "changes"), {})
+        with self._lock:
+            for business_id, values in changes.items():
+                self._remove(business_id)
+                if values is not None:
+                    self._add(business_id, values)
+        if session.info.pop((self, "catch_up"), False):
+            self.catch_up()
+
+    def _discard(self, session):
+        session.info.pop((self, "changes"), None)
+        session.info.pop((self, "catch_up"), None)
+
+    def search(self, db, terms, location, category, limit, offset):
+        with self._lock:
+            postings = [self.postings.get(term, {}) for term in terms]
+            if not all(postings):
+                return []
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for other in postings[1:]:
+                candidates.intersection_update(other)
+            total = len(self.documents)
+            idf = [math.log(1 + total / len(p)) for p in postings]
+            scored = []
+            for business_id in candidates:
+                _, business_location, business_category = self.documents[business_id]
+                if location is not None and business_location != location:
+                    continue
+                if category is not None and business_category != category:
+                    continue
+                score = sum(p[business_id] * weight for p, weight in zip(postings, idf))
+                scored.append((business_id, score))
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored[offset:offset + limit]
+
+
+def has_fts5(engine) -> bool:
+    with engine.connect() as conn:
+        options = set(conn.execute(text("PRAGMA compile_options")).scalars())
+    return "ENABLE_FTS5" in options
+
+
+def make_backend(engine, session_factory, mode: str = SEARCH_BACKEND) -> SearchBackend:
+    """
+    Picks and sets up the best backend for the database behind `engine`.
+    """
+    dialect = engine.dialect.name
+    if mode == "auto" and dialect == "sqlite" and has_fts5(engine):
+        backend = SQLiteFTS5Search()
+    elif mode == "auto" and dialect == "mysql":
+        backend = MySQLFulltextSearch()
+    else:
+        backend = InvertedIndexSearch(session_factory)
+    backend.setup(engine)
+    logging.info(f"Business search uses the {backend.name} backend")
+    return backend
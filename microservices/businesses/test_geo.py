@@ -0,0 +1,100 @@
+import random
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+import crud
+import geo
+import models
+import schemas
+
+
+def add_business(db, name, lat, lon, location="Copenhagen"):
+    return crud.create_business(db, schemas.BusinessCreate(
+        business_name=name, location=location, address="1 Main St", category="food",
+        description="test", latitude=lat, longitude=lon,
+    ))
+
+
+def test_encode_matches_reference_geohash():
+    assert geo.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    # Coarser cells are prefixes of finer ones
+    assert geo.encode(-33.8688, 151.2093).startswith(geo.encode(-33.8688, 151.2093, 4))
+
+
+def test_block_covers_its_radius_across_the_antimeridian():
+    for precision in (3, 5, 7):
+        cells = geo.block(0.0, 179.999, precision)
+        assert len(cells) == 9
+        radius = geo.covered_radius(0.0, precision)
+        # A point just inside the covered radius on the other side of the antimeridian
+        other = geo.encode(0.0, -180 + (radius * 0.99 / geo.METERS_PER_DEGREE - 0.001), precision)
+        assert other in cells
+
+
+def test_nearby_matches_brute_force(db):
+    rng = random.Random(7)
+    points = {}
+    for i in range(400):
+        lat, lon = 55.68 + rng.uniform(-0.05, 0.05), 12.57 + rng.uniform(-0.08, 0.08)
+        points[add_business(db, f"b{i}", lat, lon).business_id] = (lat, lon)
+    add_business(db, "no coordinates", None, None)
+
+    for _ in range(20):
+        lat, lon = 55.68 + rng.uniform(-0.05, 0.05), 12.57 + rng.uniform(-0.08, 0.08)
+        radius, k = rng.choice([200, 1000, 5000]), rng.choice([1, 5, 20])
+        expected = sorted(
+            (geo.haversine(lat, lon, *point), business_id) for business_id, point in points.items()
+        )
+        expected = [business_id for distance, business_id in expected if distance <= radius][:k]
+
+        hits = crud.nearby_businesses(db, lat, lon, radius, k)
+        assert [business.business_id for business, _ in hits] == expected
+
+
+def test_geohash_follows_updates(db):
+    business = add_business(db, "mover", 55.0, 12.0)
+    assert business.geohash == geo.encode(55.0, 12.0)
+
+    crud.update_business(db, business.business_id, schemas.BusinessUpdate(latitude=40.0, longitude=-74.0), "test")
+    assert business.geohash == geo.encode(40.0, -74.0)
+
+    crud.bulk_create_businesses(db, [(1, {
+        "business_name": "bulk", "location": "NYC", "address": "x", "category": "food",
+        "description": "x", "latitude": 40.7, "longitude": -74.0,
+    })])
+    assert db.query(models.Business).filter_by(business_name="bulk").one().geohash == geo.encode(40.7, -74.0)
+
+
+def test_nearby_and_next_endpoints(db):
+    import main
+
+    far = add_business(db, "far", 55.70, 12.60)
+    near = add_business(db, "near", 55.6761, 12.5684)
+    client = TestClient(main.app)
+
+    response = client.get("/businesses/nearby", params={"lat": 55.6760, "lon": 12.5683, "radius": 500})
+    assert [item["business_name"] for item in response.json()] == ["near"]
+    assert response.json()[0]["distance_m"] < 20
+
+    assert client.get("/businesses/nearby", params={"lat": 0, "lon": 0, "radius": 10 ** 7}).status_code == 400
+
+    response = client.get("/businesses/next/", params={
+        "location": "Copenhagen", "existing_ids": str(near.business_id), "lat": 55.6760, "lon": 12.5683,
+    })
+    assert response.json()["business_id"] == far.business_id
+
+
+def test_ensure_columns_upgrades_an_old_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE businesses (business_id INTEGER PRIMARY KEY, business_name VARCHAR(255), "
+            "location VARCHAR(255), address VARCHAR(255), category VARCHAR(255), description TEXT)"
+        ))
+
+    geo.ensure_columns(engine, models.Business.__table__)
+
+    inspector = inspect(engine)
+    assert {"latitude", "longitude", "geohash"} <= {c["name"] for c in inspector.get_columns("businesses")}
+    assert "ix_businesses_geohash" in {index["name"] for index in inspector.get_indexes("businesses")}
@@ -0,0 +1,206 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+import crud
+import geo
+import geocoding
+import models
+import schemas
+
+COORDINATES = {
+    "1 Main St, NYC": (40.71, -74.0), "2 Side St, NYC": (51.5, -0.12), "3 High St, NYC": (48.85, 2.35),
+    "1 Main St, Boston": (42.36, -71.06),
+}
+
+
+class StubNominatim:
+    """
+    Answers like Nominatim's /search; `failures` makes a query fail that many times first.
+    Queries are "address, location" and are recorded in `calls`.
+    """
+
+    def __init__(self, failures=None, status_code=503):
+        self.failures = dict(failures or {})
+        self.status_code = status_code
+        self.calls = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        query = request.url.params["q"]
+        self.calls.append(query)
+        if self.failures.get(query, 0) > 0:
+            self.failures[query] -= 1
+            return httpx.Response(self.status_code)
+        if query not in COORDINATES:
+            return httpx.Response(200, json=[])
+        lat, lon = COORDINATES[query]
+        return httpx.Response(200, json=[{"lat": str(lat), "lon": str(lon)}])
+
+
+def add_businesses(db, addresses, location="NYC"):
+    for i, address in enumerate(addresses):
+        crud.create_business(db, schemas.BusinessCreate(
+            business_name=f"b{i}", location=location, address=address, category="food", description="x"
+        ))
+
+
+def run_pipeline(stub, limit=None, **options):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(stub)) as client:
+            options.setdefault("rate", 1000)
+            pipeline = geocoding.GeocodePipeline(geocoding.NominatimGeocoder(client, "http://nominatim.test/search"), **options)
+            await pipeline.enqueue()
+            await pipeline.run(limit=limit)
+            return pipeline, await pipeline.counts()
+    return asyncio.run(run())
+
+
+def test_each_address_is_geocoded_once_and_written_back(db):
+    add_businesses(db, ["1 Main St", "2 Side St", "1 Main St", "Nowhere"])
+    stub = StubNominatim()
+    updated = []
+
+    pipeline, counts = run_pipeline(stub, on_write=updated.extend)
+
+    assert sorted(stub.calls) == ["1 Main St, NYC", "2 Side St, NYC", "Nowhere, NYC"]
+    assert counts == {"pending": 0, "done": 2, "not_found": 1, "failed": 0}
+    assert sorted(updated) == [1, 2, 3]
+    business = db.get(models.Business, 3)
+    assert (business.latitude, business.longitude) == COORDINATES["1 Main St, NYC"]
+    assert business.geohash == geo.encode(*COORDINATES["1 Main St, NYC"])
+    assert db.get(models.Business, 4).latitude is None
+
+
+def test_transient_errors_are_retried_then_given_up(db):
+    add_businesses(db, ["1 Main St", "2 Side St"])
+    stub = StubNominatim(failures={"1 Main St, NYC": 1, "2 Side St, NYC": 10})
+
+    _, counts = run_pipeline(stub, retry_seconds=0, max_attempts=2)
+    assert counts == {"pending": 2, "done": 0, "not_found": 0, "failed": 0}
+
+    _, counts = run_pipeline(stub, retry_seconds=0, max_attempts=2)
+    assert counts == {"pending": 0, "done": 1, "not_found": 0, "failed": 1}
+    assert "HTTP 503" in db.get(models.GeocodeJob, ("2 Side St", "NYC")).last_error
+
+
+def test_an_interrupted_run_resumes_without_repeating_lookups(db):
+    add_businesses(db, ["1 Main St", "2 Side St", "3 High St"])
+    stub = StubNominatim()
+
+    _, counts = run_pipeline(stub, limit=2, write_batch=1)
+    assert counts["done"] == 2
+
+    _, counts = run_pipeline(stub)
+    assert counts["done"] == 3
+    assert sorted(stub.calls) == ["1 Main St, NYC", "2 Side St, NYC", "3 High St, NYC"]
+
+
+def test_requests_are_rate_limited(db):
+    add_businesses(db, ["1 Main St", "2 Side St", "3 High St"])
+
+    start = time.monotonic()
+    pipeline, _ = run_pipeline(StubNominatim(), rate=20, concurrency=3)
+
+    assert time.monotonic() - start >= 2 / 20
+    assert pipeline.progress()["requests"] == 3
+
+
+def test_status_endpoint(db):
+    import main
+
+    add_businesses(db, ["1 Main St"])
+    run_pipeline(StubNominatim())
+
+    body = TestClient(main.app).get("/admin/geocode").json()
+    assert body["jobs"]["done"] == 1
+    assert body["enabled"] is False
+
+
+def test_businesses_added_after_their_address_was_geocoded_get_its_coordinates(db):
+    add_businesses(db, ["1 Main St"])
+    stub = StubNominatim()
+    run_pipeline(stub)
+    add_businesses(db, ["1 Main St"])  # Business 2, at an address that already has a done job
+    updated = []
+
+    _, counts = run_pipeline(stub, on_write=updated.extend)
+
+    assert stub.calls == ["1 Main St, NYC"]
+    assert updated == [2]
+    business = db.get(models.Business, 2)
+    db.refresh(business)
+    assert (business.latitude, business.longitude) == COORDINATES["1 Main St, NYC"]
+    assert business.geohash == geo.encode(*COORDINATES["1 Main St, NYC"])
+    assert counts["done"] == 1
+
+
+def test_moving_a_business_clears_its_coordinates_and_requeues_it(db):
+    add_businesses(db, ["1 Main St", "2 Side St"])
+    stub = StubNominatim()
+    run_pipeline(stub)
+
+    moved = crud.update_business(db, 1, schemas.BusinessUpdate(address="3 High St"), "test")
+    assert (moved.latitude, moved.longitude, moved.geohash) == (None, None, None)
+    assert db.get(models.GeocodeJob, ("3 High St", "NYC")).status == geocoding.PENDING
+
+    run_pipeline(stub)
+    db.refresh(moved)
+    assert (moved.latitude, moved.longitude) == COORDINATES["3 High St, NYC"]
+
+    # An address that is already geocoded is copied without a lookup
+    moved = crud.update_business(db, 1, schemas.BusinessUpdate(address="2 Side St"), "test")
+    assert (moved.latitude, moved.longitude) == COORDINATES["2 Side St, NYC"]
+    assert stub.calls.count("2 Side St, NYC") == 1
+
+    # Coordinates sent along with the new address are kept
+    moved = crud.update_business(db, 1, schemas.BusinessUpdate(address="9 Far Rd", latitude=1.0, longitude=2.0), "test")
+    assert (moved.latitude, moved.longitude) == (1.0, 2.0)
+    assert db.get(models.GeocodeJob, ("9 Far Rd", "NYC")) is None
+
+
+def test_the_same_address_in_another_city_is_geocoded_separately(db):
+    add_businesses(db, ["1 Main St"])
+    add_businesses(db, ["1 Main St"], location="Boston")
+    stub = StubNominatim()
+
+    _, counts = run_pipeline(stub)
+
+    assert sorted(stub.calls) == ["1 Main St, Boston", "1 Main St, NYC"]
+    assert counts["done"] == 2
+    assert (db.get(models.Business, 1).latitude, db.get(models.Business, 2).latitude) == (40.71, 42.36)
+
+    # Moving to the other city queues the address there, even though the street is unchanged
+    moved = crud.update_business(db, 1, schemas.BusinessUpdate(location="Chicago"), "test")
+    assert moved.latitude is None
+    assert db.get(models.GeocodeJob, ("1 Main St", "Chicago")).status == geocoding.PENDING
+
+
+def test_update_that_copies_coordinates_invalidates_every_updated_business(db):
+    import main
+
+    add_businesses(db, ["2 Side St", "1 Main St"])
+    db.add(models.GeocodeJob(
+        address="1 Main St", location="NYC", status=geocoding.DONE, attempts=1, latitude=40.71, longitude=-74.0
+    ))
+    db.commit()
+    client = TestClient(main.app)
+    assert client.get("/businesses/2").json()["latitude"] is None  # Cached without coordinates
+
+    client.put("/businesses/1", json={"address": "1 Main St"})
+
+    assert client.get("/businesses/2").json()["latitude"] == 40.71
+
+
+def test_update_is_rolled_back_when_the_address_cannot_be_queued(db):
+    add_businesses(db, ["1 Main St"])
+    models.GeocodeJob.__table__.drop(bind=db.get_bind())
+
+    with pytest.raises(OperationalError):
+        crud.update_business(db, 1, schemas.BusinessUpdate(address="3 High St"), "test")
+    db.rollback()
+
+    assert db.get(models.Business, 1).address == "1 Main St"
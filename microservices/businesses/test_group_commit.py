@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import crud
+import database
+import geo
+import group_commit
+import models
+import schemas
+
+
+def business(i, **overrides):
+    fields = dict(business_name=f"b{i}", location="NYC", address=f"{i} Main St", category="food", description="")
+    fields.update(overrides)
+    return schemas.BusinessCreate(**fields)
+
+
+@pytest.fixture
+def writer(db):
+    writer = group_commit.GroupCommitWriter(database.SessionLocal, crud.create_businesses, window_ms=20, name="test")
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def test_concurrent_creates_share_batches(db, writer):
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        created = list(pool.map(writer.write, [business(i) for i in range(60)]))
+
+    assert [b.business_name for b in created] == [f"b{i}" for i in range(60)]
+    assert len({b.business_id for b in created}) == 60
+    assert db.query(models.Business).count() == 60
+    # 60 creates from 20 threads don't need 60 commits
+    assert writer.counters["batches"] < 60
+    assert writer.counters["items"] == 60
+
+
+def test_returned_rows_are_loaded_without_a_refresh(db, writer):
+    created = writer.write(business(1, latitude=40.71, longitude=-74.0))
+
+    # The writer's session is closed; reading an expired attribute would raise
+    assert created.business_id == 1
+    assert created.geohash == geo.geohash_for(40.71, -74.0)
+
+
+def test_a_failing_item_only_fails_its_caller(db, writer):
+    # Skips validation, so the NOT NULL constraint fails inside the batch
+    bad = schemas.BusinessCreate.model_construct(**business(0).model_dump(exclude={"business_name"}), business_name=None)
+    futures = [writer.submit(item) for item in (business(1), bad, business(2))]
+
+    assert futures[0].result().business_name == "b1"
+    with pytest.raises(IntegrityError):
+        futures[1].result()
+    assert futures[2].result().business_name == "b2"
+    assert writer.counters["fallbacks"] == 1
+    assert sorted(name for (name,) in db.query(models.Business.business_name)) == ["b1", "b2"]
+
+
+def test_insert_returning_falls_back_without_returning_support(db, monkeypatch):
+    monkeypatch.setattr(database.engine.dialect, "insert_executemany_returning_sort_by_parameter_order", False)
+
+    created = group_commit.insert_returning(db, models.Business, [business(i).model_dump() for i in range(3)])
+    db.commit()
+
+    assert [b.business_id for b in created] == [1, 2, 3]
+
+
+def test_submit_requires_a_running_writer():
+    writer = group_commit.GroupCommitWriter(database.SessionLocal, crud.create_businesses)
+    with pytest.raises(RuntimeError):
+        writer.submit(business(1))
+
+
+def test_on_commit_runs_in_the_callers_thread(db):
+    threads = []
+    writer = group_commit.GroupCommitWriter(
+        database.SessionLocal, crud.create_businesses, on_commit=lambda: threads.append(threading.get_ident())
+    )
+    writer.start()
+    try:
+        writer.write(business(1))
+    finally:
+        writer.stop()
+
+    assert threads == [threading.get_ident()]
+
+
+def test_stop_fails_items_it_could_not_write(db):
+    started, release = threading.Event(), threading.Event()
+
+    def slow_batch(db, items):
+        started.set()
+        release.wait()
+        return crud.create_businesses(db, items)
+
+    writer = group_commit.GroupCommitWriter(database.SessionLocal, slow_batch, window_ms=0, name="slow")
+    writer.start()
+    first = writer.submit(business(1))
+    started.wait(timeout=1)
+    queued = writer.submit(business(2))
+
+    writer.stop(timeout=0.05)
+    release.set()
+
+    with pytest.raises(RuntimeError, match="stopped before writing"):
+        queued.result(timeout=1)
+    assert first.result(timeout=1).business_name == "b1"
+    with pytest.raises(RuntimeError, match="not running"):
+        writer.submit(business(3))
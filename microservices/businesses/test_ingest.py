@@ -0,0 +1,78 @@
+import asyncio
+
+import ingest
+import models
+
+
+async def stream(data: bytes, chunk_size: int = 7):
+    for i in range(0, len(data), chunk_size):
+        yield data[i:i + chunk_size]
+
+
+def run_import(db, data: bytes, data_format: str, **kwargs):
+    return asyncio.run(ingest.import_businesses(stream(data), data_format, db, **kwargs))
+
+
+def test_csv_import_in_batches(db):
+    data = (
+        "business_name,location,address,category,description\n"
+        "Joe's,NYC,1 Main St,food,\"Pizza, slices\"\n"
+        "Ann's,NYC,2 Main St,food,\"Multi\nline\"\n"
+        "Bob's,NYC,3 Main St,bar,Drinks\n"
+    ).encode()
+
+    result = run_import(db, data, "csv", batch_size=2)
+
+    assert result.inserted == 3
+    assert result.failed == 0
+    descriptions = {b.business_name: b.description for b in db.query(models.Business)}
+    assert descriptions["Joe's"] == "Pizza, slices"
+    assert descriptions["Ann's"] == "Multi\nline"
+
+
+def test_ndjson_reports_bad_rows_without_aborting(db):
+    data = (
+        b'{"business_name": "A", "location": "NYC", "address": "1", "category": "food", "description": "x"}\n'
+        b'not json\n'
+        b'{"business_name": "B", "location": "NYC"}\n'
+        b'\n'
+        b'{"business_name": "C", "location": "NYC", "address": "3", "category": "food", "description": "z"}'
+    )
+
+    result = run_import(db, data, "ndjson", batch_size=10)
+
+    assert result.inserted == 2
+    assert result.failed == 2
+    assert [e.row for e in result.errors] == [2, 3]
+    assert "address" in result.errors[1].error
+
+
+def test_detect_format():
+    assert ingest.detect_format("text/csv; charset=utf-8") == "csv"
+    assert ingest.detect_format("application/x-ndjson") == "ndjson"
+    assert ingest.detect_format("application/json") is None
+
+
+def csv_rows(text: str, **kwargs):
+    async def collect():
+        return [row async for row in ingest.iter_csv_rows(ingest.iter_lines(stream(text.encode())), **kwargs)]
+    return asyncio.run(collect())
+
+
+def test_long_multiline_records_are_cut_off_and_reading_resumes():
+    long_field = "\n".join(["x" * 50] * 10)
+    rows = csv_rows(
+        "name,notes\n"
+        f'a,"{long_field}"\n'
+        'b,"short\nfield"\n',
+        max_record_bytes=200,
+    )
+
+    assert rows == [(1, "Record exceeds 200 bytes (unterminated quote?)"), (2, {"name": "b", "notes": "short\nfield"})]
+
+
+def test_unterminated_quote_is_reported_without_buffering_the_rest():
+    rows = csv_rows("name,notes\na,ok\nb,\"open\n" + "c,more\n" * 1000, max_record_bytes=100)
+
+    assert rows == [(1, {"name": "a", "notes": "ok"}), (2, "Record exceeds 100 bytes (unterminated quote?)")]
+    assert csv_rows('name,notes\nb,"open\nc,more\n') == [(1, "Unterminated quoted field")]
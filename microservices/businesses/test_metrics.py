@@ -0,0 +1,71 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from sqlalchemy import text
+
+import metrics
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        return {"item_id": item_id}
+
+    @app.get("/metrics")
+    def get_metrics():
+        return metrics.metrics_response()
+
+    return TestClient(app)
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+    histogram.observe(("/a",), 5.0)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+
+
+def test_requests_are_labelled_by_route_template():
+    client = make_client()
+    client.get("/items/1")
+    client.get("/items/2")
+    client.get("/missing")
+
+    body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in body
+
+
+def test_pool_gauges_report_each_engine(db):
+    import database
+
+    metrics.track_engines({"primary": database.engine})
+    db.execute(text("SELECT 1"))  # The open session holds a connection
+    body = metrics.registry.render()
+
+    assert 'db_pool_checked_out_connections{engine="primary"} 1' in body
+
+
+def test_service_serves_its_metrics(db):
+    import main
+
+    client = TestClient(main.app)
+    client.get("/businesses/cache/stats")
+
+    body = client.get("/metrics").text
+
+    assert 'route="/businesses/cache/stats"' in body
+    assert 'db_pool_size{engine="primary"}' in body
+    assert "# TYPE geocode_jobs gauge" in body
+    assert 'group_commit_writes{writer="businesses",kind="items"}' in body
@@ -0,0 +1,33 @@
+from datetime import date
+
+import crud
+import models
+
+
+def add_list_with_itineraries(db):
+    db.add(models.List(user_id=1, location="NYC", date=date(2024, 6, 1)))
+    db.add_all(
+        models.Business(business_name=f"b{i}", location="NYC", address=f"{i} Main St", category="food", description="")
+        for i in range(2)
+    )
+    db.flush()
+    db.add_all(models.Itinerary(list_id=1, business_id=business_id) for business_id in (1, 2))
+    db.commit()
+
+
+def test_deleting_a_business_deletes_its_itineraries(db):
+    add_list_with_itineraries(db)
+
+    assert crud.delete_business(db, 1, "test") is not None
+
+    assert [row.business_id for row in db.query(models.Itinerary)] == [2]
+
+
+def test_deleting_a_list_deletes_its_itineraries(db):
+    add_list_with_itineraries(db)
+
+    db.delete(db.get(models.List, 1))
+    db.commit()
+
+    assert db.query(models.Itinerary).count() == 0
+    assert db.query(models.Business).count() == 2
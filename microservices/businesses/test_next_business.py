@@ -0,0 +1,53 @@
+import crud
+import models
+
+
+def add_businesses(db, location, count):
+    businesses = [
+        models.Business(
+            business_name=f"Business {i}",
+            location=location,
+            address=f"{i} Main St",
+            category="food",
+            description="test",
+        )
+        for i in range(count)
+    ]
+    db.add_all(businesses)
+    db.commit()
+    return [b.business_id for b in businesses]
+
+
+def test_next_business_stays_in_location(db):
+    add_businesses(db, "NYC", 20)
+    add_businesses(db, "Boston", 20)
+
+    for _ in range(50):
+        business = crud.get_next_business(db, location="NYC", existing_ids=[])
+        assert business.location == "NYC"
+
+
+def test_next_business_skips_existing_ids(db):
+    ids = add_businesses(db, "NYC", 10)
+    remaining = ids[4]
+
+    for _ in range(50):
+        existing = [i for i in ids if i != remaining]
+        business = crud.get_next_business(db, location="NYC", existing_ids=existing)
+        assert business.business_id == remaining
+
+
+def test_next_business_returns_none_when_exhausted(db):
+    ids = add_businesses(db, "NYC", 5)
+
+    assert crud.get_next_business(db, location="NYC", existing_ids=ids) is None
+    assert crud.get_next_business(db, location="Nowhere", existing_ids=[]) is None
+
+
+def test_get_businesses_by_ids_keeps_request_order(db):
+    ids = add_businesses(db, "NYC", 5)
+    requested = [ids[3], 999999, ids[0], ids[3], ids[1]]
+
+    businesses = crud.get_businesses_by_ids(db, business_ids=requested)
+
+    assert [b.business_id for b in businesses] == [ids[3], ids[0], ids[1]]
@@ -0,0 +1,101 @@
+import os
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+
+
+def make_client(directory, **kwargs):
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware, directory=str(directory), **kwargs)
+
+    @app.get("/work")
+    def work():
+        return {"total": sum(i * i for i in range(20000))}
+
+    @app.get("/async-work")
+    async def async_work():
+        return {"total": sum(i * i for i in range(20000))}
+
+    return TestClient(app)
+
+
+def profiled_functions(directory, details) -> set:
+    stats = pstats.Stats(os.path.join(directory, details["file"]))
+    return {name for _, _, name in stats.stats}
+
+
+def test_requests_without_the_header_are_not_profiled(tmp_path):
+    client = make_client(tmp_path, token="secret")
+
+    client.get("/work")
+    client.get("/work", headers={"X-Profile": "wrong"})
+
+    assert profiling.list_profiles(str(tmp_path)) == []
+
+
+def test_header_writes_a_profile_named_by_correlation_id(tmp_path):
+    client = make_client(tmp_path, token="secret")
+
+    response = client.get("/work", headers={"X-Profile": "secret", "X-Correlation-ID": "abc-123"})
+
+    assert response.status_code == 200
+    [details] = profiling.list_profiles(str(tmp_path))
+    assert details["correlation_id"] == "abc-123"
+    assert details["mode"] == "cprofile"
+    assert details["path"] == "/work"
+    assert details["file"].endswith("-abc-123.prof")
+    assert profiling.profile_path(details["file"], str(tmp_path)) is not None
+    # The sync endpoint runs in a threadpool worker, not the thread that enabled the profiler
+    assert "work" in profiled_functions(tmp_path, details)
+
+
+def test_async_endpoints_are_profiled_on_the_event_loop(tmp_path):
+    client = make_client(tmp_path, token="secret")
+
+    client.get("/async-work", headers={"X-Profile": "secret"})
+
+    [details] = profiling.list_profiles(str(tmp_path))
+    assert "async_work" in profiled_functions(tmp_path, details)
+
+
+def test_unprofiled_requests_to_wrapped_endpoints_still_work(tmp_path):
+    client = make_client(tmp_path, token="secret")
+
+    client.get("/work", headers={"X-Profile": "secret"})  # Wraps the sync endpoints
+    response = client.get("/work")
+
+    assert response.json() == {"total": sum(i * i for i in range(20000))}
+    assert len(profiling.list_profiles(str(tmp_path))) == 1
+
+
+def test_sample_mode_writes_folded_stacks(tmp_path):
+    client = make_client(tmp_path, token="secret", sample_interval=0.001)
+
+    client.get("/work", headers={"X-Profile": "secret", "X-Profile-Mode": "sample"})
+
+    [details] = profiling.list_profiles(str(tmp_path))
+    with open(os.path.join(tmp_path, details["file"])) as f:
+        lines = f.read().splitlines()
+    assert details["file"].endswith(".folded")
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_old_profiles_are_pruned(tmp_path):
+    client = make_client(tmp_path, sample_rate=1.0, max_files=2)
+
+    for _ in range(4):
+        client.get("/work")
+
+    assert len(profiling.list_profiles(str(tmp_path))) == 2
+    assert len(os.listdir(tmp_path)) == 4  # Profile and sidecar for each
+
+
+def test_admin_access_needs_the_token():
+    assert profiling.is_authorized("secret", token="secret")
+    assert not profiling.is_authorized("other", token="secret")
+    assert not profiling.is_authorized(None, token="secret")
+    assert not profiling.is_authorized("", token="")
+    assert profiling.profile_path("../main.py") is None
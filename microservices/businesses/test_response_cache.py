@@ -0,0 +1,106 @@
+from fastapi.testclient import TestClient
+
+import database
+import models
+import response_cache
+import schema_check
+
+
+def test_lru_cache_evicts_by_body_size():
+    cache = response_cache.LRUCache(max_bytes=10, ttl=60)
+    cache.put(1, b"aaaa", cache.token())
+    cache.put(2, b"bbbb", cache.token())
+    cache.get(1)  # 1 is now more recently used than 2
+    cache.put(3, b"cccc", cache.token())
+
+    assert cache.get(2) is None
+    assert cache.get(1)[0] == b"aaaa"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 8
+
+
+def test_put_after_invalidation_is_not_stored():
+    cache = response_cache.LRUCache(max_bytes=100, ttl=60)
+    token = cache.token()
+    cache.invalidate(1)  # An update lands while the old row is being read
+    cache.put(1, b"stale", token)
+
+    assert cache.get(1) is None
+
+
+def test_etag_matches_lists_and_weak_tags():
+    assert response_cache.etag_matches('"x", W/"abc"', '"abc"')
+    assert response_cache.etag_matches("*", '"abc"')
+    assert not response_cache.etag_matches('"other"', '"abc"')
+    assert not response_cache.etag_matches(None, '"abc"')
+
+
+def test_get_business_revalidates_and_invalidates(db):
+    import main
+
+    db.add(models.Business(
+        business_id=1, business_name="Cafe", location="NYC", address="1 Main St", category="food", description="Coffee"
+    ))
+    db.commit()
+    client = TestClient(main.app)
+
+    first = client.get("/businesses/1")
+    assert first.status_code == 200
+    assert first.json()["business_name"] == "Cafe"
+    etag = first.headers["ETag"]
+
+    revalidated = client.get("/businesses/1", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    client.put("/businesses/1", json={
+        "business_name": "Bakery", "location": "NYC", "address": "1 Main St", "category": "food", "description": "Bread"
+    })
+    changed = client.get("/businesses/1", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json()["business_name"] == "Bakery"
+    assert changed.headers["ETag"] != etag
+
+    stats = client.get("/businesses/cache/stats").json()
+    assert stats["hits"] >= 1
+    assert stats["not_modified"] == 1
+
+
+def test_cache_hits_skip_the_query(db):
+    import main
+
+    db.add(models.Business(
+        business_id=1, business_name="Cafe", location="NYC", address="1 Main St", category="food", description="Coffee"
+    ))
+    db.commit()
+    main.business_cache.invalidate(1)
+    client = TestClient(main.app)
+
+    missed = schema_check.capture_statements(database.engine, lambda: client.get("/businesses/1"))
+    hit = schema_check.capture_statements(database.engine, lambda: client.get("/businesses/1"))
+
+    assert any("FROM businesses" in statement for statement, _ in missed)
+    assert hit == []
+
+
+
+def test_cache_misses_read_from_the_primary(db):
+    import main
+
+    db.add(models.Business(
+        business_id=1, business_name="Cafe", location="NYC", address="1 Main St", category="food", description="Coffee"
+    ))
+    db.commit()
+    main.business_cache.invalidate(1)
+
+    def replica():
+        raise AssertionError("cache fills must not read from a replica")
+        yield
+
+    main.app.dependency_overrides[main.get_read_db] = replica
+    try:
+        response = TestClient(main.app).get("/businesses/1")
+    finally:
+        main.app.dependency_overrides.pop(main.get_read_db)
+
+    assert response.json()["business_name"] == "Cafe"
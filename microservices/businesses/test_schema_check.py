@@ -0,0 +1,30 @@
+from sqlalchemy import text
+
+import crud
+import database
+import models
+import schema_check
+
+
+def test_declared_indexes_are_found_after_create_all(db):
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == []
+
+
+def test_dropped_index_is_reported(db):
+    db.execute(text("DROP INDEX ix_businesses_location_business_id"))
+    db.commit()
+
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == [
+        "businesses: missing index ix_businesses_location_business_id (location, business_id)"
+    ]
+
+
+def test_next_business_plan_uses_location_index(db):
+    plans = schema_check.explain_queries(
+        database.engine, {"next": lambda: crud.get_next_business(db, "NYC", [1])}
+    )
+
+    lines = [line for _, plan in plans["next"] for line in plan]
+    assert lines
+    assert all("SCAN businesses" not in line for line in lines)
+    assert any("ix_businesses_location_business_id" in line for line in lines)
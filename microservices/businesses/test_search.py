@@ -0,0 +1,157 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import mysql
+
+import crud
+import database
+import schemas
+import search
+
+BUSINESSES = [
+    ("Joe's Pizza", "New York", "food", "Classic slices since 1975"),
+    ("Pizza Palace", "Boston", "food", "Wood fired pizza and pasta"),
+    ("Book Nook", "New York", "shopping", "Used books, coffee and pizza nights"),
+    ("Café Crème", "New York", "coffee", "Espresso and pastries"),
+]
+
+
+@pytest.fixture(params=["auto", "memory"])
+def backend(request, db):
+    for name, location, category, description in BUSINESSES:
+        crud.create_business(db, schemas.BusinessCreate(
+            business_name=name, location=location, address="1 Main St", category=category, description=description
+        ))
+    return search.make_backend(database.engine, database.SessionLocal, mode=request.param)
+
+
+def run(db, backend, query, **kwargs):
+    options = {"location": None, "category": None, "limit": 10, "offset": 0}
+    options.update(kwargs)
+    hits, next_offset = crud.search_businesses(db, backend, query, **options)
+    return [business.business_name for business, _ in hits], next_offset
+
+
+def test_name_matches_rank_above_description_matches(db, backend):
+    names, next_offset = run(db, backend, "pizza")
+
+    assert set(names[:2]) == {"Joe's Pizza", "Pizza Palace"}
+    assert names[2] == "Book Nook"
+    assert next_offset is None
+
+
+def test_filters_accents_and_paging(db, backend):
+    assert run(db, backend, "pizza", location="New York", category="food")[0] == ["Joe's Pizza"]
+    assert run(db, backend, "CAFE creme")[0] == ["Café Crème"]
+    assert run(db, backend, "pizza pasta")[0] == ["Pizza Palace"]
+
+    first, next_offset = run(db, backend, "pizza", limit=2)
+    rest, last = run(db, backend, "pizza", limit=2, offset=next_offset)
+    assert len(first) == 2 and next_offset == 2
+    assert rest == ["Book Nook"] and last is None
+
+
+def test_index_follows_writes(db, backend):
+    business = crud.create_business(db, schemas.BusinessCreate(
+        business_name="Taco Town", location="Austin", address="2 Main St", category="food", description="Tacos"
+    ))
+    assert run(db, backend, "taco")[0] == ["Taco Town"]
+
+    crud.update_business(db, business.business_id, schemas.BusinessUpdate(business_name="Burrito Barn"), "test")
+    assert run(db, backend, "taco")[0] == []
+    assert run(db, backend, "burrito")[0] == ["Burrito Barn"]
+
+    crud.delete_business(db, business.business_id, "test")
+    assert run(db, backend, "burrito")[0] == []
+
+    # Bulk imports insert with executemany, bypassing the ORM unit of work
+    crud.bulk_create_businesses(db, [(1, {
+        "business_name": "Noodle Bar", "location": "Austin", "address": "3 Main St",
+        "category": "food", "description": "Ramen",
+    })])
+    assert run(db, backend, "ramen")[0] == ["Noodle Bar"]
+
+
+def test_search_endpoint(db, backend):
+    import main
+
+    main.search_backend = backend
+    client = TestClient(main.app)
+
+    response = client.get("/businesses/search", params={"q": "pizza", "location": "Boston"})
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["business_name"] for item in body["items"]] == ["Pizza Palace"]
+    assert body["items"][0]["score"] > 0
+    assert body["backend"] == backend.name
+
+    assert client.get("/businesses/search", params={"q": "!!"}).status_code == 400
+    # FTS5 operators in the query are treated as plain words
+    assert client.get("/businesses/search", params={"q": 'pizza" OR NEAR(x'}).status_code == 200
+
+
+class RecordingConnection:
+    """
+    Stands in for a MySQL session or connection: keeps each statement and its
+    parameters, and answers with canned rows.
+    """
+
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.executed = []
+
+    def execute(self, statement, params=None):
+        self.executed.append((str(statement.compile(dialect=mysql.dialect())), params))
+        return self.rows
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+
+def test_backends_must_implement_search():
+    class Incomplete(search.SearchBackend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_mysql_fulltext_query_requires_every_term():
+    db = RecordingConnection(rows=[(3, Decimal("1.5")), (1, Decimal("0.25"))])
+
+    hits = search.MySQLFulltextSearch().search(db, ["pizza", "pasta"], "Boston", "food", limit=5, offset=10)
+
+    assert hits == [(3, 1.5), (1, 0.25)]
+    [(sql, params)] = db.executed
+    match = "MATCH (business_name, category, description) AGAINST (%s IN BOOLEAN MODE)"
+    assert sql.count(match) == 2  # Selected as the score and used as the filter
+    assert "AND location = %s AND category = %s" in sql
+    assert sql.endswith("ORDER BY score DESC, business_id LIMIT %s OFFSET %s")
+    assert params == {
+        "match": '+"pizza" +"pasta"', "location": "Boston", "category": "food", "limit": 5, "offset": 10,
+    }
+
+
+def test_mysql_fulltext_index_is_created_once(monkeypatch):
+    indexes = []
+    monkeypatch.setattr(search, "inspect", lambda engine: SimpleNamespace(get_indexes=lambda table: indexes))
+    engine = RecordingConnection()
+
+    search.MySQLFulltextSearch().setup(engine)
+    indexes.append({"name": search.FULLTEXT_INDEX})
+    search.MySQLFulltextSearch().setup(engine)
+
+    assert [sql for sql, _ in engine.executed] == [
+        "ALTER TABLE businesses ADD FULLTEXT INDEX ft_businesses_text (business_name, category, description)"
+    ]
+
+
+def test_auto_picks_fulltext_on_mysql(monkeypatch):
+    monkeypatch.setattr(search.MySQLFulltextSearch, "setup", lambda self, engine: None)
+    engine = SimpleNamespace(dialect=SimpleNamespace(name="mysql"))
+
+    assert isinstance(search.make_backend(engine, None, mode="auto"), search.MySQLFulltextSearch)
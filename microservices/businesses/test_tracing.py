@@ -0,0 +1,64 @@
+import logging
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import tracing
+
+
+def make_client(**kwargs):
+    app = FastAPI()
+    app.add_middleware(tracing.TracingMiddleware, **kwargs)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        body = await request.body()
+        return {"correlation_id": request.state.correlation_id, "size": len(body)}
+
+    return TestClient(app)
+
+
+def last_trace(caplog):
+    # Other loggers (e.g. httpx) may log after the middleware does
+    return [record for record in caplog.records if record.name == "tracing"][-1]
+
+
+def test_correlation_id_is_propagated():
+    client = make_client()
+
+    response = client.post("/echo", headers={"X-Correlation-ID": "abc-123"})
+
+    assert response.headers["X-Correlation-ID"] == "abc-123"
+    assert response.json()["correlation_id"] == "abc-123"
+
+
+def test_correlation_id_is_generated():
+    response = make_client().post("/echo")
+
+    assert response.headers["X-Correlation-ID"] == response.json()["correlation_id"]
+
+
+def test_sampled_request_logs_capped_body(caplog):
+    client = make_client(sample_rate=1.0, max_body_bytes=4)
+
+    with caplog.at_level(logging.INFO, logger="tracing"):
+        response = client.post("/echo", content=b"0123456789", headers={"X-Token": "secret"})
+
+    assert response.json()["size"] == 10  # The app still sees the whole body
+    fields = last_trace(caplog).fields
+    assert fields["status_code"] == 200
+    assert fields["body"] == "0123"
+    assert fields["body_truncated"] is True
+    assert fields["headers"]["x-token"] == "[redacted]"
+
+
+def test_unsampled_request_skips_headers_and_body(caplog):
+    client = make_client(sample_rate=0)
+
+    with caplog.at_level(logging.INFO, logger="tracing"):
+        client.post("/echo", content=b"payload")
+
+    fields = last_trace(caplog).fields
+    assert "headers" not in fields
+    assert "body" not in fields
@@ -0,0 +1,156 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+import uuid
+
+from starlette.datastructures import MutableHeaders
+
+# Fraction of requests whose headers and body are included in the trace record
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.01"))
+# Longest request body (in bytes) copied into a trace record
+TRACE_MAX_BODY_BYTES = int(os.getenv("TRACE_MAX_BODY_BYTES", "2048"))
+# Headers that are never written to the log
+REDACTED_HEADERS = {"authorization", "cookie", "x-token", "x-profile"}
+
+logger = logging.getLogger("tracing")
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats each record as one JSON object per line. Structured fields passed as
+    `extra={"fields": {...}}` are merged into the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(log_file: str = "tracing.log", level: int = logging.INFO, console: bool = True):
+    """
+    Routes all logging through a queue to a background thread that writes JSON
+    lines to `log_file` (and the console), so request handlers never block on
+    file I/O.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter()
+    handlers = [logging.FileHandler(log_file)]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """
+    Flushes queued records and stops the writer thread.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class TracingMiddleware:
+    """
+    Pure ASGI logging, tracing and correlation ID middleware.
+
+    Reuses the X-Correlation-ID request header (or generates one), exposes it as
+    `request.state.correlation_id`, echoes it on the response and writes one
+    structured record per request. Headers and up to `max_body_bytes` of the body
+    are only recorded for a `sample_rate` fraction of requests; the body is copied
+    as the app reads it, never buffered up front.
+    """
+
+    def __init__(self, app, sample_rate: float = TRACE_SAMPLE_RATE, max_body_bytes: int = TRACE_MAX_BODY_BYTES):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        correlation_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-correlation-id":
+                correlation_id = value.decode("latin-1")
+                break
+        if not correlation_id:
+            correlation_id = str(uuid.uuid4())
+        scope.setdefault("state", {})["correlation_id"] = correlation_id
+
+        sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        body = bytearray()
+        body_size = 0
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def receive_with_capture():
+            nonlocal body_size
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                room = self.max_body_bytes - len(body)
+                if room > 0:
+                    body.extend(chunk[:room])
+            return message
+
+        async def send_with_correlation_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message).append("X-Correlation-ID", correlation_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive_with_capture if sampled else receive, send_with_correlation_id)
+        finally:
+            fields = {
+                "correlation_id": correlation_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query": scope.get("query_string", b"").decode("latin-1"),
+                "status_code": status_code,
+                "duration_ms": round((time.perf_counter() - start_time) * 1000, 3),
+            }
+            if sampled:
+                fields["headers"] = {
+                    name.decode("latin-1"): "[redacted]" if name.decode("latin-1") in REDACTED_HEADERS else value.decode("latin-1")
+                    for name, value in scope["headers"]
+                }
+                if body_size:
+                    fields["body"] = body.decode("utf-8", errors="replace")
+                    fields["body_truncated"] = body_size > len(body)
+            logger.info(f"{scope['method']} {scope['path']} {status_code}", extra={"fields": fields})
@@ -0,0 +1,59 @@
+"""
+Checks that the database has every index declared in models.py and prints the
+EXPLAIN plan of each hot query, so a missing index shows up at deploy time.
+
+Exits with status 1 if the primary or any replica is missing a table or index.
+
+Usage:
+    python verify_indexes.py
+    python verify_indexes.py --location "New York" --business-id 42
+"""
+import argparse
+import sys
+
+import crud
+import database
+import models
+import schema_check
+
+
+def hot_queries(db, args) -> dict:
+    return {
+        "get_business": lambda: crud.get_business(db, args.business_id),
+        "get_businesses_by_ids": lambda: crud.get_businesses_by_ids(db, [args.business_id, args.business_id + 1]),
+        "get_next_business": lambda: crud.get_next_business(db, args.location, [args.business_id]),
+        "nearby_businesses": lambda: crud.nearby_businesses(db, 40.7128, -74.0060, 1000, 10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--location", default="New York", help="Location used for the sample queries")
+    parser.add_argument("--business-id", type=int, default=1, help="Business id used for the sample queries")
+    args = parser.parse_args()
+
+    problems = []
+    for name, engine in database.registry.engines().items():
+        problems += [f"[{name}] {problem}" for problem in schema_check.missing_indexes(engine, models.Base.metadata)]
+
+    if not problems:
+        # Plans are only meaningful once the schema matches the models
+        db = database.SessionLocal()
+        try:
+            plans = schema_check.explain_queries(database.engine, hot_queries(db, args))
+        finally:
+            db.close()
+        for query, statements in plans.items():
+            print(f"== {query}")
+            for statement, plan in statements:
+                print(" ".join(statement.split()))
+                for line in plan:
+                    print(f"    {line}")
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
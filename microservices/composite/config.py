@@ -0,0 +1,41 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+
+def get_url(name: str, default: str = "") -> str:
+    # Drop trailing inline comments such as "http://host:8000# comment"
+    return os.getenv(name, default).split("#")[0].strip()
+
+
+# Downstream services
+BUSINESS_SERVICE_URL = get_url("BUSINESS_SERVICE_URL", "http://127.0.0.1:8002")
+LIST_SERVICE_URL = get_url("LIST_SERVICE_URL", "http://127.0.0.1:8001")
+
+# Shared HTTP client pools (one per downstream service)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+
+# Business queues used by the orchestrator
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "memory")  # "memory" or "sqlite" (shared by all workers on a host)
+QUEUE_SQLITE_PATH = os.getenv("QUEUE_SQLITE_PATH", os.path.join(os.path.dirname(__file__), "queues.db"))
+QUEUE_MAX_ITEMS = int(os.getenv("QUEUE_MAX_ITEMS", "100000"))  # Businesses held across all sessions
+QUEUE_TTL_SECONDS = float(os.getenv("QUEUE_TTL_SECONDS", "3600"))  # Idle time before a session's queue is dropped
+QUEUE_LOW_WATER = int(os.getenv("QUEUE_LOW_WATER", "2"))  # Queues below this size are refilled in the background
+QUEUE_REFILL_BATCH_WINDOW_MS = float(os.getenv("QUEUE_REFILL_BATCH_WINDOW_MS", "20"))  # Refill requests within this window are batched
+
+# Itinerary route optimisation
+ROUTE_SPEED_KMH = float(os.getenv("ROUTE_SPEED_KMH", "5"))  # Walking pace
+ROUTE_DETOUR_FACTOR = float(os.getenv("ROUTE_DETOUR_FACTOR", "1.3"))  # Street distance / straight-line distance
+ROUTE_MAX_STOPS = int(os.getenv("ROUTE_MAX_STOPS", "1000"))
+BUSINESS_BATCH_SIZE = int(os.getenv("BUSINESS_BATCH_SIZE", "100"))  # Ids per multi-get request to the business service
+
+# Itinerary time slots (itinerary_slots table)
+SLOT_BACKFILL_ON_STARTUP = os.getenv("SLOT_BACKFILL_ON_STARTUP", "true").lower() in ("1", "true", "yes")  # Parse legacy `times` into slots at startup
+SLOT_BACKFILL_BATCH_SIZE = int(os.getenv("SLOT_BACKFILL_BATCH_SIZE", "1000"))
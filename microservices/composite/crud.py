@@ -1,25 +1,178 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, delete, exists, func, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+import group_commit
 import models
 import schema
+import timeslots
 from datetime import datetime, timedelta
 
-def create_itinerary(db: Session, itinerary_data: schema.ItineraryCreate):
-    db_itinerary = models.Itinerary(**itinerary_data.model_dump())
+
+class SlotConflictError(ValueError):
+    """
+    Raised when new time slots overlap slots already booked on the same list and day.
+    `conflicts` holds the overlapping slots, as returned by find_slot_conflicts.
+    """
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__("Time slots overlap existing itineraries on this list and day")
+
+
+def _day_filter(column, day):
+    return column.is_(None) if day is None else column == day
+
+def _slot_rows(itinerary_id: int, list_id: int, day, slots):
+    return [
+        {"itinerary_id": itinerary_id, "list_id": list_id, "day": day, "start_minute": start, "end_minute": end}
+        for start, end in slots
+    ]
+
+def _lock_list(db: Session, list_id: int):
+    # Serialises slot writes per list on databases with row locks, so two requests can't both pass the check
+    db.query(models.List.list_id).filter(models.List.list_id == list_id).with_for_update().first()
+
+def find_slot_conflicts(db: Session, list_id: int, day, slots, exclude_itinerary_id: int = None,
+                        exclude_itinerary_ids=()):
+    """
+    Existing slots of the list on `day` (a normalised day key) overlapping any
+    of `slots`, as rows with the slot's columns and its business_id. Itineraries
+    without a day aren't scheduled, so they never conflict. Slots of the
+    excluded itineraries (those being rescheduled) are ignored.
+    """
+    if day is None or not slots:
+        return []
+    Slot = models.ItinerarySlot
+    query = db.query(
+        Slot.slot_id, Slot.itinerary_id, models.Itinerary.business_id, Slot.day, Slot.start_minute, Slot.end_minute,
+    ).join(models.Itinerary, models.Itinerary.itinerary_id == Slot.itinerary_id).filter(
+        Slot.list_id == list_id,
+        Slot.day == day,
+        or_(*(and_(Slot.start_minute < end, Slot.end_minute > start) for start, end in slots)),
+    )
+    if exclude_itinerary_id is not None:
+        query = query.filter(Slot.itinerary_id != exclude_itinerary_id)
+    if exclude_itinerary_ids:
+        query = query.filter(Slot.itinerary_id.notin_(list(exclude_itinerary_ids)))
+    return query.order_by(Slot.start_minute, Slot.slot_id).all()
+
+def create_itinerary(db: Session, itinerary_data: schema.ItineraryCreate, allow_overlap: bool = False):
+    """
+    Raises ValueError if `times` doesn't parse and SlotConflictError if it
+    overlaps another itinerary of the list on the same day (unless `allow_overlap`).
+    """
+    slots = timeslots.parse_times(itinerary_data.times)
+    day = timeslots.normalise_day(itinerary_data.day)
+    _lock_list(db, itinerary_data.list_id)
+    if not allow_overlap:
+        conflicts = find_slot_conflicts(db, itinerary_data.list_id, day, slots)
+        if conflicts:
+            db.rollback()
+            raise SlotConflictError(conflicts)
+    values = itinerary_data.model_dump()
+    values["times"] = timeslots.format_times(slots)
+    values["day_key"] = day
+    db_itinerary = models.Itinerary(**values)
+    db_itinerary.slots = [
+        models.ItinerarySlot(list_id=db_itinerary.list_id, day=day, start_minute=start, end_minute=end)
+        for start, end in slots
+    ]
     db.add(db_itinerary)
     db.commit()
     db.refresh(db_itinerary)
     return db_itinerary
 
+def create_itineraries(db: Session, items: list):
+    """
+    Creates many itineraries without committing; used by the group-commit
+    writer. `items` are (ItineraryCreate, allow_overlap) pairs, each checked
+    like create_itinerary against stored slots and earlier items of the batch.
+    Returns one result per item: the new itinerary, or the error for that item
+    alone. Accepted itineraries are inserted together with RETURNING.
+    """
+    results = [None] * len(items)
+    pending = []  # (index, data, day, slots) accepted but not inserted yet
+
+    def insert_pending():
+        itineraries = group_commit.insert_returning(db, models.Itinerary, [
+            dict(data.model_dump(), day_key=day, times=timeslots.format_times(slots)) for _, data, day, slots in pending
+        ])
+        rows = []
+        for itinerary, (index, _, day, slots) in zip(itineraries, pending):
+            rows += _slot_rows(itinerary.itinerary_id, itinerary.list_id, day, slots)
+            results[index] = itinerary
+        if rows:
+            db.execute(insert(models.ItinerarySlot), rows)
+        pending.clear()
+
+    # In id order, so batches locking the same lists can't deadlock
+    for list_id in sorted({data.list_id for data, _ in items}):
+        _lock_list(db, list_id)
+    for index, (data, allow_overlap) in enumerate(items):
+        try:
+            slots = timeslots.parse_times(data.times)
+        except ValueError as e:
+            results[index] = e
+            continue
+        day = timeslots.normalise_day(data.day)
+        if not allow_overlap and day is not None:
+            # Overlaps an earlier item of this batch: insert those first so the conflict has rows to report
+            if any(
+                other.list_id == data.list_id and other_day == day and timeslots.overlaps(slots, other_slots)
+                for _, other, other_day, other_slots in pending
+            ):
+                insert_pending()
+            conflicts = find_slot_conflicts(db, data.list_id, day, slots)
+            if conflicts:
+                results[index] = SlotConflictError(conflicts)
+                continue
+        pending.append((index, data, day, slots))
+    if pending:
+        insert_pending()
+    return results
+
 def get_itineraries_by_list(db: Session, list_id: int, day: str = None):
+    """
+    Ordered by the start of each itinerary's first slot; itineraries without
+    slots (no times, or not migrated yet) come last, by `times`.
+
+    `day` matches by its normalised key like the slot queries do, so "mon"
+    finds itineraries stored as "Monday".
+    """
+    first_start = (
+        select(func.min(models.ItinerarySlot.start_minute))
+        .where(models.ItinerarySlot.itinerary_id == models.Itinerary.itinerary_id)
+        .scalar_subquery()
+    )
     query = db.query(models.Itinerary).filter(models.Itinerary.list_id == list_id)
     if day:
-        query = query.filter(models.Itinerary.day == day)
-    return query.order_by(models.Itinerary.times).all()
+        query = query.filter(_day_filter(models.Itinerary.day_key, timeslots.normalise_day(day)))
+    return query.order_by(
+        first_start.is_(None), first_start, models.Itinerary.times, models.Itinerary.itinerary_id
+    ).all()
 
-def update_itinerary_times(db: Session, itinerary_id: int, times: str):
+def update_itinerary_times(db: Session, itinerary_id: int, times: str, allow_overlap: bool = False):
+    """
+    Replaces an itinerary's times and slots. Raises like create_itinerary.
+    """
+    slots = timeslots.parse_times(times)
     itinerary = db.query(models.Itinerary).filter(models.Itinerary.itinerary_id == itinerary_id).first()
     if itinerary:
-        itinerary.times = times
+        day = timeslots.normalise_day(itinerary.day)
+        _lock_list(db, itinerary.list_id)
+        if not allow_overlap:
+            conflicts = find_slot_conflicts(db, itinerary.list_id, day, slots, exclude_itinerary_id=itinerary_id)
+            if conflicts:
+                db.rollback()
+                raise SlotConflictError(conflicts)
+        itinerary.times = timeslots.format_times(slots)
+        # Delete before inserting: the unit of work would insert first and trip the unique start index
+        db.execute(delete(models.ItinerarySlot).where(models.ItinerarySlot.itinerary_id == itinerary_id))
+        db.add_all([
+            models.ItinerarySlot(itinerary_id=itinerary_id, list_id=itinerary.list_id, day=day,
+                                 start_minute=start, end_minute=end)
+            for start, end in slots
+        ])
         db.commit()
         db.refresh(itinerary)
     return itinerary
@@ -30,3 +183,161 @@ def delete_itinerary(db: Session, itinerary_id: int):
         db.delete(itinerary)
         db.commit()
     return itinerary
+
+def set_itinerary_times(db: Session, times_by_id: dict, allow_overlap: bool = False):
+    """
+    Replaces `times` and the slots of many itineraries in one transaction.
+    The new slots aren't checked against each other (the caller has laid them
+    out), but raise SlotConflictError if they overlap other itineraries of the
+    list on the same day, unless `allow_overlap`.
+    """
+    slots_by_id = {itinerary_id: timeslots.parse_times(times) for itinerary_id, times in times_by_id.items()}
+    itineraries = db.query(models.Itinerary.itinerary_id, models.Itinerary.list_id, models.Itinerary.day).filter(
+        models.Itinerary.itinerary_id.in_(list(slots_by_id))
+    ).all()
+    # In id order, so requests locking the same lists can't deadlock
+    for list_id in sorted({list_id for _, list_id, _ in itineraries}):
+        _lock_list(db, list_id)
+    rows = []
+    conflicts = []
+    for itinerary_id, list_id, day in itineraries:
+        day = timeslots.normalise_day(day)
+        if not allow_overlap:
+            conflicts += find_slot_conflicts(
+                db, list_id, day, slots_by_id[itinerary_id], exclude_itinerary_ids=slots_by_id
+            )
+        rows += _slot_rows(itinerary_id, list_id, day, slots_by_id[itinerary_id])
+    if conflicts:
+        db.rollback()
+        raise SlotConflictError(conflicts)
+    db.execute(update(models.Itinerary), [
+        {"itinerary_id": itinerary_id, "times": timeslots.format_times(slots)}
+        for itinerary_id, slots in slots_by_id.items()
+    ])
+    db.execute(delete(models.ItinerarySlot).where(models.ItinerarySlot.itinerary_id.in_(list(slots_by_id))))
+    if rows:
+        db.execute(insert(models.ItinerarySlot), rows)
+    db.commit()
+
+def get_slots_in_range(db: Session, list_id: int, day: str = None, start: int = 0, end: int = timeslots.MINUTES_PER_DAY):
+    """
+    Slots of a list overlapping [start, end) minutes, on one day or every day,
+    with their business, ordered by day and start.
+    """
+    Slot = models.ItinerarySlot
+    query = (
+        db.query(Slot, models.Itinerary.business_id)
+        .join(models.Itinerary, models.Itinerary.itinerary_id == Slot.itinerary_id)
+        .filter(Slot.list_id == list_id, Slot.start_minute < end, Slot.end_minute > start)
+    )
+    if day is not None:
+        query = query.filter(_day_filter(Slot.day, timeslots.normalise_day(day)))
+    return query.order_by(Slot.day, Slot.start_minute, Slot.slot_id).all()
+
+def get_slot_conflicts(db: Session, list_id: int, day: str = None):
+    """
+    Pairs of overlapping slots on the same list and day, as rows of (earlier
+    slot, its business_id, later slot, its business_id). Each slot is matched
+    against slots starting within it, a range scan on the (list_id, day,
+    start_minute) index.
+    """
+    first, second = aliased(models.ItinerarySlot), aliased(models.ItinerarySlot)
+    first_itinerary, second_itinerary = aliased(models.Itinerary), aliased(models.Itinerary)
+    query = db.query(first, first_itinerary.business_id, second, second_itinerary.business_id).join(second, and_(
+        second.list_id == first.list_id,
+        second.day == first.day,
+        second.start_minute >= first.start_minute,
+        second.start_minute < first.end_minute,
+        second.slot_id != first.slot_id,
+        # Slots starting together would otherwise be reported twice
+        or_(second.start_minute > first.start_minute, second.slot_id > first.slot_id),
+    )).join(
+        first_itinerary, first_itinerary.itinerary_id == first.itinerary_id
+    ).join(
+        second_itinerary, second_itinerary.itinerary_id == second.itinerary_id
+    ).filter(first.list_id == list_id)
+    if day is not None:
+        query = query.filter(first.day == timeslots.normalise_day(day))
+    return query.order_by(first.day, first.start_minute, second.start_minute, first.slot_id, second.slot_id).all()
+
+def _backfill_day_keys(db: Session, batch_size: int) -> int:
+    """
+    Sets `day_key` on itineraries written before it existed, one transaction
+    per batch. Returns how many rows got a key.
+    """
+    keyed = 0
+    last_id = 0
+    while True:
+        batch = (
+            db.query(models.Itinerary.itinerary_id, models.Itinerary.day)
+            .filter(
+                models.Itinerary.itinerary_id > last_id,
+                models.Itinerary.day.isnot(None),
+                models.Itinerary.day_key.is_(None),
+            )
+            .order_by(models.Itinerary.itinerary_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return keyed
+        # Blank days have no key and stay NULL
+        updates = [
+            {"itinerary_id": itinerary_id, "day_key": timeslots.normalise_day(day)}
+            for itinerary_id, day in batch if timeslots.normalise_day(day) is not None
+        ]
+        if updates:
+            db.execute(update(models.Itinerary), updates)
+        db.commit()
+        keyed += len(updates)
+        last_id = batch[-1][0]
+
+def backfill_slots(db: Session, batch_size: int = 1000) -> dict:
+    """
+    Parses `times` into slots for itineraries that have none (rows written
+    before itinerary_slots existed), in batches of `batch_size`, one
+    transaction each, after setting the missing day keys (`day_keys` counts
+    those). Safe to rerun or to run from several processes at once.
+    Rows whose `times` don't parse are left as they are and reported in `invalid`.
+    """
+    day_keys = _backfill_day_keys(db, batch_size)
+    migrated = 0
+    invalid = {}
+    last_id = 0
+    retried = False
+    while True:
+        has_slots = exists().where(models.ItinerarySlot.itinerary_id == models.Itinerary.itinerary_id)
+        batch = (
+            db.query(models.Itinerary.itinerary_id, models.Itinerary.list_id, models.Itinerary.day, models.Itinerary.times)
+            .filter(
+                models.Itinerary.itinerary_id > last_id,
+                models.Itinerary.times.isnot(None),
+                models.Itinerary.times != "",
+                ~has_slots,
+            )
+            .order_by(models.Itinerary.itinerary_id)
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            return {"migrated": migrated, "invalid": invalid, "day_keys": day_keys}
+        rows = []
+        for itinerary_id, list_id, day, times in batch:
+            try:
+                rows += _slot_rows(itinerary_id, list_id, timeslots.normalise_day(day), timeslots.parse_times(times))
+            except ValueError as e:
+                invalid[itinerary_id] = str(e)
+        try:
+            if rows:
+                db.execute(insert(models.ItinerarySlot), rows)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            if retried:
+                raise
+            # Another process migrated some of these; redo the batch without them
+            retried = True
+            continue
+        retried = False
+        migrated += len({row["itinerary_id"] for row in rows})
+        last_id = batch[-1][0]
@@ -1,11 +1,24 @@
-from fastapi import FastAPI, HTTPException, Depends
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+import asyncio
+import logging
 import os
+import clients
+import config
+import group_commit
+import metrics
 import orchestrator
+import profiling
+import queue_store
+import schema_check
+import timeslots
 import crud, models, schema
-from database import SessionLocal, engine
+from database import ReadSessionLocal, ReadYourWritesMiddleware, SessionLocal, engine, registry
 #from dotenv import load_dotenv
 import set_env
 import uvicorn
@@ -19,7 +32,36 @@ load_dotenv(dotenv_path)
 # Create tables -> Don't need to, tables already created
 # models.Base.metadata.create_all(bind=engine)
 
-app = FastAPI(debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled, keep-alive HTTP client per downstream service for the app's lifetime
+    clients.start_clients({"business": config.BUSINESS_SERVICE_URL, "list": config.LIST_SERVICE_URL})
+    orchestrator.refill_worker.start()
+    # Time slots live in their own table; create it (and itineraries.day_key) and migrate rows written before them
+    try:
+        models.ItinerarySlot.__table__.create(bind=engine, checkfirst=True)
+        models.ensure_columns(engine)
+        if config.SLOT_BACKFILL_ON_STARTUP:
+            result = await asyncio.to_thread(backfill_slots)
+            if result["migrated"] or result["invalid"] or result["day_keys"]:
+                logging.info(
+                    f"Itinerary slots: migrated {result['migrated']}, unparseable {len(result['invalid'])}, "
+                    f"day keys set {result['day_keys']}"
+                )
+    except Exception as e:
+        logging.warning(f"Itinerary slot migration skipped: {e}")
+    # Warn early if the database is missing indexes the hot queries rely on
+    for db_engine in registry.engines().values():
+        schema_check.warn_missing_indexes(db_engine, models.Base.metadata)
+    # Opt-in: concurrent creates share a transaction (see group_commit.GroupCommitWriter)
+    if group_commit.GROUP_COMMIT:
+        create_writer.start()
+    yield
+    create_writer.stop()
+    await orchestrator.refill_worker.stop()
+    await clients.close_clients()
+
+app = FastAPI(debug=True, lifespan=lifespan)
 
 # Setup CORS using environment variables, if needed
 app.add_middleware(
@@ -30,6 +72,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Keeps each client's reads on the primary for a moment after it writes
+app.add_middleware(ReadYourWritesMiddleware, registry=registry)
+
+# Opt-in profiling (X-Profile header or PROFILE_SAMPLE_RATE), saved per request
+app.add_middleware(profiling.ProfilingMiddleware)
+
+metrics.instrument(app, registry.engines())
+metrics.registry.register(metrics.Gauge(
+    "orchestrator_queue_items", "Businesses waiting in session queues.", (),
+    lambda: {(): orchestrator.business_queues.stats()["items"]},
+))
+metrics.registry.register(metrics.Gauge(
+    "orchestrator_queue_sessions", "Sessions with a business queue.", (),
+    lambda: {(): orchestrator.business_queues.stats()["sessions"]},
+))
+
+def backfill_slots():
+    db = SessionLocal()
+    try:
+        return crud.backfill_slots(db, batch_size=config.SLOT_BACKFILL_BATCH_SIZE)
+    finally:
+        db.close()
+
+# Batches POST /itineraries/ inserts when GROUP_COMMIT is on; on_commit notes each write for its client's read routing
+create_writer = group_commit.GroupCommitWriter(
+    SessionLocal, crud.create_itineraries, name="itineraries", on_commit=registry.record_write
+)
+metrics.track_group_commit(create_writer)
+
 # Dependency to get the database session
 def get_db():
     db = SessionLocal()
@@ -38,36 +109,72 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get a database session for read-only endpoints (may be a replica)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """
+    Lists saved request profiles, newest first. Requires `X-Profile: <PROFILE_TOKEN>`.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{file}")
+def download_profile(file: str, request: Request):
+    """
+    Downloads one profile: `.prof` files load in pstats/snakeviz, `.folded` in speedscope/flamegraph.pl.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    path = profiling.profile_path(file)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=file)
+
+@app.get("/clients/stats")
+async def client_stats():
+    """
+    Returns request and connection reuse counters for each downstream HTTP client.
+    """
+    return clients.connection_stats()
+
 # Queue Management Endpoints
 @app.post("/queue/start/")
-async def start_queue(address: str):
+async def start_queue(address: str, session_id: str = orchestrator.DEFAULT_SESSION):
     """
-    Initializes the business queue with businesses from the specified address.
+    Initializes the session's business queue with businesses from the specified address.
     """
     try:
-        await orchestrator.start_business_queue(address)
+        await orchestrator.start_business_queue(session_id, address)
         return {"message": "Business queue started successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/queue/end/")
-async def end_queue():
+async def end_queue(session_id: str = orchestrator.DEFAULT_SESSION):
     """
-    Clears the business queue.
+    Clears the session's business queue.
     """
     try:
-        await orchestrator.end_business_queue()
+        await orchestrator.end_business_queue(session_id)
         return {"message": "Business queue ended successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/queue/next-business/")
-async def get_next_business():
+async def get_next_business(session_id: str = orchestrator.DEFAULT_SESSION):
     """
-    Retrieves the next business from the queue.
+    Retrieves the next business from the session's queue.
     """
     try:
-        next_business = await orchestrator.get_next_business()
+        next_business = await orchestrator.get_next_business(session_id)
         return next_business
     except HTTPException as e:
         raise e
@@ -75,7 +182,7 @@ async def get_next_business():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/queue/add-or-remove-business/")
-async def add_or_remove_business(user_id: int, business_id: int, list_id: int, address: str, day: str, action: str, db: Session = Depends(get_db)):
+async def add_or_remove_business(user_id: int, business_id: int, list_id: int, address: str, day: str, action: str, session_id: str = orchestrator.DEFAULT_SESSION, db: Session = Depends(get_db)):
     """
     Adds or removes a business from the queue depending on the action specified.
     - If action is "add", the business is added to the user's list as an itinerary.
@@ -83,10 +190,10 @@ async def add_or_remove_business(user_id: int, business_id: int, list_id: int, a
     """
     try:
         if action == "add":
-            await orchestrator.add_business_to_user_list(db=db, user_id=user_id, business_id=business_id, list_id=list_id, address=address, day=day)
+            await orchestrator.add_business_to_user_list(db=db, session_id=session_id, user_id=user_id, business_id=business_id, list_id=list_id, address=address, day=day)
             return {"message": "Business added to user's list and removed from queue"}
         elif action == "remove":
-            await orchestrator.remove_business_from_queue(business_id=business_id, address=address)
+            await orchestrator.remove_business_from_queue(session_id=session_id, business_id=business_id, address=address)
             return {"message": "Business removed from queue"}
         else:
             raise HTTPException(status_code=400, detail="Invalid action specified. Use 'add' or 'remove'.")
@@ -95,32 +202,136 @@ async def add_or_remove_business(user_id: int, business_id: int, list_id: int, a
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/queue/stats")
+async def queue_stats():
+    """
+    Returns queue depth from the queue store and background refill counters and latency.
+    """
+    return {
+        "store": await queue_store.call(orchestrator.business_queues.stats),
+        "refill": orchestrator.refill_worker.stats(),
+    }
+
 # Itinerary CRUD Endpoints
 
+def slot_out(slot, business_id: int) -> dict:
+    return {
+        "slot_id": slot.slot_id,
+        "itinerary_id": slot.itinerary_id,
+        "business_id": business_id,
+        "day": slot.day,
+        "start": timeslots.format_time(slot.start_minute),
+        "end": timeslots.format_time(slot.end_minute),
+    }
+
+def conflict_response(e: crud.SlotConflictError):
+    return HTTPException(status_code=409, detail={
+        "message": str(e),
+        "conflicts": [slot_out(slot, slot.business_id) for slot in e.conflicts],
+    })
+
 @app.post("/itineraries/", response_model=schema.Itinerary)
-def create_itinerary(itinerary: schema.ItineraryCreate, db: Session = Depends(get_db)):
+def create_itinerary(itinerary: schema.ItineraryCreate, allow_overlap: bool = False, db: Session = Depends(get_db)):
     """
     Creates a new itinerary entry, adding a business to a list for a specific day and time.
+    Returns 409 with the conflicting slots if `times` overlaps another itinerary
+    of the list on the same day, unless `allow_overlap=true`.
     """
-    return crud.create_itinerary(db=db, itinerary_data=itinerary)
+    try:
+        if create_writer.running:
+            return create_writer.write((itinerary, allow_overlap))
+        return crud.create_itinerary(db=db, itinerary_data=itinerary, allow_overlap=allow_overlap)
+    except crud.SlotConflictError as e:
+        raise conflict_response(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @app.get("/itineraries/{list_id}", response_model=List[schema.Itinerary])
-def read_itineraries_by_list(list_id: int, day: Optional[str] = None, db: Session = Depends(get_db)):
+def read_itineraries_by_list(list_id: int, day: Optional[str] = None, db: Session = Depends(get_read_db)):
     """
     Retrieves all itinerary entries for a specific list, ordered by `times`.
-    Optionally filter by a specific `day`.
+    Optionally filter by a specific `day` ("mon", "Monday" and "MON" are the same day).
     """
     itineraries = crud.get_itineraries_by_list(db=db, list_id=list_id, day=day)
     if not itineraries:
         raise HTTPException(status_code=404, detail="No itineraries found for the specified list and day.")
     return itineraries
 
+def parse_time_param(value: Optional[str], default: int) -> int:
+    if value is None:
+        return default
+    try:
+        return timeslots.parse_time(value)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/itineraries/{list_id}/slots", response_model=List[schema.ItinerarySlot])
+def read_slots_in_range(list_id: int, day: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Time slots of a list that overlap `start`-`end` ("HH:MM", end exclusive;
+    the whole day by default), optionally on one `day`, ordered by day and start.
+    E.g. `?day=tue&start=13:00&end=15:00` is what's booked between 13:00 and 15:00 on Tuesday.
+    """
+    start_minute = parse_time_param(start, 0)
+    end_minute = parse_time_param(end, timeslots.MINUTES_PER_DAY)
+    if end_minute <= start_minute:
+        raise HTTPException(status_code=422, detail="end must be after start")
+    rows = crud.get_slots_in_range(db=db, list_id=list_id, day=day, start=start_minute, end=end_minute)
+    return [slot_out(slot, business_id) for slot, business_id in rows]
+
+@app.get("/itineraries/{list_id}/conflicts", response_model=List[schema.SlotConflict])
+def read_slot_conflicts(list_id: int, day: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Pairs of overlapping slots on the same day of a list (optionally one `day`),
+    e.g. from rows created with `allow_overlap=true` or before slots were checked.
+    """
+    rows = crud.get_slot_conflicts(db=db, list_id=list_id, day=day)
+    return [
+        {"first": slot_out(first, first_business), "second": slot_out(second, second_business)}
+        for first, first_business, second, second_business in rows
+    ]
+
+@app.post("/itineraries/{list_id}/optimize", response_model=schema.OptimizedRoute)
+async def optimize_itinerary(
+    list_id: int,
+    day: Optional[str] = None,
+    start_time: str = Query("09:00", pattern=r"^([01]\d|2[0-3]):[0-5]\d$"),
+    visit_minutes: float = Query(60, gt=0, le=24 * 60),
+    start_lat: Optional[float] = Query(None, ge=-90, le=90),
+    start_lon: Optional[float] = Query(None, ge=-180, le=180),
+    speed_kmh: float = Query(config.ROUTE_SPEED_KMH, gt=0, le=200),
+    apply: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Orders the list's stops (for `day`, if given) into a short route from
+    (start_lat, start_lon) or the first stop, and schedules them from
+    `start_time` with `visit_minutes` at each stop plus travel between them.
+    Stops the route reaches after midnight are listed as unscheduled.
+    With `apply=true` (which needs `day`) each scheduled stop's `times` is set to its new slot;
+    if a new slot overlaps a stop that keeps its times, nothing is changed and 409 lists the conflicts.
+    """
+    try:
+        return await orchestrator.optimise_itinerary(
+            db, list_id, day, start_time=start_time, visit_minutes=visit_minutes,
+            start_lat=start_lat, start_lon=start_lon, speed_kmh=speed_kmh, apply=apply,
+        )
+    except crud.SlotConflictError as e:
+        raise conflict_response(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
 @app.put("/itineraries/{itinerary_id}/times", response_model=schema.Itinerary)
-def update_itinerary_times(itinerary_id: int, times: str, db: Session = Depends(get_db)):
+def update_itinerary_times(itinerary_id: int, times: str, allow_overlap: bool = False, db: Session = Depends(get_db)):
     """
-    Updates the `times` of a specific itinerary entry.
+    Updates the `times` of a specific itinerary entry. Conflicts are handled as on create.
     """
-    itinerary = crud.update_itinerary_times(db=db, itinerary_id=itinerary_id, times=times)
+    try:
+        itinerary = crud.update_itinerary_times(db=db, itinerary_id=itinerary_id, times=times, allow_overlap=allow_overlap)
+    except crud.SlotConflictError as e:
+        raise conflict_response(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     if itinerary is None:
         raise HTTPException(status_code=404, detail="Itinerary not found")
     return itinerary
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, String
+from sqlalchemy import Column, Index, Integer, ForeignKey, String, inspect, text
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -13,11 +13,53 @@ class List(Base):
 
 class Itinerary(Base):
     __tablename__ = "itineraries"
+    __table_args__ = (
+        # get_itineraries_by_list reads a list's itineraries, optionally for one day key
+        Index("ix_itineraries_list_id_day_key_times", "list_id", "day_key", "times"),
+    )
     itinerary_id = Column(Integer, primary_key=True, index=True)
     list_id = Column(Integer, ForeignKey("lists.list_id"), nullable=False)
     business_id = Column(Integer, nullable=False)
     day = Column(String, nullable=True)  # Optional if no schedule
+    day_key = Column(String(64), nullable=True)  # timeslots.normalise_day(day), set by crud
     times = Column(String, nullable=True)
 
     # Using string reference to avoid circular dependency with List
-    list = relationship("List", back_populates="itineraries")
\ No newline at end of file
+    list = relationship("List", back_populates="itineraries")
+    # Parsed `times`; kept in sync by crud so range and overlap queries can use an index
+    slots = relationship(
+        "ItinerarySlot", back_populates="itinerary", cascade="all, delete-orphan",
+        order_by="ItinerarySlot.start_minute",
+    )
+
+
+class ItinerarySlot(Base):
+    __tablename__ = "itinerary_slots"
+    __table_args__ = (
+        # Range and overlap queries: slots of a list on a day, by start
+        Index("ix_itinerary_slots_list_id_day_start_minute", "list_id", "day", "start_minute", "end_minute"),
+        # Slots of one itinerary, first one first; unique so the backfill can't insert a row twice
+        Index("ix_itinerary_slots_itinerary_id_start_minute", "itinerary_id", "start_minute", unique=True),
+    )
+    slot_id = Column(Integer, primary_key=True)
+    itinerary_id = Column(Integer, ForeignKey("itineraries.itinerary_id", ondelete="CASCADE"), nullable=False)
+    list_id = Column(Integer, nullable=False)  # Copied from the itinerary so queries by list skip the join
+    day = Column(String(64), nullable=True)  # timeslots.normalise_day of the itinerary's day
+    start_minute = Column(Integer, nullable=False)  # Minutes after midnight
+    end_minute = Column(Integer, nullable=False)  # Exclusive; after start_minute, at most 24 * 60
+
+    itinerary = relationship("Itinerary", back_populates="slots")
+
+def ensure_columns(engine):
+    """
+    Adds itineraries.day_key and its index to a table created before they
+    existed; crud.backfill_slots fills the key in. create_all() doesn't alter
+    existing tables.
+    """
+    table = Itinerary.__table__
+    if "day_key" not in {column["name"] for column in inspect(engine).get_columns(table.name)}:
+        column_type = table.c.day_key.type.compile(dialect=engine.dialect)
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN day_key {column_type} NULL"))
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
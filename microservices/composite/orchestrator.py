@@ -1,77 +1,81 @@
-import httpx
 from fastapi import HTTPException
-import os
-from dotenv import load_dotenv
-from collections import deque
 from sqlalchemy.orm import Session
+import clients
 import crud, schema
+import config
+import queue_store
+import refill
+import asyncio
+import time
 from datetime import datetime, timedelta
+from typing import Optional
 
-# Load environment variables
-load_dotenv()
+import numpy as np
 
-BUSINESS_SERVICE_URL = os.getenv("BUSINESS_SERVICE_URL")
+import route_optimizer
+import timeslots
 
-# Queue to maintain a list of businesses
-business_queue = deque()
+# Business queues, one per session
+business_queues = queue_store.create_store()
 
 # Constants
 QUEUE_SIZE = 5  # Desired queue size for maintaining a list of businesses
+DEFAULT_SESSION = "default"  # Queue used when the caller doesn't name a session
 
-async def start_business_queue(address: str):
+async def start_business_queue(session_id: str, address: str):
     """
-    Initializes the business queue with businesses from the specified address.
+    Initializes the session's business queue with businesses from the specified address.
     """
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{BUSINESS_SERVICE_URL}?address={address}&limit={QUEUE_SIZE}")
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Failed to fetch businesses")
+    client = clients.get_client("business")
+    response = await client.get("", params={"address": address, "limit": QUEUE_SIZE})
+    if response.status_code != 200:
+        raise HTTPException(status_code=response.status_code, detail="Failed to fetch businesses")
 
-        businesses = response.json()
-        for business in businesses:
-            business_queue.append(business)
+    await queue_store.call(business_queues.push, session_id, response.json())
 
-    # Ensure the queue always has enough items
-    await maintain_queue(address)
+    # Top the queue up in the background if the first fetch came back short
+    refill_worker.request(session_id, address)
 
-async def end_business_queue():
+async def end_business_queue(session_id: str):
     """
-    Clears the business queue.
+    Clears the session's business queue.
     """
-    business_queue.clear()
+    await queue_store.call(business_queues.clear, session_id)
 
-async def maintain_queue(address: str):
+async def maintain_queue(session_id: str, address: str):
     """
-    Ensures that the business queue always has at least QUEUE_SIZE items.
-    Avoids adding duplicate businesses.
+    Ensures that the session's business queue always has at least QUEUE_SIZE items.
+    Duplicate businesses are ignored by the queue store.
     """
-    existing_ids = {business["business_id"] for business in business_queue}
-
-    if len(business_queue) < QUEUE_SIZE:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{BUSINESS_SERVICE_URL}?address={address}&limit={QUEUE_SIZE - len(business_queue)}")
-            if response.status_code == 200:
-                new_businesses = response.json()
-                for business in new_businesses:
-                    if business["business_id"] not in existing_ids:  # Avoid duplicates
-                        business_queue.append(business)
-                        existing_ids.add(business["business_id"])
-
-async def get_next_business():
+    queue_size = await queue_store.call(business_queues.size, session_id)
+    if queue_size < QUEUE_SIZE:
+        client = clients.get_client("business")
+        response = await client.get("", params={"address": address, "limit": QUEUE_SIZE - queue_size})
+        if response.status_code == 200:
+            await queue_store.call(business_queues.push, session_id, response.json())
+
+# Refills queues in the background once they fall below the low-water mark
+refill_worker = refill.RefillWorker(
+    business_queues,
+    maintain_queue,
+    low_water=config.QUEUE_LOW_WATER,
+    batch_window=config.QUEUE_REFILL_BATCH_WINDOW_MS / 1000,
+)
+
+async def get_next_business(session_id: str):
     """
-    Retrieves the next business from the queue and maintains the queue size.
+    Retrieves the next business from the session's queue and schedules a refill.
     """
-    if not business_queue:
+    next_business = await queue_store.call(business_queues.pop, session_id)  # Get the next business
+    if next_business is None:
         raise HTTPException(status_code=404, detail="No more businesses available in the queue")
 
-    next_business = business_queue.popleft()  # Get the next business
-    await maintain_queue(next_business.get("address", "default"))  # Use address to refill queue if needed
+    refill_worker.request(session_id, next_business.get("address", "default"))  # Use address to refill queue if needed
     return next_business
 
-async def add_business_to_user_list(db: Session, user_id: int, business_id: int, list_id: int, address: str, day: str):
+async def add_business_to_user_list(db: Session, session_id: str, user_id: int, business_id: int, list_id: int, address: str, day: str):
     """
-    Adds a business to a user's list (itinerary) and removes it from the queue.
+    Adds a business to a user's list (itinerary) and removes it from the session's queue.
     Ensures the queue size remains stable.
     """
     # Prepare itinerary data
@@ -83,25 +87,21 @@ async def add_business_to_user_list(db: Session, user_id: int, business_id: int,
     )
 
     # Pass itinerary data as a dictionary to CRUD function
-    crud.create_itinerary(db=db, itinerary_data=itinerary_data)  # Use .dict() to convert Pydantic model to dictionary
+    # The generated blocks cover the whole day for every business, so they always overlap; don't reject them
+    crud.create_itinerary(db=db, itinerary_data=itinerary_data, allow_overlap=True)
 
-    # Remove the business from the queue and maintain the queue size
-    await remove_business_from_queue(business_id, address)
-    await maintain_queue(address)
+    # Remove the business from the queue; the refill happens in the background
+    await remove_business_from_queue(session_id, business_id, address)
 
-async def remove_business_from_queue(business_id: int, address: str):
+async def remove_business_from_queue(session_id: str, business_id: int, address: str):
     """
-    Removes a specific business from the queue (e.g., if user skips it).
-    Calls maintain_queue to ensure the queue size remains stable.
+    Removes a specific business from the session's queue (e.g., if user skips it).
+    Schedules a background refill to keep the queue size stable.
     """
-    # Remove the business with the specified ID from the queue
-    for business in list(business_queue):
-        if business["business_id"] == business_id:
-            business_queue.remove(business)
-            break  # Exit once the business is removed
+    await queue_store.call(business_queues.remove, session_id, business_id)
 
     # Refill the queue if necessary
-    await maintain_queue(address)
+    refill_worker.request(session_id, address)
 
 def generate_time_blocks(start_time="09:00", interval_minutes=120, count=7):
     """
@@ -115,3 +115,122 @@ def generate_time_blocks(start_time="09:00", interval_minutes=120, count=7):
         blocks.append(f"{current_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')}")
         current_time = end_time
     return ",".join(blocks)
+
+
+async def fetch_business_coordinates(business_ids) -> dict:
+    """
+    Looks the businesses up in batches through the business service's multi-get
+    endpoint. Returns {business_id: business} for the ones that exist.
+    """
+    client = clients.get_client("business")
+    ids = list(dict.fromkeys(business_ids))
+    chunks = [ids[i:i + config.BUSINESS_BATCH_SIZE] for i in range(0, len(ids), config.BUSINESS_BATCH_SIZE)]
+    responses = await asyncio.gather(*(
+        client.get("/businesses", params={"ids": ",".join(map(str, chunk))}) for chunk in chunks
+    ))
+    businesses = {}
+    for response in responses:
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail="Failed to fetch business coordinates")
+        businesses.update({business["business_id"]: business for business in response.json()})
+    return businesses
+
+async def optimise_itinerary(
+    db: Session,
+    list_id: int,
+    day: Optional[str],
+    start_time: str = "09:00",
+    visit_minutes: float = 60,
+    start_lat: Optional[float] = None,
+    start_lon: Optional[float] = None,
+    speed_kmh: float = config.ROUTE_SPEED_KMH,
+    apply: bool = False,
+):
+    """
+    Orders a list's stops (optionally for one day) into a short walking route
+    and gives each a time slot that leaves room for travel from the previous stop.
+
+    Step 1 loads the itineraries, Step 2 their coordinates from the business
+    service, Step 3 orders them (nearest neighbour, 2-opt and Or-opt over a NumPy
+    distance matrix) and Step 4 schedules them until midnight; stops that
+    don't fit are reported as unscheduled. With `apply`, each scheduled stop's
+    `times` is replaced by its slot, which needs `day` since slots of
+    different days would otherwise be laid out as one route. Unrouted and
+    unscheduled stops keep their times, so the new slots raise
+    crud.SlotConflictError if they overlap those (or any other stop of the
+    list added meanwhile) and nothing is changed.
+
+    The database steps run in a worker thread so they don't stall the event loop.
+    """
+    if apply and day is None:
+        raise HTTPException(status_code=422, detail="A day is required to apply an optimised route.")
+
+    # Step 1: Stops of the list (and day)
+    itineraries = await asyncio.to_thread(crud.get_itineraries_by_list, db, list_id, day)
+    if not itineraries:
+        raise HTTPException(status_code=404, detail="No itineraries found for the specified list and day.")
+    if len(itineraries) > config.ROUTE_MAX_STOPS:
+        raise HTTPException(status_code=400, detail=f"At most {config.ROUTE_MAX_STOPS} stops can be optimised at once.")
+
+    # Step 2: Coordinates; stops without them can't be routed
+    businesses = await fetch_business_coordinates([itinerary.business_id for itinerary in itineraries])
+    routable, unrouted = [], []
+    for itinerary in itineraries:
+        business = businesses.get(itinerary.business_id) or {}
+        if business.get("latitude") is None or business.get("longitude") is None:
+            unrouted.append(itinerary.business_id)
+        else:
+            routable.append((itinerary, business))
+
+    # Step 3: Order the stops, starting from the given point or else the first stop
+    started = time.perf_counter()
+    coordinates = [(business["latitude"], business["longitude"]) for _, business in routable]
+    has_origin = start_lat is not None and start_lon is not None
+    if has_origin:
+        coordinates.insert(0, (start_lat, start_lon))
+    order, distances = route_optimizer.optimise(np.array(coordinates).reshape(-1, 2))
+
+    # Step 4: Time slots including travel
+    slots = route_optimizer.schedule(
+        order, distances, route_optimizer.parse_minutes(start_time), visit_minutes, speed_kmh,
+        detour_factor=config.ROUTE_DETOUR_FACTOR, first_is_origin=has_origin, day_end=timeslots.MINUTES_PER_DAY,
+    )
+    compute_ms = (time.perf_counter() - started) * 1000
+    # The origin is left at start_time, so only stops can fall past midnight
+    unscheduled = [routable[index - 1 if has_origin else index][0].business_id for index in order[len(slots):]]
+
+    stops = []
+    for index, (arrival, departure, travel, meters) in zip(order, slots):
+        if has_origin:
+            if index == 0:
+                continue
+            index -= 1
+        itinerary, business = routable[index]
+        stops.append({
+            "itinerary_id": itinerary.itinerary_id,
+            "business_id": itinerary.business_id,
+            "business_name": business.get("business_name"),
+            "latitude": business["latitude"],
+            "longitude": business["longitude"],
+            "arrival": route_optimizer.format_minutes(arrival),
+            "departure": route_optimizer.format_minutes(departure),
+            "travel_minutes": round(travel, 1),
+            "travel_meters": round(meters, 1),
+        })
+
+    if apply and stops:
+        await asyncio.to_thread(
+            crud.set_itinerary_times, db, {stop["itinerary_id"]: f"{stop['arrival']}-{stop['departure']}" for stop in stops}
+        )
+
+    return {
+        "list_id": list_id,
+        "day": day,
+        "stops": stops,
+        "unrouted_business_ids": unrouted,
+        "unscheduled_business_ids": unscheduled,
+        "total_travel_meters": round(sum(stop["travel_meters"] for stop in stops), 1),
+        "total_travel_minutes": round(sum(stop["travel_minutes"] for stop in stops), 1),
+        "applied": apply and bool(stops),
+        "compute_ms": round(compute_ms, 3),
+    }
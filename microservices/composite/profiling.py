@@ -0,0 +1,291 @@
+import cProfile
+import functools
+import hmac
+import inspect
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+# Requests carrying `X-Profile: <PROFILE_TOKEN>` are profiled; unset disables the header trigger
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of all requests profiled without the header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# "cprofile" (deterministic; the event loop thread, which also runs concurrent async requests,
+# plus this request's sync endpoint in its threadpool worker) or "sample" (statistical; every thread)
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cprofile")
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+MODES = ("cprofile", "sample")
+EXTENSIONS = {"cprofile": ".prof", "sample": ".folded"}
+# Leaf functions of threads that are parked rather than working
+IDLE_LEAVES = {"wait", "select"}
+
+# Profilers started by sync endpoints of the request being profiled in cprofile mode. The
+# threadpool runs endpoints in a copy of the request's context, so they see the same list.
+_worker_profiles: ContextVar[Optional[list]] = ContextVar("worker_profiles", default=None)
+
+
+def _profile_in_worker(call):
+    """
+    Wraps a sync endpoint so that, while its request is being profiled, it runs
+    under its own cProfile.Profile in the threadpool thread that calls it.
+    """
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        profiles = _worker_profiles.get()
+        if profiles is None:
+            return call(*args, **kwargs)
+        profiler = cProfile.Profile()
+        profiles.append(profiler)
+        profiler.enable()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.disable()
+
+    wrapper.profiled = True
+    return wrapper
+
+
+def _wrap_sync_endpoints(app):
+    """
+    cProfile only sees the thread that enables it, so sync endpoints (which FastAPI
+    runs in the threadpool) get a profiler of their own, merged in when saving.
+    """
+    for route in getattr(app, "routes", ()):
+        dependant = getattr(route, "dependant", None)
+        call = getattr(dependant, "call", None)
+        if call is None or getattr(call, "profiled", False) or inspect.iscoroutinefunction(call):
+            continue
+        dependant.call = _profile_in_worker(call)
+
+
+class StackSampler:
+    """
+    Statistical profiler: a background thread records the stacks of all other
+    threads every `interval` seconds. Unlike cProfile it sees every thread,
+    including sync dependencies and other requests' workers. Output is in the folded format used
+    by flamegraph.pl and speedscope (one `thread;frame;frame count` per line).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or frame.f_code.co_name in IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.counts[";".join(reversed(stack))] += 1
+
+    def dump(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _safe_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", value)[:64]
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that profiles a request when it carries the profile
+    header with the right token, or when it falls in the sample. A profile and
+    a JSON sidecar with the request details are written to `directory`, named
+    by correlation ID. Only one request is profiled at a time; others that ask
+    while one is running are served normally.
+
+    Requests that are not profiled cost one header scan (and a random() call
+    when sampling is enabled).
+    """
+
+    def __init__(
+        self,
+        app,
+        token: str = PROFILE_TOKEN,
+        sample_rate: float = PROFILE_SAMPLE_RATE,
+        mode: str = PROFILE_MODE,
+        directory: str = PROFILE_DIR,
+        max_files: int = PROFILE_MAX_FILES,
+        sample_interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'; use one of {', '.join(MODES)}")
+        self.app = app
+        self.token = token.encode("latin-1")
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.directory = directory
+        self.max_files = max_files
+        self.sample_interval = sample_interval
+        self._busy = threading.Lock()
+        self._wrapped = set()  # ids of apps whose sync endpoints are wrapped
+
+    def _wants_profile(self, scope) -> Optional[str]:
+        mode = None
+        if self.token:
+            requested = False
+            for name, value in scope["headers"]:
+                if name == b"x-profile" and hmac.compare_digest(value, self.token):
+                    requested = True
+                elif name == b"x-profile-mode" and value.decode("latin-1") in MODES:
+                    mode = value.decode("latin-1")
+            if requested:
+                return mode or self.mode
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.mode
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Reading profiles back shouldn't produce new ones
+        mode = None if scope["path"].startswith("/admin/profiles") else self._wants_profile(scope)
+        if mode is None or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profiler = cProfile.Profile() if mode == "cprofile" else StackSampler(self.sample_interval)
+        workers = []
+        start_time = time.perf_counter()
+        try:
+            if mode == "cprofile":
+                app = scope.get("app")
+                if id(app) not in self._wrapped:
+                    _wrap_sync_endpoints(app)
+                    self._wrapped.add(id(app))
+                context_token = _worker_profiles.set(workers)
+                profiler.enable()
+            else:
+                profiler.start()
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                if mode == "cprofile":
+                    profiler.disable()
+                    _worker_profiles.reset(context_token)
+                else:
+                    profiler.stop()
+        finally:
+            self._busy.release()
+
+        correlation_id = scope.get("state", {}).get("correlation_id") or dict(scope["headers"]).get(
+            b"x-correlation-id", str(uuid.uuid4()).encode()
+        ).decode("latin-1")
+        details = {
+            "correlation_id": correlation_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status_code": status_code,
+            "duration_ms": round((time.perf_counter() - start_time) * 1000, 3),
+            "mode": mode,
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        await run_in_threadpool(self._save, profiler, details, workers)
+
+    def _save(self, profiler, details: dict, workers: List[cProfile.Profile]):
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{int(time.time() * 1000)}-{_safe_name(details['correlation_id'])}"
+        details["file"] = name + EXTENSIONS[details["mode"]]
+        path = os.path.join(self.directory, details["file"])
+        if details["mode"] == "cprofile":
+            stats = pstats.Stats(profiler)
+            for worker in workers:
+                stats.add(worker)
+            stats.dump_stats(path)
+        else:
+            profiler.dump(path)
+        with open(os.path.join(self.directory, name + ".json"), "w") as f:
+            json.dump(details, f)
+        self._prune()
+
+    def _prune(self):
+        sidecars = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for sidecar in sidecars[:max(len(sidecars) - self.max_files, 0)]:
+            stem = sidecar[:-len(".json")]
+            for extension in (".json", *EXTENSIONS.values()):
+                try:
+                    os.remove(os.path.join(self.directory, stem + extension))
+                except FileNotFoundError:
+                    pass
+
+
+def is_authorized(header_value: Optional[str], token: str = PROFILE_TOKEN) -> bool:
+    """
+    Admin access needs PROFILE_TOKEN to be set and sent in the X-Profile header.
+    """
+    return bool(token) and header_value is not None and hmac.compare_digest(header_value.encode(), token.encode())
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> List[dict]:
+    """
+    Returns the saved profiles' details, newest first.
+    """
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+
+def profile_path(file: str, directory: str = PROFILE_DIR) -> Optional[str]:
+    """
+    Resolves a profile file name from `list_profiles`, refusing anything outside `directory`.
+    """
+    if os.path.basename(file) != file or not file.endswith(tuple(EXTENSIONS.values())):
+        return None
+    path = os.path.join(directory, file)
+    return path if os.path.isfile(path) else None
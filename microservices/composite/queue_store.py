@@ -0,0 +1,354 @@
+import abc
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import config
+
+
+class QueueStore(abc.ABC):
+    """
+    Business queues keyed by session (e.g. a user session or a list id).
+
+    Each queue keeps businesses in insertion order, ignores duplicate
+    business_ids and supports removal by business_id. Stores drop whole queues
+    that have been idle for `ttl` seconds, and evict the least recently used
+    queues once more than `max_items` businesses are held in total.
+
+    Stores whose methods block on I/O set `blocking`; async callers go through
+    `call`, which runs those methods in a worker thread.
+    """
+
+    blocking = False
+
+    @abc.abstractmethod
+    def push(self, session_id: str, businesses: List[dict]) -> int:
+        """Appends businesses not already queued; returns how many were added."""
+
+    @abc.abstractmethod
+    def pop(self, session_id: str) -> Optional[dict]:
+        """Removes and returns the first business in the queue, or None if empty."""
+
+    @abc.abstractmethod
+    def remove(self, session_id: str, business_id: int) -> bool:
+        """Removes the business from the queue; returns whether it was queued."""
+
+    @abc.abstractmethod
+    def size(self, session_id: str) -> int:
+        pass
+
+    @abc.abstractmethod
+    def clear(self, session_id: str):
+        pass
+
+    @abc.abstractmethod
+    def stats(self) -> dict:
+        pass
+
+
+async def call(method, *args):
+    """
+    Awaits a store method from async code, e.g. `await call(store.pop, session_id)`.
+    Methods of blocking stores run in a worker thread so they don't stall the event loop.
+    """
+    if method.__self__.blocking:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+class MemoryQueueStore(QueueStore):
+    """
+    In-process store. Each queue is an OrderedDict keyed by business_id, so
+    removing a skipped business is O(1) instead of a scan.
+    """
+
+    def __init__(self, max_items: int = 100000, ttl: float = 3600):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._queues: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._touched: Dict[str, float] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def _queue(self, session_id: str, create: bool = False) -> Optional[OrderedDict]:
+        queue = self._queues.get(session_id)
+        now = time.monotonic()
+        if queue is not None and now - self._touched[session_id] > self.ttl:
+            self._drop(session_id)
+            queue = None
+        if queue is None and create:
+            queue = self._queues[session_id] = OrderedDict()
+        if queue is not None:
+            self._queues.move_to_end(session_id)
+            self._touched[session_id] = now
+        return queue
+
+    def _drop(self, session_id: str):
+        queue = self._queues.pop(session_id)
+        del self._touched[session_id]
+        self._total -= len(queue)
+
+    def _evict(self, keep: str):
+        # Least recently used queues are at the front of the OrderedDict
+        now = time.monotonic()
+        while self._queues:
+            session_id = next(iter(self._queues))
+            if now - self._touched[session_id] <= self.ttl:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+        while self._total > self.max_items and len(self._queues) > 1:
+            session_id = next(iter(self._queues))
+            if session_id == keep:
+                break
+            self._drop(session_id)
+            self.evictions += 1
+
+    def push(self, session_id: str, businesses: List[dict]) -> int:
+        with self._lock:
+            queue = self._queue(session_id, create=True)
+            added = 0
+            for business in businesses:
+                if business["business_id"] not in queue:
+                    queue[business["business_id"]] = business
+                    added += 1
+            self._total += added
+            self._evict(keep=session_id)
+            return added
+
+    def pop(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            queue = self._queue(session_id)
+            if not queue:
+                return None
+            self._total -= 1
+            return queue.popitem(last=False)[1]
+
+    def remove(self, session_id: str, business_id: int) -> bool:
+        with self._lock:
+            queue = self._queue(session_id)
+            if queue is None or queue.pop(business_id, None) is None:
+                return False
+            self._total -= 1
+            return True
+
+    def size(self, session_id: str) -> int:
+        with self._lock:
+            queue = self._queue(session_id)
+            return len(queue) if queue is not None else 0
+
+    def clear(self, session_id: str):
+        with self._lock:
+            if session_id in self._queues:
+                self._drop(session_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._queues),
+                "items": self._total,
+                "max_items": self.max_items,
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteQueueStore(QueueStore):
+    """
+    Store backed by a local SQLite file (WAL mode), so all uvicorn workers on a
+    host see the same queues.
+
+    Item counts are kept per session and in total, so sizes and eviction don't
+    count rows. `size`, and `pop` or `remove` on an empty or unknown queue, only
+    read: they take no write lock and create no session rows.
+    """
+
+    blocking = True
+    SCHEMA_VERSION = 2
+
+    def __init__(self, path: str, max_items: int = 100000, ttl: float = 3600):
+        self.path = path
+        self.max_items = max_items
+        self.ttl = ttl
+        self._local = threading.local()
+        self.evictions = 0
+        with self._transaction() as conn:
+            if conn.execute("PRAGMA user_version").fetchone()[0] != self.SCHEMA_VERSION:
+                # Queues are transient; rebuild files written by an older version rather than migrate them
+                for table in ("queue_items", "queue_sessions", "queue_totals"):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    touched REAL NOT NULL,
+                    items INTEGER NOT NULL DEFAULT 0
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue_items (
+                    session_id TEXT NOT NULL,
+                    business_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (session_id, business_id)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS queue_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    items INTEGER NOT NULL
+                )""")
+            conn.execute("INSERT OR IGNORE INTO queue_totals (id, items) VALUES (0, 0)")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_queue_items_session_position ON queue_items (session_id, position)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_queue_sessions_touched ON queue_sessions (touched)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _items(self, conn: sqlite3.Connection, session_id: str) -> Optional[int]:
+        """
+        The session's item count, or None if it doesn't exist or has expired.
+        """
+        row = conn.execute("SELECT touched, items FROM queue_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return row[1]
+
+    def _count(self, conn: sqlite3.Connection, session_id: str, added: int):
+        conn.execute(
+            "UPDATE queue_sessions SET items = items + ?, touched = ? WHERE session_id = ?",
+            (added, time.time(), session_id),
+        )
+        conn.execute("UPDATE queue_totals SET items = items + ? WHERE id = 0", (added,))
+
+    def _drop(self, conn: sqlite3.Connection, session_id: str):
+        row = conn.execute("SELECT items FROM queue_sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM queue_items WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM queue_sessions WHERE session_id = ?", (session_id,))
+        conn.execute("UPDATE queue_totals SET items = items - ? WHERE id = 0", (row[0],))
+
+    def _evict(self, conn: sqlite3.Connection, keep: str):
+        for (session_id,) in conn.execute(
+            "SELECT session_id FROM queue_sessions WHERE touched < ?", (time.time() - self.ttl,)
+        ).fetchall():
+            self._drop(conn, session_id)
+            self.evictions += 1
+
+        total = conn.execute("SELECT items FROM queue_totals WHERE id = 0").fetchone()[0]
+        if total <= self.max_items:
+            return
+        for session_id, count in conn.execute(
+            "SELECT session_id, items FROM queue_sessions WHERE session_id != ? ORDER BY touched", (keep,)
+        ).fetchall():
+            self._drop(conn, session_id)
+            self.evictions += 1
+            total -= count
+            if total <= self.max_items:
+                break
+
+    def push(self, session_id: str, businesses: List[dict]) -> int:
+        with self._transaction() as conn:
+            if self._items(conn, session_id) is None:
+                self._drop(conn, session_id)  # Expired
+                conn.execute(
+                    "INSERT INTO queue_sessions (session_id, touched, items) VALUES (?, ?, 0)", (session_id, time.time())
+                )
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position), 0) FROM queue_items WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+            added = 0
+            for business in businesses:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO queue_items (session_id, business_id, position, payload) VALUES (?, ?, ?, ?)",
+                    (session_id, business["business_id"], position + added + 1, json.dumps(business)),
+                )
+                added += cursor.rowcount
+            self._count(conn, session_id, added)
+            self._evict(conn, keep=session_id)
+            return added
+
+    def pop(self, session_id: str) -> Optional[dict]:
+        # Most calls on an empty queue: answer them without the write lock
+        if not self._items(self._connection(), session_id):
+            return None
+        with self._transaction() as conn:
+            if not self._items(conn, session_id):
+                return None
+            business_id, payload = conn.execute(
+                "SELECT business_id, payload FROM queue_items WHERE session_id = ? ORDER BY position LIMIT 1",
+                (session_id,),
+            ).fetchone()
+            conn.execute("DELETE FROM queue_items WHERE session_id = ? AND business_id = ?", (session_id, business_id))
+            self._count(conn, session_id, -1)
+            return json.loads(payload)
+
+    def remove(self, session_id: str, business_id: int) -> bool:
+        conn = self._connection()
+        if not self._items(conn, session_id) or conn.execute(
+            "SELECT 1 FROM queue_items WHERE session_id = ? AND business_id = ?", (session_id, business_id)
+        ).fetchone() is None:
+            return False
+        with self._transaction() as conn:
+            if self._items(conn, session_id) is None:
+                return False
+            cursor = conn.execute(
+                "DELETE FROM queue_items WHERE session_id = ? AND business_id = ?", (session_id, business_id)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._count(conn, session_id, -1)
+            return True
+
+    def size(self, session_id: str) -> int:
+        return self._items(self._connection(), session_id) or 0
+
+    def clear(self, session_id: str):
+        with self._transaction() as conn:
+            self._drop(conn, session_id)
+
+    def stats(self) -> dict:
+        conn = self._connection()
+        return {
+            "backend": "sqlite",
+            "sessions": conn.execute("SELECT COUNT(*) FROM queue_sessions").fetchone()[0],
+            "items": conn.execute("SELECT items FROM queue_totals WHERE id = 0").fetchone()[0],
+            "max_items": self.max_items,
+            "evictions": self.evictions,
+        }
+
+
+def create_store() -> QueueStore:
+    """
+    Builds the store selected by QUEUE_BACKEND ("memory" or "sqlite").
+    """
+    if config.QUEUE_BACKEND == "sqlite":
+        return SQLiteQueueStore(config.QUEUE_SQLITE_PATH, max_items=config.QUEUE_MAX_ITEMS, ttl=config.QUEUE_TTL_SECONDS)
+    if config.QUEUE_BACKEND != "memory":
+        raise ValueError(f"Unknown QUEUE_BACKEND '{config.QUEUE_BACKEND}'; use 'memory' or 'sqlite'")
+    return MemoryQueueStore(max_items=config.QUEUE_MAX_ITEMS, ttl=config.QUEUE_TTL_SECONDS)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+import queue_store
+from queue_store import QueueStore
+
+
+class RefillWorker:
+    """
+    Refills session queues from a background asyncio task.
+
+    Handlers call `request()`, which only records the session and returns.
+    The worker waits `batch_window` seconds so requests that arrive close
+    together collapse into one refill per session, then refills every requested
+    queue that has dropped below `low_water` items.
+    """
+
+    def __init__(
+        self,
+        store: QueueStore,
+        refill: Callable[[str, str], Awaitable[None]],
+        low_water: int = 2,
+        batch_window: float = 0.02,
+    ):
+        self.store = store
+        self._refill = refill
+        self.low_water = low_water
+        self.batch_window = batch_window
+        self._pending: Dict[str, str] = {}  # session_id -> address to refill from
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.requests = 0
+        self.batches = 0
+        self.refills = 0
+        self.skipped = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_last = 0.0
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def request(self, session_id: str, address: str):
+        """
+        Asks for the session's queue to be topped up; never waits on the refill.
+        """
+        self.requests += 1
+        self._pending[session_id] = address
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.batch_window)
+            self._wakeup.clear()
+            batch, self._pending = self._pending, {}
+            self.batches += 1
+            try:
+                await asyncio.gather(*(self._refill_one(s, a) for s, a in batch.items()))
+            except Exception as e:
+                # _refill_one handles its own errors; anything else must not stop the worker
+                self.errors += 1
+                logging.exception(f"Refill batch failed: {e}")
+
+    async def _refill_one(self, session_id: str, address: str):
+        start = time.perf_counter()
+        try:
+            if await queue_store.call(self.store.size, session_id) >= self.low_water:
+                self.skipped += 1
+                return
+            await self._refill(session_id, address)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Refill of queue '{session_id}' failed: {e}")
+            return
+        elapsed = time.perf_counter() - start
+        self.refills += 1
+        self.latency_total += elapsed
+        self.latency_last = elapsed
+        self.latency_max = max(self.latency_max, elapsed)
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "requests": self.requests,
+            "batches": self.batches,
+            "refills": self.refills,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "latency_avg_ms": round(self.latency_total / self.refills * 1000, 3) if self.refills else None,
+            "latency_last_ms": round(self.latency_last * 1000, 3),
+            "latency_max_ms": round(self.latency_max * 1000, 3),
+        }
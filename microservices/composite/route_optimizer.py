@@ -0,0 +1,174 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371008.8
+
+
+def distance_matrix(coordinates: np.ndarray) -> np.ndarray:
+    """
+    Pairwise great-circle distances in meters for an (n, 2) array of
+    (latitude, longitude) in degrees, computed in one vectorised pass.
+    """
+    radians = np.radians(np.asarray(coordinates, dtype=float))
+    lat = radians[:, 0][:, None]
+    lon = radians[:, 1][:, None]
+    a = np.sin((lat.T - lat) / 2) ** 2 + np.cos(lat) * np.cos(lat.T) * np.sin((lon.T - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_neighbour(distances: np.ndarray, start: int = 0) -> np.ndarray:
+    """
+    Greedy open path from `start`: always go to the closest stop not yet visited.
+    """
+    n = len(distances)
+    visited = np.zeros(n, dtype=bool)
+    order = np.empty(n, dtype=int)
+    order[0] = start
+    visited[start] = True
+    for step in range(1, n):
+        row = np.where(visited, np.inf, distances[order[step - 1]])
+        order[step] = int(np.argmin(row))
+        visited[order[step]] = True
+    return order
+
+
+def path_length(order: np.ndarray, distances: np.ndarray) -> float:
+    return float(distances[order[:-1], order[1:]].sum())
+
+
+def two_opt(order: np.ndarray, distances: np.ndarray, max_passes: int = 50) -> np.ndarray:
+    """
+    Improves an open path that starts at order[0] by reversing segments
+    order[i..j] while that shortens it. For each i, the gain of every j is
+    computed at once with NumPy and the best reversal is applied.
+    """
+    order = np.array(order, dtype=int)
+    n = len(order)
+    if n < 4:
+        return order
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, n - 1):
+            before, first = order[i - 1], order[i]
+            last = order[i + 1:]  # Candidate segment ends j = i+1 .. n-1
+            after = np.append(order[i + 2:], -1)  # Stop after each j; -1 when j is the end of the path
+            removed = distances[before, first] + np.where(after >= 0, distances[last, after], 0.0)
+            added = distances[before, last] + np.where(after >= 0, distances[first, after], 0.0)
+            gains = removed - added
+            best = int(np.argmax(gains))
+            if gains[best] > 1e-9:
+                j = i + 1 + best
+                order[i:j + 1] = order[i:j + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def or_opt(order: np.ndarray, distances: np.ndarray, max_passes: int = 50) -> np.ndarray:
+    """
+    Improves an open path that starts at order[0] by moving runs of 1-3
+    consecutive stops (possibly reversed) to a better place in the path,
+    which catches what segment reversals alone miss. For each run, the cost
+    of every insertion point is computed at once with NumPy.
+    """
+    order = np.array(order, dtype=int)
+    n = len(order)
+    for _ in range(max_passes):
+        improved = False
+        for length in (1, 2, 3):
+            i = 1
+            while i + length <= n:
+                run = order[i:i + length]
+                rest = np.concatenate((order[:i], order[i + length:]))
+                first, last = run[0], run[-1]
+                before = order[i - 1]
+                after = order[i + length] if i + length < n else -1
+                saved = distances[before, first] + (
+                    distances[last, after] - distances[before, after] if after >= 0 else 0.0
+                )
+                # Insert between rest[k] and rest[k + 1], or after the end of the path
+                a = rest
+                b = np.append(rest[1:], -1)
+                has_b = b >= 0
+                forward = distances[a, first] + np.where(has_b, distances[last, b] - distances[a, b], 0.0)
+                backward = distances[a, last] + np.where(has_b, distances[first, b] - distances[a, b], 0.0)
+                costs = np.minimum(forward, backward)
+                k = int(np.argmin(costs))
+                if saved - costs[k] > 1e-9:
+                    segment = run if forward[k] <= backward[k] else run[::-1]
+                    order = np.concatenate((rest[:k + 1], segment, rest[k + 1:]))
+                    improved = True
+                i += 1
+        if not improved:
+            break
+    return order
+
+
+def optimise(coordinates: np.ndarray, start: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Orders stops for a short open route from `start`: nearest neighbour, then
+    2-opt and Or-opt until neither finds an improvement. Returns (order, distance matrix).
+    """
+    distances = distance_matrix(coordinates)
+    if len(distances) < 2:
+        return np.arange(len(distances)), distances
+    order = nearest_neighbour(distances, start)
+    length = path_length(order, distances)
+    while True:
+        order = or_opt(two_opt(order, distances), distances)
+        new_length = path_length(order, distances)
+        if new_length >= length - 1e-9:
+            return order, distances
+        length = new_length
+
+
+def schedule(
+    order: np.ndarray,
+    distances: np.ndarray,
+    start_minutes: float,
+    visit_minutes: float,
+    speed_kmh: float,
+    detour_factor: float = 1.0,
+    first_is_origin: bool = False,
+    day_end: float = 24 * 60,
+) -> List[Tuple[float, float, float, float]]:
+    """
+    Times each stop along `order`: returns (arrival, departure, travel minutes,
+    travel meters) per stop, in minutes after midnight. Travel time is the
+    straight-line distance times `detour_factor` at `speed_kmh`. When
+    `first_is_origin`, order[0] is a starting point (e.g. a hotel) that is left
+    at `start_minutes` and gets no visit.
+
+    Slots stay within the day: the schedule stops before the first stop that
+    would be left after `day_end`, so it may cover only a prefix of `order`.
+    """
+    meters_per_minute = speed_kmh * 1000 / 60
+    slots = []
+    clock = start_minutes
+    previous: Optional[int] = None
+    for position, stop in enumerate(order):
+        meters = 0.0 if previous is None else float(distances[previous, stop]) * detour_factor
+        travel = meters / meters_per_minute
+        arrival = clock + travel
+        departure = arrival if first_is_origin and position == 0 else arrival + visit_minutes
+        if departure > day_end + 1e-9:
+            break
+        slots.append((arrival, departure, travel, meters))
+        clock = departure
+        previous = stop
+    return slots
+
+
+def format_minutes(minutes: float) -> str:
+    """
+    Minutes after midnight as HH:MM, rounded up to the minute so travel is never cut short.
+    """
+    total = int(np.ceil(minutes - 1e-9))
+    return f"{total // 60:02d}:{total % 60:02d}"
+
+
+def parse_minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class ItineraryBase(BaseModel):
     list_id: int  # Added list_id
@@ -18,3 +18,38 @@ class Itinerary(ItineraryBase):
 
     class Config:
         from_attributes = True
+
+
+class RouteStop(BaseModel):
+    itinerary_id: int
+    business_id: int
+    business_name: Optional[str] = None
+    latitude: float
+    longitude: float
+    arrival: str  # "HH:MM"
+    departure: str
+    travel_minutes: float  # From the previous stop (or the start point)
+    travel_meters: float
+
+class OptimizedRoute(BaseModel):
+    list_id: int
+    day: Optional[str] = None
+    stops: List[RouteStop]
+    unrouted_business_ids: List[int]  # Businesses without coordinates, left unscheduled
+    unscheduled_business_ids: List[int]  # Routed, but the route reaches them after midnight
+    total_travel_meters: float
+    total_travel_minutes: float
+    applied: bool
+    compute_ms: float
+
+class ItinerarySlot(BaseModel):
+    slot_id: int
+    itinerary_id: int
+    business_id: int
+    day: Optional[str] = None  # Normalised: "mon", "tue", ...
+    start: str  # "HH:MM"
+    end: str  # "HH:MM", exclusive
+
+class SlotConflict(BaseModel):
+    first: ItinerarySlot  # Starts first
+    second: ItinerarySlot
@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, inspect, text, update
+
+import crud
+import models
+import schema
+
+
+def add(db, business_id, day, times=None):
+    return crud.create_itinerary(db, schema.ItineraryCreate(list_id=1, business_id=business_id, day=day, times=times or ""))
+
+
+def test_itineraries_by_list_match_the_normalised_day(db):
+    add(db, 1, "Monday", "11:00-12:00")
+    add(db, 2, " mon ", "09:00-10:00")
+    add(db, 3, "MON")  # No times, so no slots
+    add(db, 4, "Tuesday", "09:00-10:00")
+
+    for day in ("mon", "Monday", "MONDAY"):
+        assert [i.business_id for i in crud.get_itineraries_by_list(db, 1, day)] == [2, 1, 3]
+    assert [i.business_id for i in crud.get_itineraries_by_list(db, 1, "tue")] == [4]
+    assert len(crud.get_itineraries_by_list(db, 1)) == 4
+
+
+def test_backfill_sets_the_day_key_of_older_rows(db):
+    add(db, 1, "Monday", "11:00-12:00")
+    add(db, 2, "  ")
+    db.execute(update(models.Itinerary).values(day_key=None))  # As written before day_key existed
+    db.commit()
+    assert crud.get_itineraries_by_list(db, 1, "mon") == []
+
+    assert crud.backfill_slots(db)["day_keys"] == 1
+    assert [i.business_id for i in crud.get_itineraries_by_list(db, 1, "mon")] == [1]
+    assert crud.backfill_slots(db)["day_keys"] == 0
+
+
+def test_ensure_columns_upgrades_an_old_itineraries_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE itineraries (itinerary_id INTEGER PRIMARY KEY, list_id INTEGER NOT NULL, "
+            "business_id INTEGER NOT NULL, day VARCHAR, times VARCHAR)"
+        ))
+
+    models.ensure_columns(engine)
+
+    inspector = inspect(engine)
+    assert "day_key" in {c["name"] for c in inspector.get_columns("itineraries")}
+    assert "ix_itineraries_list_id_day_key_times" in {index["name"] for index in inspector.get_indexes("itineraries")}
@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import crud
+import database
+import group_commit
+import models
+import schema
+
+
+def item(business_id, times, day="Monday", list_id=1, allow_overlap=False):
+    return schema.ItineraryCreate(list_id=list_id, business_id=business_id, day=day, times=times), allow_overlap
+
+
+def slots(db, itinerary_id):
+    return [(s.day, s.start_minute, s.end_minute) for s in db.query(models.ItinerarySlot).filter_by(itinerary_id=itinerary_id)]
+
+
+def test_batch_checks_items_against_each_other_and_stored_slots(db):
+    crud.create_itinerary(db, item(1, "08:00-09:00")[0])
+
+    results = crud.create_itineraries(db, [
+        item(2, "09:00-10:00"),
+        item(3, "09:30-10:30"),  # Overlaps item 2 of the same batch
+        item(4, "08:30-09:00"),  # Overlaps the stored itinerary
+        item(5, "09:30-10:30", day="tue"),  # Same times, other day
+        item(6, "09:30-10:30", list_id=2),  # Same times, other list
+        item(7, "09:45-10:00", allow_overlap=True),
+        item(8, "25:00-26:00"),
+    ])
+    db.commit()
+
+    assert [r.business_id for r in results if isinstance(r, models.Itinerary)] == [2, 5, 6, 7]
+    assert isinstance(results[1], crud.SlotConflictError)
+    assert [c.business_id for c in results[1].conflicts] == [2]
+    assert [c.business_id for c in results[2].conflicts] == [1]
+    assert isinstance(results[6], ValueError) and not isinstance(results[6], crud.SlotConflictError)
+    assert slots(db, results[0].itinerary_id) == [("mon", 540, 600)]
+    assert slots(db, results[3].itinerary_id) == [("tue", 570, 630)]
+    assert db.query(models.Itinerary).count() == 5
+
+
+def test_writer_gives_each_caller_its_own_result(db):
+    writer = group_commit.GroupCommitWriter(database.SessionLocal, crud.create_itineraries, window_ms=50, name="test")
+    writer.start()
+    try:
+        # Every item wants the same slot, so exactly one of them gets it whichever batch it lands in
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(writer.write, item(i, "12:00-13:00")) for i in range(8)]
+        outcomes = []
+        for future in futures:
+            try:
+                outcomes.append(future.result().business_id)
+            except crud.SlotConflictError:
+                outcomes.append("conflict")
+    finally:
+        writer.stop()
+
+    assert outcomes.count("conflict") == 7
+    assert writer.counters["batches"] < 8
+    assert db.query(models.Itinerary).count() == 1
+    with pytest.raises(RuntimeError):
+        writer.submit(item(9, "14:00-15:00"))
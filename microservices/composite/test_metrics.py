@@ -0,0 +1,42 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import clients
+import metrics
+
+
+def upstream_count(service, status):
+    return metrics.registry.render().count(
+        f'upstream_request_duration_seconds_count{{service="{service}",method="GET",status="{status}"}} 1'
+    )
+
+
+def test_downstream_calls_are_timed_by_service_and_status():
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200 if request.url.path == "/ok" else 503))
+        client = clients.ServiceClient("metrics-test", "http://upstream.local", transport=transport)
+        await client.get("/ok")
+        await client.get("/down")
+        await client.aclose()
+
+    asyncio.run(run())
+
+    assert upstream_count("metrics-test", "200") == 1
+    assert upstream_count("metrics-test", "503") == 1
+
+
+def test_service_serves_queue_and_pool_metrics(db):
+    import main
+
+    main.orchestrator.business_queues.push("metrics-test", [{"business_id": 1}, {"business_id": 2}])
+    try:
+        body = TestClient(main.app).get("/metrics").text
+    finally:
+        main.orchestrator.business_queues.clear("metrics-test")
+
+    assert "orchestrator_queue_items 2" in body
+    assert "orchestrator_queue_sessions 1" in body
+    assert 'db_pool_size{engine="primary"}' in body
+    assert 'group_commit_writes{writer="itineraries",kind="items"}' in body
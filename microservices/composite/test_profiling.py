@@ -0,0 +1,38 @@
+import os
+import pstats
+
+from fastapi.testclient import TestClient
+
+import crud
+import profiling
+import schema
+
+
+def service_profiler(app, directory, monkeypatch):
+    """
+    The service's own ProfilingMiddleware, pointed at `directory` with token "secret".
+    """
+    layer = app.middleware_stack
+    while not isinstance(layer, profiling.ProfilingMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, "token", b"secret")
+    monkeypatch.setattr(layer, "directory", str(directory))
+    return layer
+
+
+def test_sync_endpoint_appears_in_its_profile(db, tmp_path, monkeypatch):
+    import main
+
+    crud.create_itinerary(db, schema.ItineraryCreate(list_id=1, business_id=7, day="Monday", times="09:00-10:00"))
+    client = TestClient(main.app)
+    client.get("/clients/stats")  # Builds the middleware stack
+    service_profiler(main.app, tmp_path, monkeypatch)
+
+    response = client.get("/itineraries/1", headers={"X-Profile": "secret", "X-Correlation-ID": "composite-1"})
+
+    assert response.status_code == 200
+    [details] = profiling.list_profiles(str(tmp_path))
+    assert details["path"] == "/itineraries/1"
+    assert details["correlation_id"] == "composite-1"
+    stats = pstats.Stats(os.path.join(tmp_path, details["file"]))
+    assert "read_itineraries_by_list" in {name for _, _, name in stats.stats}
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import queue_store
+from queue_store import MemoryQueueStore, QueueStore, SQLiteQueueStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        if request.param == "memory":
+            return MemoryQueueStore(**kwargs)
+        return SQLiteQueueStore(str(tmp_path / "queues.db"), **kwargs)
+    return make
+
+
+def businesses(*ids):
+    return [{"business_id": i, "address": "NYC"} for i in ids]
+
+
+def test_queues_are_kept_per_session(make_store):
+    store = make_store()
+
+    store.push("a", businesses(1, 2))
+    store.push("b", businesses(3))
+
+    assert store.pop("a")["business_id"] == 1
+    assert store.pop("b")["business_id"] == 3
+    assert store.pop("b") is None
+    assert store.size("a") == 1
+
+
+def test_duplicates_are_ignored_and_removal_is_by_id(make_store):
+    store = make_store()
+
+    assert store.push("a", businesses(1, 2, 3)) == 3
+    assert store.push("a", businesses(2, 4)) == 1
+    assert store.remove("a", 3) is True
+    assert store.remove("a", 3) is False
+
+    assert [store.pop("a")["business_id"] for _ in range(3)] == [1, 2, 4]
+
+
+def test_least_recently_used_sessions_are_evicted(make_store):
+    store = make_store(max_items=4)
+
+    store.push("old", businesses(1, 2))
+    store.push("recent", businesses(3, 4))
+    store.size("recent")
+    store.push("new", businesses(5, 6))
+
+    assert store.size("old") == 0
+    assert store.size("recent") == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire(make_store):
+    store = make_store(ttl=0.05)
+
+    store.push("a", businesses(1))
+    time.sleep(0.1)
+
+    assert store.pop("a") is None
+
+
+def test_the_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        QueueStore()
+
+
+def test_sqlite_reads_create_no_sessions(tmp_path):
+    store = SQLiteQueueStore(str(tmp_path / "queues.db"))
+
+    assert store.size("unknown") == 0
+    assert store.pop("unknown") is None
+    assert store.remove("unknown", 1) is False
+
+    assert store.stats()["sessions"] == 0
+
+
+def test_sqlite_item_counts_follow_every_change(tmp_path):
+    store = SQLiteQueueStore(str(tmp_path / "queues.db"), max_items=5)
+
+    store.push("a", businesses(1, 2, 3))
+    store.push("a", businesses(3, 4))
+    store.pop("a")
+    store.remove("a", 4)
+    store.push("b", businesses(5, 6, 7, 8))  # Evicts "a"
+    store.clear("c")
+
+    counted = store._connection().execute("SELECT COUNT(*) FROM queue_items").fetchone()[0]
+    assert store.stats()["items"] == counted == 4
+    assert (store.size("a"), store.size("b")) == (0, 4)
+
+
+def test_blocking_stores_are_called_off_the_event_loop(tmp_path):
+    threads = []
+
+    class RecordingStore(SQLiteQueueStore):
+        def size(self, session_id):
+            threads.append(threading.get_ident())
+            return super().size(session_id)
+
+    store = RecordingStore(str(tmp_path / "queues.db"))
+    store.push("a", businesses(1))
+
+    assert asyncio.run(queue_store.call(store.size, "a")) == 1
+    assert threads[0] != threading.get_ident()
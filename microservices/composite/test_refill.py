@@ -0,0 +1,105 @@
+import asyncio
+
+from queue_store import MemoryQueueStore
+from refill import RefillWorker
+
+
+def test_close_requests_collapse_into_one_refill():
+    store = MemoryQueueStore()
+    calls = []
+
+    async def fill(session_id, address):
+        calls.append((session_id, address))
+        store.push(session_id, [{"business_id": i} for i in range(5)])
+
+    async def run():
+        worker = RefillWorker(store, fill, low_water=2, batch_window=0.01)
+        worker.start()
+        for _ in range(3):
+            worker.request("a", "NYC")  # Returns immediately
+        worker.request("b", "Boston")
+        await asyncio.sleep(0.05)
+        await worker.stop()
+        return worker.stats()
+
+    stats = asyncio.run(run())
+
+    assert sorted(calls) == [("a", "NYC"), ("b", "Boston")]
+    assert stats["requests"] == 4
+    assert stats["refills"] == 2
+    assert store.size("a") == 5
+
+
+def test_queues_above_low_water_are_not_refilled():
+    store = MemoryQueueStore()
+    store.push("a", [{"business_id": i} for i in range(3)])
+    calls = []
+
+    async def fill(session_id, address):
+        calls.append(session_id)
+
+    async def run():
+        worker = RefillWorker(store, fill, low_water=2, batch_window=0)
+        worker.start()
+        worker.request("a", "NYC")
+        await asyncio.sleep(0.02)
+        await worker.stop()
+        return worker.stats()
+
+    stats = asyncio.run(run())
+
+    assert calls == []
+    assert stats["skipped"] == 1
+
+
+def test_failed_refill_is_counted_and_worker_keeps_running():
+    store = MemoryQueueStore()
+    attempts = []
+
+    async def fill(session_id, address):
+        attempts.append(session_id)
+        raise RuntimeError("business service down")
+
+    async def run():
+        worker = RefillWorker(store, fill, batch_window=0)
+        worker.start()
+        worker.request("a", "NYC")
+        await asyncio.sleep(0.02)
+        worker.request("a", "NYC")
+        await asyncio.sleep(0.02)
+        await worker.stop()
+        return worker.stats()
+
+    assert asyncio.run(run())["errors"] == 2
+
+
+def test_store_error_is_counted_and_worker_keeps_running():
+    class FlakyStore(MemoryQueueStore):
+        failures = 1
+
+        def size(self, session_id):
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError("queue store unavailable")
+            return super().size(session_id)
+
+    store = FlakyStore()
+    calls = []
+
+    async def fill(session_id, address):
+        calls.append(session_id)
+
+    async def run():
+        worker = RefillWorker(store, fill, batch_window=0)
+        worker.start()
+        worker.request("a", "NYC")
+        await asyncio.sleep(0.02)
+        worker.request("a", "NYC")
+        await asyncio.sleep(0.02)
+        await worker.stop()
+        return worker.stats()
+
+    stats = asyncio.run(run())
+
+    assert stats["errors"] == 1
+    assert calls == ["a"]  # The second request still refilled
@@ -0,0 +1,183 @@
+import asyncio
+import itertools
+import time
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import crud
+import orchestrator
+import route_optimizer
+import schema
+
+
+def test_distance_matrix_matches_known_distance():
+    distances = route_optimizer.distance_matrix(np.array([[51.5007, -0.1246], [40.6892, -74.0445]]))
+
+    assert distances[0, 0] == 0
+    assert distances[0, 1] == distances[1, 0]
+    assert abs(distances[0, 1] - 5_574_840) < 5_000  # Big Ben to the Statue of Liberty
+
+
+def test_optimise_is_close_to_the_best_open_path_on_small_inputs():
+    rng = np.random.default_rng(3)
+    for _ in range(20):
+        coordinates = 48.85 + rng.random((7, 2)) * 0.05
+        order, distances = route_optimizer.optimise(coordinates)
+
+        best = min(
+            route_optimizer.path_length(np.array((0,) + rest), distances)
+            for rest in itertools.permutations(range(1, 7))
+        )
+        assert order[0] == 0
+        assert sorted(order) == list(range(7))
+        # 2-opt + Or-opt is a heuristic; it should land close to optimal here
+        assert route_optimizer.path_length(order, distances) <= best * 1.15
+
+
+def test_two_opt_uncrosses_a_path():
+    # Visiting the corners of a square as 0, 2, 1, 3 crosses itself
+    square = np.array([[0.0, 0.0], [0.0, 0.01], [0.01, 0.01], [0.01, 0.0]])
+    distances = route_optimizer.distance_matrix(square)
+    crossed = np.array([0, 2, 1, 3])
+
+    improved = route_optimizer.two_opt(crossed, distances)
+
+    assert route_optimizer.path_length(improved, distances) < route_optimizer.path_length(crossed, distances)
+    assert improved[0] == 0
+
+
+def test_schedule_includes_travel_time():
+    # Two stops 1.2 km apart at 6 km/h is 12 minutes of travel
+    distances = np.array([[0.0, 1200.0], [1200.0, 0.0]])
+
+    slots = route_optimizer.schedule(np.array([0, 1]), distances, start_minutes=9 * 60, visit_minutes=60, speed_kmh=6)
+
+    assert [route_optimizer.format_minutes(m) for m in slots[0][:2]] == ["09:00", "10:00"]
+    assert [route_optimizer.format_minutes(m) for m in slots[1][:2]] == ["10:12", "11:12"]
+    assert slots[1][2:] == (12.0, 1200.0)
+
+
+def test_schedule_from_an_origin_has_no_visit_there():
+    distances = np.array([[0.0, 500.0], [500.0, 0.0]])
+
+    slots = route_optimizer.schedule(
+        np.array([0, 1]), distances, start_minutes=540, visit_minutes=30, speed_kmh=6, first_is_origin=True
+    )
+
+    assert slots[0][:2] == (540, 540)
+    assert slots[1][:2] == (545, 575)
+
+
+def test_hundreds_of_stops_take_milliseconds():
+    coordinates = 40.7 + np.random.default_rng(0).random((300, 2)) * 0.1
+    nearest_only = route_optimizer.nearest_neighbour(route_optimizer.distance_matrix(coordinates))
+
+    start = time.perf_counter()
+    order, distances = route_optimizer.optimise(coordinates)
+    elapsed = time.perf_counter() - start
+
+    assert sorted(order) == list(range(300))
+    assert route_optimizer.path_length(order, distances) < route_optimizer.path_length(nearest_only, distances)
+    assert elapsed < 1.0  # Typically ~100 ms; generous for slow CI machines
+
+
+def test_schedule_stops_before_the_first_stop_past_midnight():
+    distances = np.zeros((3, 3))
+
+    slots = route_optimizer.schedule(np.array([0, 1, 2]), distances, start_minutes=22 * 60, visit_minutes=60, speed_kmh=6)
+
+    assert [route_optimizer.format_minutes(m) for m in slots[-1][:2]] == ["23:00", "24:00"]
+    assert len(slots) == 2
+
+
+STOPS = {7: (48.8566, 2.3522), 8: (48.8606, 2.3376), 9: (48.8530, 2.3499)}
+
+
+def add_stops(db, day="Monday"):
+    for hour, business_id in enumerate(STOPS, start=9):
+        crud.create_itinerary(db, schema.ItineraryCreate(
+            list_id=1, business_id=business_id, day=day, times=f"{hour:02d}:00-{hour:02d}:30"
+        ))
+
+
+def optimize(monkeypatch, **params):
+    import main
+
+    async def fetch(business_ids):
+        # Businesses outside STOPS have no coordinates
+        coordinates = {i: STOPS.get(i, (None, None)) for i in business_ids}
+        return {i: {"business_id": i, "latitude": lat, "longitude": lon} for i, (lat, lon) in coordinates.items()}
+
+    monkeypatch.setattr(orchestrator, "fetch_business_coordinates", fetch)
+    return TestClient(main.app).post("/itineraries/1/optimize", params=params)
+
+
+def test_stops_past_midnight_are_reported_unscheduled(db, monkeypatch):
+    add_stops(db)
+
+    response = optimize(monkeypatch, day="Monday", start_time="22:00", visit_minutes=50, apply=True)
+
+    body = response.json()
+    assert response.status_code == 200
+    assert len(body["stops"]) == 2 and len(body["unscheduled_business_ids"]) == 1
+    assert all(stop["departure"] <= "24:00" for stop in body["stops"])
+    assert body["applied"] is True
+    db.expire_all()
+    times = {i.business_id: i.times for i in crud.get_itineraries_by_list(db, 1)}
+    assert [times[stop["business_id"]] for stop in body["stops"]] == [
+        f"{stop['arrival']}-{stop['departure']}" for stop in body["stops"]
+    ]
+    # The unscheduled stop keeps its old times
+    [left] = body["unscheduled_business_ids"]
+    assert times[left] == f"{list(STOPS).index(left) + 9:02d}:00-{list(STOPS).index(left) + 9:02d}:30"
+
+
+def test_optimize_rejects_bad_parameters(db, monkeypatch):
+    add_stops(db)
+
+    assert optimize(monkeypatch, apply=True).status_code == 422  # No day to apply to
+    assert optimize(monkeypatch, day="Monday", visit_minutes=0).status_code == 422
+    # Both ends of a sub-minute visit round up to the same minute, which isn't a valid slot
+    response = optimize(monkeypatch, day="Monday", visit_minutes=0.1, apply=True)
+    assert response.status_code == 422
+    assert response.json()["detail"].endswith("must end after it starts")
+
+
+def test_applied_slots_must_not_overlap_stops_that_keep_their_times(db, monkeypatch):
+    add_stops(db)
+    crud.create_itinerary(db, schema.ItineraryCreate(list_id=1, business_id=10, day="Monday", times="12:00-12:30"))
+
+    response = optimize(monkeypatch, day="Monday", start_time="11:30", apply=True)
+
+    assert response.status_code == 409
+    assert [conflict["business_id"] for conflict in response.json()["detail"]["conflicts"]] == [10]
+    db.expire_all()
+    assert [i.times for i in crud.get_itineraries_by_list(db, 1)] == [
+        "09:00-09:30", "10:00-10:30", "11:00-11:30", "12:00-12:30"
+    ]
+
+    response = optimize(monkeypatch, day="Monday", start_time="13:00", apply=True)
+
+    assert response.status_code == 200
+    assert response.json()["unrouted_business_ids"] == [10]
+    db.expire_all()
+    assert {i.business_id: i.times for i in crud.get_itineraries_by_list(db, 1)}[10] == "12:00-12:30"
+
+
+def test_optimize_reads_and_writes_the_database_off_the_event_loop(db, monkeypatch):
+    add_stops(db)
+    on_loop = []
+    for name in ("get_itineraries_by_list", "set_itinerary_times"):
+        def record(*args, _call=getattr(crud, name)):
+            try:
+                asyncio.get_running_loop()
+                on_loop.append(True)
+            except RuntimeError:
+                on_loop.append(False)
+            return _call(*args)
+        monkeypatch.setattr(crud, name, record)
+
+    assert optimize(monkeypatch, day="Monday", apply=True).status_code == 200
+
+    assert on_loop == [False, False]
@@ -0,0 +1,40 @@
+from sqlalchemy import text
+
+import crud
+import database
+import models
+import schema_check
+
+
+def test_declared_indexes_are_found_after_create_all(db):
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == []
+
+
+def test_dropped_index_is_reported(db):
+    db.execute(text("DROP INDEX ix_itinerary_slots_list_id_day_start_minute"))
+    db.commit()
+
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == [
+        "itinerary_slots: missing index ix_itinerary_slots_list_id_day_start_minute"
+        " (list_id, day, start_minute, end_minute)"
+    ]
+
+
+def test_slot_range_plan_uses_the_slot_index(db):
+    plans = schema_check.explain_queries(
+        database.engine, {"range": lambda: crud.get_slots_in_range(db, 1, day="Monday", start=13 * 60, end=15 * 60)}
+    )
+
+    lines = [line for _, plan in plans["range"] for line in plan]
+    assert lines
+    assert all("SCAN itinerary_slots" not in line for line in lines)
+    assert any("ix_itinerary_slots_list_id_day_start_minute" in line for line in lines)
+
+
+def test_itineraries_by_day_plan_uses_the_day_key_index(db):
+    plans = schema_check.explain_queries(
+        database.engine, {"by_day": lambda: crud.get_itineraries_by_list(db, 1, day="Monday")}
+    )
+
+    lines = [line for _, plan in plans["by_day"] for line in plan]
+    assert any("ix_itineraries_list_id_day_key_times (list_id=? AND day_key=?)" in line for line in lines)
@@ -0,0 +1,40 @@
+import pytest
+
+import timeslots
+
+
+def test_parse_times_sorts_and_allows_touching_slots():
+    assert timeslots.parse_times("11:00-13:00, 9:00-11:00") == [(540, 660), (660, 780)]
+    assert timeslots.parse_times("22:00-24:00") == [(1320, 1440)]
+    assert timeslots.parse_times("") == []
+    assert timeslots.parse_times(None) == []
+
+
+@pytest.mark.parametrize("times", [
+    "09:00",             # no end
+    "9-11",              # not HH:MM
+    "09:60-10:00",       # bad minutes
+    "23:00-01:00",       # runs past midnight
+    "10:00-10:00",       # empty
+    "09:00-11:00,10:00-12:00",  # overlaps itself
+])
+def test_parse_times_rejects_invalid_slots(times):
+    with pytest.raises(ValueError):
+        timeslots.parse_times(times)
+
+
+def test_format_times_round_trips_to_a_canonical_string():
+    assert timeslots.format_times(timeslots.parse_times("13:00-15:00,9:00-9:30")) == "09:00-09:30,13:00-15:00"
+
+
+def test_normalise_day():
+    assert timeslots.normalise_day("Tuesday") == "tue"
+    assert timeslots.normalise_day(" TUE ") == "tue"
+    assert timeslots.normalise_day("Holiday") == "holiday"
+    assert timeslots.normalise_day("  ") is None
+    assert timeslots.normalise_day(None) is None
+
+
+def test_overlaps_uses_half_open_ranges():
+    assert timeslots.overlaps([(540, 660)], [(600, 720)])
+    assert not timeslots.overlaps([(540, 660)], [(660, 780), (480, 540)])
@@ -0,0 +1,84 @@
+import re
+from typing import List, Optional, Tuple
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+MINUTES_PER_DAY = 24 * 60
+DAY_KEY_LENGTH = 64  # Length of itinerary_slots.day
+
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*$")
+
+
+def normalise_day(day: Optional[str]) -> Optional[str]:
+    """
+    Maps the free-text `day` of an itinerary to the key slots are stored
+    under: "Monday", "mon" and " MON " all become "mon". Anything that isn't
+    a weekday is kept, lowercased. Blank days have no key.
+    """
+    if day is None or not day.strip():
+        return None
+    key = day.strip().lower()
+    for name in DAYS:
+        if key.startswith(name):
+            return name
+    return key[:DAY_KEY_LENGTH]
+
+
+def parse_time(value: str) -> int:
+    """
+    "HH:MM" (or "H:MM") as minutes after midnight; "24:00" is the end of the day.
+    """
+    match = TIME_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Invalid time {value!r}; expected HH:MM")
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    total = hours * 60 + minutes
+    if minutes > 59 or total > MINUTES_PER_DAY:
+        raise ValueError(f"Invalid time {value!r}")
+    return total
+
+
+def parse_times(times: Optional[str]) -> List[Tuple[int, int]]:
+    """
+    Parses a `times` string like "09:00-11:00,11:00-13:00" into (start, end)
+    minute pairs sorted by start. Slots end after they start (no slot runs past
+    midnight) and a string's slots may touch but not overlap.
+    """
+    slots = []
+    for block in (times or "").split(","):
+        if not block.strip():
+            continue
+        start, separator, end = block.partition("-")
+        if not separator:
+            raise ValueError(f"Invalid time slot {block.strip()!r}; expected HH:MM-HH:MM")
+        start_minute, end_minute = parse_time(start), parse_time(end)
+        if end_minute <= start_minute:
+            raise ValueError(f"Time slot {block.strip()!r} must end after it starts")
+        slots.append((start_minute, end_minute))
+    slots.sort()
+    for previous, current in zip(slots, slots[1:]):
+        if current[0] < previous[1]:
+            raise ValueError(f"Time slots {format_slot(*previous)} and {format_slot(*current)} overlap")
+    return slots
+
+
+def format_time(minute: int) -> str:
+    return f"{minute // 60:02d}:{minute % 60:02d}"
+
+
+def format_slot(start: int, end: int) -> str:
+    return f"{format_time(start)}-{format_time(end)}"
+
+
+def format_times(slots: List[Tuple[int, int]]) -> str:
+    """
+    The canonical `times` string for parsed slots, so it also sorts correctly as text.
+    """
+    return ",".join(format_slot(start, end) for start, end in slots)
+
+
+def overlaps(slots: List[Tuple[int, int]], others: List[Tuple[int, int]]) -> bool:
+    """
+    Whether any slot overlaps any of `others`; ranges are half-open, so
+    09:00-11:00 and 11:00-13:00 touch but don't overlap.
+    """
+    return any(start < other_end and other_start < end for start, end in slots for other_start, other_end in others)
@@ -0,0 +1,61 @@
+"""
+Checks that the database has every index declared in models.py and prints the
+EXPLAIN plan of each hot query, so a missing index shows up at deploy time.
+
+Exits with status 1 if the primary or any replica is missing a table or index.
+
+Usage:
+    python verify_indexes.py
+    python verify_indexes.py --list-id 42 --day Monday
+"""
+import argparse
+import sys
+
+import crud
+import database
+import models
+import schema_check
+import timeslots
+
+
+def hot_queries(db, args) -> dict:
+    return {
+        "get_itineraries_by_list": lambda: crud.get_itineraries_by_list(db, args.list_id),
+        "get_itineraries_by_list (day)": lambda: crud.get_itineraries_by_list(db, args.list_id, day=args.day),
+        "get_slots_in_range": lambda: crud.get_slots_in_range(db, args.list_id, day=args.day, start=13 * 60, end=15 * 60),
+        "get_slot_conflicts": lambda: crud.get_slot_conflicts(db, args.list_id, day=args.day),
+        "find_slot_conflicts": lambda: crud.find_slot_conflicts(db, args.list_id, timeslots.normalise_day(args.day), [(13 * 60, 15 * 60)]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list-id", type=int, default=1, help="List id used for the sample queries")
+    parser.add_argument("--day", default="Monday", help="Day used for the sample queries")
+    args = parser.parse_args()
+
+    problems = []
+    for name, engine in database.registry.engines().items():
+        problems += [f"[{name}] {problem}" for problem in schema_check.missing_indexes(engine, models.Base.metadata)]
+
+    if not problems:
+        # Plans are only meaningful once the schema matches the models
+        db = database.SessionLocal()
+        try:
+            plans = schema_check.explain_queries(database.engine, hot_queries(db, args))
+        finally:
+            db.close()
+        for query, statements in plans.items():
+            print(f"== {query}")
+            for statement, plan in statements:
+                print(" ".join(statement.split()))
+                for line in plan:
+                    print(f"    {line}")
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
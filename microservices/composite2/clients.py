@@ -0,0 +1,106 @@
+import time
+
+import httpx
+from typing import Dict, Optional
+
+import config
+import metrics
+
+UPSTREAM_LATENCY = metrics.registry.register(metrics.Histogram(
+    "upstream_request_duration_seconds", "Time spent on calls to downstream services.", ("service", "method", "status")
+))
+
+
+class ServiceClient:
+    """
+    Wraps one long-lived httpx.AsyncClient for a downstream service and counts
+    how many requests reused a pooled connection instead of opening a new one.
+    """
+
+    def __init__(self, name: str, base_url: str, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.name = name
+        self.requests = 0
+        self.errors = 0
+        self.new_connections = 0
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(
+                max_connections=config.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(config.HTTP_TIMEOUT, connect=config.HTTP_CONNECT_TIMEOUT),
+            follow_redirects=True,
+            transport=transport,
+        )
+
+    async def _trace(self, event_name: str, info: dict):
+        # httpcore only emits connect_tcp events when it has to open a new connection
+        if event_name == "connection.connect_tcp.complete":
+            self.new_connections += 1
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        extensions = {**kwargs.pop("extensions", {}), "trace": self._trace}
+        self.requests += 1
+        status = "error"
+        start_time = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, extensions=extensions, **kwargs)
+            status = str(response.status_code)
+            return response
+        except httpx.HTTPError:
+            self.errors += 1
+            raise
+        finally:
+            UPSTREAM_LATENCY.observe((self.name, method, status), time.perf_counter() - start_time)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "base_url": str(self.client.base_url),
+            "requests": self.requests,
+            "errors": self.errors,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_ratio": round(reused / self.requests, 4) if self.requests else None,
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# One client per downstream service, created in the app lifespan
+_clients: Dict[str, ServiceClient] = {}
+
+
+def start_clients(services: Dict[str, str], transports: Optional[Dict[str, httpx.AsyncBaseTransport]] = None):
+    """
+    Creates a pooled client for each `name -> base_url` in `services`.
+    `transports` can override the transport per service (e.g. for in-process tests).
+    """
+    transports = transports or {}
+    for name, base_url in services.items():
+        _clients[name] = ServiceClient(name, base_url, transport=transports.get(name))
+
+
+async def close_clients():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
+
+
+def get_client(name: str) -> ServiceClient:
+    try:
+        return _clients[name]
+    except KeyError:
+        raise RuntimeError(f"HTTP client '{name}' is not started; is the app lifespan running?")
+
+
+def connection_stats() -> dict:
+    return {name: client.stats() for name, client in _clients.items()}
@@ -0,0 +1,23 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from .env
+dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
+load_dotenv(dotenv_path)
+
+
+def get_url(name: str, default: str = "") -> str:
+    # Drop trailing inline comments such as "http://host:8000# comment"
+    return os.getenv(name, default).split("#")[0].strip()
+
+
+# Downstream services
+BUSINESS_SERVICE_URL = get_url("BUSINESS_SERVICE_URL", "http://localhost:8002")
+LIST_SERVICE_URL = get_url("LIST_SERVICE_URL", "http://localhost:8001")
+
+# Shared HTTP client pools (one per downstream service)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
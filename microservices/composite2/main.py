@@ -145,18 +145,33 @@ if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8003, reload=True)
 """
 import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from typing import List
 import time
 import logging
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, Response
+from starlette.requests import Request
 import uvicorn
-import httpx
 import os
+import clients
+import config
+import metrics
+import prefetch
+import profiling
+
 
-app = FastAPI(debug=True, redirect_slashes=False)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled, keep-alive HTTP client per downstream service for the app's lifetime
+    clients.start_clients({"business": config.BUSINESS_SERVICE_URL, "list": config.LIST_SERVICE_URL})
+    yield
+    await next_candidates.close()
+    await clients.close_clients()
+
+app = FastAPI(debug=True, redirect_slashes=False, lifespan=lifespan)
 
 # Setup CORS using environment variables, if needed
 app.add_middleware(
@@ -167,6 +182,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in profiling (X-Profile header or PROFILE_SAMPLE_RATE), saved per request
+app.add_middleware(profiling.ProfilingMiddleware)
+
+metrics.instrument(app)
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(levelname)s - %(message)s",
@@ -176,68 +196,139 @@ logging.basicConfig(
     ],
 )
 
-# Configuration for microservice URLs
-BUSINESS_SERVICE_URL = "http://localhost:8002/businesses"
-LIST_SERVICE_URL = "http://localhost:8001/lists"
+# Number of business ids sent per multi-get request
+BUSINESS_BATCH_SIZE = int(os.getenv("BUSINESS_BATCH_SIZE", "100"))
 
-# View Full List - Asynchronous Composite Endpoint
-@app.get("/composite/view_full_list", response_model=List[dict])
-async def view_full_list(list_id: int):
-    async with httpx.AsyncClient() as client:
-        # Step 1: Get all business_ids from the list microservice
-        list_url = f"{LIST_SERVICE_URL}/{list_id}/itineraries/"
-        list_response = await client.get(list_url)
-        if list_response.status_code != 200:
-            raise HTTPException(status_code=list_response.status_code, detail="Failed to fetch business IDs.")
+# Itineraries requested per cursor page from the list microservice
+ITINERARY_PAGE_SIZE = int(os.getenv("ITINERARY_PAGE_SIZE", "500"))
 
-        business_ids = [item["business_id"] for item in list_response.json()]
+# How long a prefetched serve_next candidate stays valid, and how many are kept
+PREFETCH_TTL_SECONDS = float(os.getenv("PREFETCH_TTL_SECONDS", "30"))
+PREFETCH_MAX_SLOTS = int(os.getenv("PREFETCH_MAX_SLOTS", "10000"))
 
-        # Step 2: Fetch business details asynchronously from the business microservice
-        tasks = [client.get(f"{BUSINESS_SERVICE_URL}/{business_id}") for business_id in business_ids]
-        responses = await asyncio.gather(*tasks)
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """
+    Lists saved request profiles, newest first. Requires `X-Profile: <PROFILE_TOKEN>`.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    return profiling.list_profiles()
 
-        # Step 3: Compile the details for valid responses
-        businesses = [response.json() for response in responses if response.status_code == 200]
+@app.get("/admin/profiles/{file}")
+def download_profile(file: str, request: Request):
+    """
+    Downloads one profile: `.prof` files load in pstats/snakeviz, `.folded` in speedscope/flamegraph.pl.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    path = profiling.profile_path(file)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=file)
+
+@app.get("/clients/stats")
+async def client_stats():
+    """
+    Returns request and connection reuse counters for each downstream HTTP client.
+    """
+    return clients.connection_stats()
+
+async def fetch_list_business_ids(list_id: int) -> List[int]:
+    """
+    Collects every business_id in a list by following the list microservice's cursor pages.
+    """
+    business_ids = []
+    cursor = ""
+    while cursor is not None:
+        list_response = await clients.get_client("list").get(
+            f"/lists/{list_id}/itineraries/", params={"cursor": cursor, "limit": ITINERARY_PAGE_SIZE}
+        )
+        if list_response.status_code != 200:
+            raise HTTPException(status_code=list_response.status_code, detail="Failed to fetch business IDs.")
+        page = list_response.json()
+        business_ids.extend(item["business_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+    return business_ids
+
+# View Full List - Asynchronous Composite Endpoint
+@app.get("/composite/view_full_list", response_model=List[dict])
+async def view_full_list(list_id: int):
+    business_client = clients.get_client("business")
+
+    # Step 1: Get all business_ids from the list microservice
+    business_ids = await fetch_list_business_ids(list_id)
+
+    # Step 2: Fetch business details in batches from the business microservice
+    chunks = [
+        business_ids[i:i + BUSINESS_BATCH_SIZE]
+        for i in range(0, len(business_ids), BUSINESS_BATCH_SIZE)
+    ]
+    tasks = [
+        business_client.get("/businesses", params={"ids": ",".join(map(str, chunk))})
+        for chunk in chunks
+    ]
+    responses = await asyncio.gather(*tasks)
+
+    # Step 3: Compile the details for valid responses (chunks are already in list order)
+    businesses = [
+        business
+        for response in responses if response.status_code == 200
+        for business in response.json()
+    ]
 
     return businesses
 
-# Serve Next - Synchronous Composite Endpoint
-@app.get("/composite/serve_next", response_model=dict)
-def serve_next(list_id: int, location: str):
+async def fetch_next_candidate(key, exclude_ids):
     """
     Fetches businesses already in the list and requests the next business from the businesses microservice.
+    `exclude_ids` are skipped as well, e.g. the candidate that was just served.
     """
-    with httpx.Client(follow_redirects=True) as client:
-        # Step 1: Get all business_ids from the list microservice
-        list_url = f"{LIST_SERVICE_URL}/{list_id}/itineraries/"
-        list_response = client.get(list_url)
+    list_id, location = key
 
-        if list_response.status_code != 200:
-            raise HTTPException(status_code=list_response.status_code, detail="Failed to fetch business IDs.")
+    # Step 1: Get all business_ids from the list microservice
+    existing_business_ids = await fetch_list_business_ids(list_id)
+    existing_business_ids.extend(exclude_ids)
 
-        existing_business_ids = [item["business_id"] for item in list_response.json()]
+    params = {
+        "location": location,
+        "existing_ids": "*"
+    }
 
+    if existing_business_ids:
         params = {
             "location": location,
-            "existing_ids": "*"
+            "existing_ids": ",".join(map(str, existing_business_ids))  # Send IDs as a comma-separated string
         }
 
-        if existing_business_ids:
-            params = {
-                "location": location,
-                "existing_ids": ",".join(map(str, existing_business_ids))  # Send IDs as a comma-separated string
-            }
+    # Step 2: Request the next business from the business microservice
+    next_business_response = await clients.get_client("business").get("/businesses/next/", params=params)
 
+    if next_business_response.status_code != 200:
+        raise HTTPException(status_code=next_business_response.status_code, detail="No next business found.")
 
+    return next_business_response.json()
 
-        # Step 2: Request the next business from the business microservice
-        next_business_url = f"{BUSINESS_SERVICE_URL}/next/"
-        next_business_response = client.get(next_business_url, params=params)
+# Prepared "next" candidates per (list_id, location)
+next_candidates = prefetch.CandidatePrefetcher(
+    fetch_next_candidate, ttl=PREFETCH_TTL_SECONDS, max_slots=PREFETCH_MAX_SLOTS
+)
 
-        if next_business_response.status_code != 200:
-            raise HTTPException(status_code=next_business_response.status_code, detail="No next business found.")
+# Serve Next - Asynchronous Composite Endpoint
+@app.get("/composite/serve_next", response_model=dict)
+async def serve_next(list_id: int, location: str):
+    """
+    Returns the next business for the list, usually from a candidate prefetched
+    during the previous call, and starts prefetching the one after it.
+    """
+    return await next_candidates.next((list_id, location))
 
-    return next_business_response.json()
+@app.get("/composite/serve_next/stats")
+async def serve_next_stats():
+    """
+    Returns hit/miss counters for prefetched serve_next candidates.
+    """
+    return next_candidates.stats()
 
 # Run the application with Uvicorn
 if __name__ == "__main__":
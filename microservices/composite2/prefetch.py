@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, Optional
+
+
+class CandidatePrefetcher:
+    """
+    Keeps one prepared "next" candidate per key (e.g. `(list_id, location)`).
+
+    Every call to `next()` returns a candidate, either from the prepared slot or
+    by fetching it inline, and then starts a background fetch for the following
+    candidate so the next call can usually be answered without waiting on
+    downstream services. Slots expire after `ttl` seconds and at most `max_slots`
+    keys are kept (least recently used are dropped first).
+
+    Calls for the same key are served one at a time and never return a candidate
+    that was already served for that key within the last `ttl` seconds, so
+    concurrent callers get different businesses.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[Hashable, Iterable[int]], Awaitable[dict]],
+        ttl: float = 30.0,
+        max_slots: int = 10000,
+    ):
+        self._fetch = fetch
+        self.ttl = ttl
+        self.max_slots = max_slots
+        self._slots: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._served: "OrderedDict[Hashable, Dict[int, float]]" = OrderedDict()
+        self._locks: Dict[Hashable, list] = {}
+        self.hits = 0
+        self.misses = 0
+        self.prefetch_errors = 0
+
+    async def next(self, key: Hashable) -> dict:
+        # One call per key at a time; the lock is dropped once nobody is waiting on it
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await self._next(key)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                self._locks.pop(key, None)
+
+    async def _next(self, key: Hashable) -> dict:
+        # If a prefetch for this key is still running, wait for it instead of racing it
+        task = self._inflight.get(key)
+        if task is not None:
+            await asyncio.wait([task])
+
+        served = self._served_ids(key)
+        candidate = self._take_slot(key)
+        if candidate is not None and candidate["business_id"] not in served:
+            self.hits += 1
+        else:
+            self.misses += 1
+            candidate = await self._fetch(key, list(served))
+
+        # Each served id stays excluded for `ttl` seconds
+        served[candidate["business_id"]] = time.monotonic() + self.ttl
+        self._served[key] = served
+        self._served.move_to_end(key)
+        while len(self._served) > self.max_slots:
+            self._served.popitem(last=False)
+
+        self.schedule(key, exclude_ids=served)
+        return candidate
+
+    def schedule(self, key: Hashable, exclude_ids: Iterable[int] = ()):
+        """
+        Starts a background fetch for `key` unless one is already running.
+        """
+        if key in self._inflight:
+            return
+        task = asyncio.create_task(self._prefetch(key, list(exclude_ids)))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+    async def _prefetch(self, key: Hashable, exclude_ids: list):
+        try:
+            candidate = await self._fetch(key, exclude_ids)
+        except Exception as e:
+            # Nothing to prepare (e.g. no more businesses); the next call fetches inline
+            self.prefetch_errors += 1
+            logging.debug(f"Prefetch for {key} failed: {e}")
+            return
+        self._slots[key] = (candidate, time.monotonic() + self.ttl)
+        self._slots.move_to_end(key)
+        while len(self._slots) > self.max_slots:
+            self._slots.popitem(last=False)
+
+    def _served_ids(self, key: Hashable) -> Dict[int, float]:
+        now = time.monotonic()
+        served = self._served.get(key, {})
+        return {business_id: expires_at for business_id, expires_at in served.items() if expires_at >= now}
+
+    def _take_slot(self, key: Hashable) -> Optional[dict]:
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return None
+        candidate, expires_at = slot
+        if expires_at < time.monotonic():
+            return None
+        return candidate
+
+    async def close(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._slots.clear()
+        self._served.clear()
+
+    def stats(self) -> dict:
+        served = self.hits + self.misses
+        return {
+            "slots": len(self._slots),
+            "inflight": len(self._inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / served, 4) if served else None,
+            "prefetch_errors": self.prefetch_errors,
+        }
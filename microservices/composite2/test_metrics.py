@@ -0,0 +1,32 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import clients
+import metrics
+
+
+def test_downstream_calls_are_timed_by_service_and_status():
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(404))
+        client = clients.ServiceClient("metrics-test", "http://upstream.local", transport=transport)
+        await client.get("/missing")
+        await client.aclose()
+
+    asyncio.run(run())
+
+    body = metrics.registry.render()
+    assert 'upstream_request_duration_seconds_count{service="metrics-test",method="GET",status="404"} 1' in body
+
+
+def test_service_serves_its_metrics():
+    import main
+
+    client = TestClient(main.app)
+    client.get("/metrics")
+
+    body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/metrics",status="200"}' in body
+    assert "# TYPE upstream_request_duration_seconds histogram" in body
@@ -0,0 +1,98 @@
+import asyncio
+
+from fastapi import HTTPException
+
+from prefetch import CandidatePrefetcher
+
+
+def make_fetch(candidates):
+    calls = []
+
+    async def fetch(key, exclude_ids):
+        calls.append(list(exclude_ids))
+        for candidate in candidates:
+            if candidate["business_id"] not in exclude_ids:
+                return candidate
+        raise HTTPException(status_code=404, detail="No next business found.")
+
+    return fetch, calls
+
+
+def test_second_call_is_served_from_prefetched_slot():
+    async def run():
+        fetch, calls = make_fetch([{"business_id": 1}, {"business_id": 2}])
+        prefetcher = CandidatePrefetcher(fetch)
+
+        first = await prefetcher.next((1, "NYC"))
+        second = await prefetcher.next((1, "NYC"))
+        await prefetcher.close()
+        return first, second, calls, prefetcher.stats()
+
+    first, second, calls, stats = asyncio.run(run())
+
+    assert first == {"business_id": 1}
+    assert second == {"business_id": 2}
+    assert calls[:2] == [[], [1]]  # Inline fetch, then prefetch excluding the served candidate
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_expired_slot_is_fetched_again():
+    async def run():
+        fetch, calls = make_fetch([{"business_id": 1}, {"business_id": 2}])
+        prefetcher = CandidatePrefetcher(fetch, ttl=0)
+
+        await prefetcher.next((1, "NYC"))
+        await prefetcher.next((1, "NYC"))
+        await prefetcher.close()
+        return prefetcher.stats()
+
+    assert asyncio.run(run())["misses"] == 2
+
+
+def test_failed_prefetch_falls_back_to_inline_fetch():
+    async def run():
+        fetch, calls = make_fetch([{"business_id": 1}])
+        prefetcher = CandidatePrefetcher(fetch, ttl=0)
+
+        await prefetcher.next((1, "NYC"))
+        again = await prefetcher.next((1, "NYC"))
+        await prefetcher.close()
+        return again, prefetcher.stats()
+
+    again, stats = asyncio.run(run())
+
+    assert again == {"business_id": 1}
+    assert stats["prefetch_errors"] >= 1
+
+
+def test_served_candidate_is_not_served_again():
+    async def run():
+        fetch, calls = make_fetch([{"business_id": 1}])
+        prefetcher = CandidatePrefetcher(fetch)
+
+        await prefetcher.next((1, "NYC"))
+        try:
+            await prefetcher.next((1, "NYC"))
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            await prefetcher.close()
+
+    assert asyncio.run(run()) == 404
+
+
+def test_concurrent_calls_get_different_candidates():
+    async def run():
+        candidates = [{"business_id": business_id} for business_id in range(1, 6)]
+
+        async def fetch(key, exclude_ids):
+            await asyncio.sleep(0.01)  # Let the other callers in while this one is fetching
+            return next(candidate for candidate in candidates if candidate["business_id"] not in exclude_ids)
+
+        prefetcher = CandidatePrefetcher(fetch)
+        served = await asyncio.gather(*(prefetcher.next((1, "NYC")) for _ in range(4)))
+        await prefetcher.close()
+        return [candidate["business_id"] for candidate in served]
+
+    assert sorted(asyncio.run(run())) == [1, 2, 3, 4]
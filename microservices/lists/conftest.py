@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the service at a throwaway SQLite database before `database` is imported
+_db_dir = tempfile.mkdtemp(prefix="lists-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+
+import database
+import models
+
+
+@pytest.fixture
+def db():
+    models.Base.metadata.create_all(bind=database.engine)
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        models.Base.metadata.drop_all(bind=database.engine)
@@ -1,7 +1,19 @@
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 import models
 import schemas
+import collections
+import group_commit
 import httpx
+import os
+import pagination
+
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+OPEN_METEO_URL = os.getenv("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+# Ids per IN (...) list in bulk itinerary statements; well under every driver's parameter limit
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
 
 def create_list(db: Session, list_data: schemas.ListCreate):
     db_list = models.List(**list_data.model_dump())
@@ -10,10 +22,20 @@ def create_list(db: Session, list_data: schemas.ListCreate):
     db.refresh(db_list)
     return db_list
 
+def create_lists(db: Session, items: list):
+    """
+    Inserts many lists without committing and returns them with their ids;
+    used by the group-commit writer.
+    """
+    return group_commit.insert_returning(db, models.List, [item.model_dump() for item in items])
+
 def get_lists(db: Session, skip: int = 0, limit: int = 10):
-    lists = db.query(models.List).offset(skip).limit(limit).all()
+    lists = db.query(models.List).order_by(models.List.list_id).offset(skip).limit(limit).all()
     return lists
 
+def get_lists_page(db: Session, cursor: str = "", limit: int = 10):
+    return pagination.paginate(db.query(models.List), models.List.list_id, cursor, limit)
+
 def delete_list(db: Session, list_id: int):
     db_list = db.query(models.List).filter(models.List.list_id == list_id).first()
     if db_list:
@@ -22,15 +44,14 @@ def delete_list(db: Session, list_id: int):
         return db_list
     return None
 
-def fetch_lat_lon(location: str, correlation_id: str) -> tuple:
-    base_url = "https://nominatim.openstreetmap.org/search"
-    headers = {"X-Correlation-ID": correlation_id}
-    params = {
+def geocode_params(location: str) -> dict:
+    return {
         "q": location,
         "format": "json",
         "limit": 1,
     }
-    response = httpx.get(base_url, headers=headers, params=params)
+
+def parse_lat_lon(response: httpx.Response) -> tuple:
     if response.status_code == 200 and response.json():
         data = response.json()[0]
         latitude = float(data["lat"])
@@ -38,30 +59,189 @@ def fetch_lat_lon(location: str, correlation_id: str) -> tuple:
         return latitude, longitude
     raise Exception("Could not fetch latitude and longitude for the given location")
 
+def weather_params(latitude: float, longitude: float, start_date: str, end_date: str) -> dict:
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "start_date": start_date,
+        "end_date": end_date,
+        "daily": "temperature_2m_max,temperature_2m_min",
+    }
+
+def parse_average_temperatures(response: httpx.Response) -> dict:
+    """
+    Returns {date: average temperature as str} for every day in an open-meteo daily response.
+    """
+    if response.status_code != 200:
+        raise Exception("Could not fetch the weather for the given location and date")
+    daily = response.json()["daily"]
+    return {
+        day: str((high + low) / 2)
+        for day, high, low in zip(daily["time"], daily["temperature_2m_max"], daily["temperature_2m_min"])
+    }
+
+def fetch_lat_lon(location: str, correlation_id: str) -> tuple:
+    headers = {"X-Correlation-ID": correlation_id}
+    response = httpx.get(NOMINATIM_URL, headers=headers, params=geocode_params(location))
+    return parse_lat_lon(response)
+
 def fetch_weather(latitude: float, longitude: float, date: str, correlation_id: str) -> str:
-    api_url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&start_date={date}&end_date={date}&daily=temperature_2m_max,temperature_2m_min"
     headers = {"X-Correlation-ID": correlation_id}
-    response = httpx.get(api_url, headers = headers)
-    if response.status_code == 200:
-        data = response.json()
-        avg_temp = (data["daily"]["temperature_2m_max"][0] + data["daily"]["temperature_2m_min"][0]) / 2
-        return str(avg_temp)
+    response = httpx.get(OPEN_METEO_URL, headers=headers, params=weather_params(latitude, longitude, date, date))
+    return parse_average_temperatures(response)[date]
+
+async def fetch_lat_lon_async(client: httpx.AsyncClient, location: str, correlation_id: str) -> tuple:
+    headers = {"X-Correlation-ID": correlation_id}
+    response = await client.get(NOMINATIM_URL, headers=headers, params=geocode_params(location))
+    return parse_lat_lon(response)
+
+async def fetch_weather_range_async(
+    client: httpx.AsyncClient, latitude: float, longitude: float, start_date: str, end_date: str, correlation_id: str
+) -> dict:
+    headers = {"X-Correlation-ID": correlation_id}
+    response = await client.get(
+        OPEN_METEO_URL, headers=headers, params=weather_params(latitude, longitude, start_date, end_date)
+    )
+    return parse_average_temperatures(response)
+
 
+def _lock_list(db: Session, list_id: int):
+    """
+    Returns the list's id, or None if it doesn't exist. On databases with row
+    locks the list row stays locked until commit, so concurrent itinerary
+    writes to one list see each other's rows when classifying theirs.
+    """
+    return db.query(models.List.list_id).filter(models.List.list_id == list_id).with_for_update().first()
 
 def add_itinerary(db: Session, list_id: int, business_id: int):
-    db_list = db.query(models.List).filter(models.List.list_id == list_id).first()
-    if not db_list:
-        raise Exception("List not found")
+    """
+    Raises LookupError if the list or business doesn't exist and ValueError if
+    the business is already in the list.
+    """
+    if _lock_list(db, list_id) is None:
+        raise LookupError("List not found")
+    # SQLite doesn't enforce the foreign key, so check it on every database alike
+    if db.query(models.Business.business_id).filter(models.Business.business_id == business_id).first() is None:
+        db.rollback()
+        raise LookupError("Business not found")
 
     db_itinerary = models.Itinerary(list_id=list_id, business_id=business_id)
     db.add(db_itinerary)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = db.query(models.Itinerary).filter_by(list_id=list_id, business_id=business_id).first()
+        if existing is None:
+            raise
+        raise ValueError("Business is already in the list")
     return db_itinerary
 
+def chunks(ids: list, size: int = None):
+    size = size or BULK_CHUNK_SIZE
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+def insert_ignoring_duplicates(db: Session, rows: list):
+    """
+    Inserts itinerary rows in one multi-row statement, skipping any already
+    present instead of failing: ON CONFLICT DO NOTHING on SQLite and
+    PostgreSQL, a no-op ON DUPLICATE KEY UPDATE on MySQL (unlike INSERT IGNORE,
+    it still raises on other errors such as a missing foreign key).
+
+    Returns the business_ids that were inserted where the database can say
+    (RETURNING on SQLite 3.35+ and PostgreSQL), else None.
+    """
+    table = models.Itinerary.__table__
+    dialect = db.get_bind().dialect
+    if dialect.name in ("sqlite", "postgresql"):
+        module = sqlite if dialect.name == "sqlite" else postgresql
+        statement = module.insert(table).on_conflict_do_nothing(index_elements=["list_id", "business_id"])
+    elif dialect.name == "mysql":
+        statement = mysql.insert(table)
+        statement = statement.on_duplicate_key_update(business_id=statement.inserted.business_id)
+    else:
+        statement = insert(table)
+    if dialect.name in ("sqlite", "postgresql") and dialect.insert_returning:
+        return list(db.execute(statement.values(rows).returning(table.c.business_id)).scalars())
+    db.execute(statement.values(rows))
+    return None
+
+def add_itineraries(db: Session, list_id: int, business_ids: list):
+    """
+    Adds many businesses to a list in one transaction. Returns None if the
+    list doesn't exist, else {"added", "duplicates", "not_found"}: businesses
+    already in the list (or repeated in `business_ids`) and unknown business
+    ids are reported and skipped rather than failing the batch.
+
+    One query classifies each chunk of ids (does the business exist, is it
+    already in the list) and one insert adds the new ones. Rows another
+    request added in between are skipped by the insert and reported as
+    duplicates: RETURNING says which rows were inserted, and where it isn't
+    available (MySQL) the list row lock keeps other writers out meanwhile.
+    """
+    if _lock_list(db, list_id) is None:
+        return None
+    unique_ids = list(dict.fromkeys(business_ids))
+    duplicates = [business_id for business_id, count in collections.Counter(business_ids).items() if count > 1]
+    added, not_found = [], []
+    for chunk in chunks(unique_ids):
+        rows = db.execute(
+            select(models.Business.business_id, models.Itinerary.list_id)
+            .outerjoin(models.Itinerary, (models.Itinerary.business_id == models.Business.business_id)
+                       & (models.Itinerary.list_id == list_id))
+            .where(models.Business.business_id.in_(chunk))
+        ).all()
+        status = {business_id: in_list is not None for business_id, in_list in rows}
+        new_ids = []
+        for business_id in chunk:
+            if business_id not in status:
+                not_found.append(business_id)
+            elif status[business_id]:
+                duplicates.append(business_id)
+            else:
+                new_ids.append(business_id)
+        if new_ids:
+            inserted = insert_ignoring_duplicates(db, [{"list_id": list_id, "business_id": business_id} for business_id in new_ids])
+            inserted = set(new_ids if inserted is None else inserted)
+            added += [business_id for business_id in new_ids if business_id in inserted]
+            duplicates += [business_id for business_id in new_ids if business_id not in inserted]
+    db.commit()
+    return {"list_id": list_id, "added": added, "duplicates": list(dict.fromkeys(duplicates)), "not_found": not_found}
+
+def delete_itineraries(db: Session, list_id: int, business_ids: list):
+    """
+    Removes many businesses from a list in one transaction. Returns None if
+    the list doesn't exist, else {"removed", "not_found"} where `not_found`
+    are businesses that weren't in the list.
+    """
+    if db.query(models.List.list_id).filter(models.List.list_id == list_id).first() is None:
+        return None
+    removed = []
+    for chunk in chunks(list(dict.fromkeys(business_ids))):
+        condition = (models.Itinerary.list_id == list_id) & models.Itinerary.business_id.in_(chunk)
+        present = set(db.execute(select(models.Itinerary.business_id).where(condition)).scalars())
+        if present:
+            db.execute(delete(models.Itinerary).where(condition))
+            removed += [business_id for business_id in chunk if business_id in present]
+    db.commit()
+    removed_ids = set(removed)
+    not_found = [business_id for business_id in dict.fromkeys(business_ids) if business_id not in removed_ids]
+    return {"list_id": list_id, "removed": removed, "not_found": not_found}
+
 def get_itineraries(db: Session, list_id: int, skip: int = 0, limit: int = 10):
-    itineraries = db.query(models.Itinerary).filter(models.Itinerary.list_id == list_id).offset(skip).limit(limit).all()
+    itineraries = (
+        db.query(models.Itinerary)
+        .filter(models.Itinerary.list_id == list_id)
+        .order_by(models.Itinerary.business_id)
+        .offset(skip).limit(limit).all()
+    )
     return itineraries
 
+def get_itineraries_page(db: Session, list_id: int, cursor: str = "", limit: int = 10):
+    query = db.query(models.Itinerary).filter(models.Itinerary.list_id == list_id)
+    return pagination.paginate(query, models.Itinerary.business_id, cursor, limit)
+
 def delete_itinerary(db: Session, list_id: int, business_id: int):
     db_itinerary = db.query(models.Itinerary).filter(
         models.Itinerary.list_id == list_id,
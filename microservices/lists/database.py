@@ -1,6 +1,14 @@
-from sqlalchemy import create_engine
+import itertools
+import math
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
 import os
 from dotenv import load_dotenv
 
@@ -9,7 +17,140 @@ dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(dotenv_path)
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Comma-separated read replica URLs; reads use the primary when none are set
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+# Connection pool settings, applied to the primary and every replica
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # Seconds; keep below the server's idle timeout
+
+# After a client writes, its reads stay on the primary for this many seconds (0 disables)
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "2"))
+# Carry the Unix time of the client's last write between its requests
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
+# Writes of the request being handled: {"last_write": Unix time or None, "written": bool}
+_client_writes: ContextVar[Optional[dict]] = ContextVar("client_writes", default=None)
+
+
+def make_engine(url: str):
+    options = {"pool_pre_ping": DB_POOL_PRE_PING, "pool_recycle": DB_POOL_RECYCLE}
+    if not url.startswith("sqlite"):
+        # SQLite uses its own pool classes that don't take size/overflow
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    return create_engine(url, **options)
+
+
+class EngineRegistry:
+    """
+    Holds the primary engine and any read replicas.
+
+    `write_session()` always binds to the primary. `read_session()` round-robins
+    over the replicas, except within `read_your_writes_seconds` of the current
+    client's last write, when it stays on the primary so the client sees its
+    own changes despite replication lag. Clients are told apart by
+    ReadYourWritesMiddleware; reads outside a request always use a replica.
+    """
+
+    def __init__(self, primary_url: str, replica_urls: Optional[List[str]] = None, read_your_writes_seconds: float = 0.0):
+        self.primary = make_engine(primary_url)
+        self.replicas = [make_engine(url) for url in replica_urls or []]
+        self.read_your_writes_seconds = read_your_writes_seconds
+
+        self.write_session = sessionmaker(autocommit=False, autoflush=False, bind=self.primary)
+        self._replica_sessions = [
+            sessionmaker(autocommit=False, autoflush=False, bind=replica) for replica in self.replicas
+        ]
+        self._next_replica = itertools.count()
+        event.listen(self.write_session, "after_flush", self._record_flush)
+        event.listen(self.write_session, "do_orm_execute", self._record_statement)
+
+    def _record_flush(self, session, flush_context):
+        self.record_write()
+
+    def _record_statement(self, orm_execute_state):
+        # Bulk insert/update/delete statements bypass the flush
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            self.record_write()
+
+    def record_write(self):
+        """
+        Notes a write by the current client. Writes through write_session() are
+        noted automatically; call this for writes made on the client's behalf
+        in another thread, such as a group-commit batch.
+        """
+        writes = _client_writes.get()
+        if writes is not None:
+            writes["last_write"] = time.time()
+            writes["written"] = True
+
+    def recently_written(self) -> bool:
+        writes = _client_writes.get()
+        return (
+            writes is not None
+            and writes["last_write"] is not None
+            and time.time() - writes["last_write"] < self.read_your_writes_seconds
+        )
+
+    def read_session(self):
+        if not self._replica_sessions or self.recently_written():
+            return self.write_session()
+        index = next(self._next_replica) % len(self._replica_sessions)
+        return self._replica_sessions[index]()
+
+    def engines(self) -> dict:
+        named = {"primary": self.primary}
+        named.update({f"replica_{i}": replica for i, replica in enumerate(self.replicas)})
+        return named
+
+
+class ReadYourWritesMiddleware:
+    """
+    Scopes read-your-writes routing to the client. The time of the client's
+    last write arrives in the `last_write` cookie (or the X-Last-Write header,
+    for service-to-service callers). Responses to requests that wrote carry
+    both, updated. Does nothing when there are no replicas to route around.
+    """
+
+    def __init__(self, app, registry: EngineRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.replicas or self.registry.read_your_writes_seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        try:
+            last_write = float(connection.headers.get(LAST_WRITE_HEADER) or connection.cookies.get(LAST_WRITE_COOKIE))
+        except (TypeError, ValueError):
+            last_write = None
+        writes = {"last_write": last_write, "written": False}
+
+        async def send_with_last_write(message):
+            if message["type"] == "http.response.start" and writes["written"]:
+                headers = MutableHeaders(scope=message)
+                stamp = f"{writes['last_write']:.3f}"
+                headers.append(LAST_WRITE_HEADER, stamp)
+                headers.append("set-cookie", (
+                    f"{LAST_WRITE_COOKIE}={stamp}; Max-Age={math.ceil(self.registry.read_your_writes_seconds)}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                ))
+            await send(message)
+
+        token = _client_writes.set(writes)
+        try:
+            await self.app(scope, receive, send_with_last_write)
+        finally:
+            _client_writes.reset(token)
+
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+registry = EngineRegistry(DATABASE_URL, DATABASE_REPLICA_URLS, READ_YOUR_WRITES_SECONDS)
+engine = registry.primary
+SessionLocal = registry.write_session
+ReadSessionLocal = registry.read_session
 Base = declarative_base()
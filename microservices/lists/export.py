@@ -0,0 +1,77 @@
+import json
+import os
+import zlib
+from typing import Callable, Iterator, Optional
+
+from sqlalchemy import select
+
+import models
+
+# Rows fetched from the database per round trip (server-side cursor on MySQL)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# NDJSON is sent in chunks of about this many bytes
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+
+
+def lists_statement():
+    return select(
+        models.List.list_id, models.List.user_id, models.List.location, models.List.date, models.List.description
+    ).order_by(models.List.list_id)
+
+
+def itineraries_statement(list_id: Optional[int] = None):
+    statement = select(models.Itinerary.list_id, models.Itinerary.business_id)
+    if list_id is not None:
+        statement = statement.where(models.Itinerary.list_id == list_id)
+    return statement.order_by(models.Itinerary.list_id, models.Itinerary.business_id)
+
+
+def iter_ndjson(
+    session_factory: Callable,
+    statement,
+    batch_size: int = EXPORT_BATCH_SIZE,
+    chunk_bytes: int = EXPORT_CHUNK_BYTES,
+) -> Iterator[bytes]:
+    """
+    Streams the rows of `statement` as NDJSON chunks.
+
+    Rows are read `batch_size` at a time with `yield_per` (which also asks the
+    driver for a server-side cursor), so memory stays flat no matter how many
+    rows match. The session lives exactly as long as the iterator.
+    """
+    db = session_factory()
+    try:
+        result = db.execute(statement.execution_options(yield_per=batch_size, stream_results=True))
+        buffer = []
+        size = 0
+        for row in result.mappings():
+            line = json.dumps(dict(row), default=str, separators=(",", ":")) + "\n"
+            buffer.append(line)
+            size += len(line)
+            if size >= chunk_bytes:
+                yield "".join(buffer).encode()
+                buffer, size = [], 0
+        if buffer:
+            yield "".join(buffer).encode()
+    finally:
+        db.close()
+
+
+def gzip_chunks(chunks: Iterator[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzips a stream incrementally; each chunk is flushed so clients can decode as it arrives.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() == "gzip":
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
@@ -0,0 +1,190 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+from sqlalchemy import insert
+
+# Off by default: creates commit one by one, as before
+GROUP_COMMIT = os.getenv("GROUP_COMMIT", "false").lower() in ("1", "true", "yes")
+# How long the writer waits for more creates after the first one of a batch
+GROUP_COMMIT_WINDOW_MS = float(os.getenv("GROUP_COMMIT_WINDOW_MS", "2"))
+GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", "256"))
+
+_STOP = object()
+
+
+def insert_returning(db, model, rows: List[dict]) -> list:
+    """
+    Inserts `rows` and returns the new `model` instances, loaded and in order.
+    Uses one INSERT ... RETURNING statement where the dialect can return rows
+    of an executemany in parameter order (SQLite 3.35+, PostgreSQL, MariaDB),
+    so no refresh is needed; elsewhere (MySQL) the ORM inserts them one by one
+    and reads each generated id from the cursor.
+    """
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        return list(db.scalars(insert(model).returning(model, sort_by_parameter_order=True), rows))
+    instances = [model(**row) for row in rows]
+    db.add_all(instances)
+    db.flush()
+    return instances
+
+
+class GroupCommitWriter:
+    """
+    Batches writes submitted by many request handlers into one transaction.
+
+    A background thread takes the first queued item, waits up to `window_ms`
+    (or until `max_batch` items) for more, and passes them all to
+    `write_batch(db, items)`, which returns one result per item, in order; a
+    result that is an exception goes to that caller only. The batch is then
+    committed once, so a burst of creates costs one commit (and one fsync)
+    instead of one each. If the batch raises, it is rolled back and retried
+    item by item, so each caller still gets its own result or error.
+
+    Sessions are opened with expire_on_commit=False: the returned objects stay
+    loaded after the commit and need no refresh. `on_commit`, if given, is
+    called in the caller's thread after its write succeeds.
+    """
+
+    def __init__(self, session_factory, write_batch: Callable[[object, list], list],
+                 window_ms: float = GROUP_COMMIT_WINDOW_MS, max_batch: int = GROUP_COMMIT_MAX_BATCH, name: str = "writer",
+                 on_commit: Callable[[], None] = None):
+        self.session_factory = session_factory
+        self.write_batch = write_batch
+        self.on_commit = on_commit
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()  # Orders submit against stop, so nothing is queued after the stop marker
+        self.counters = {"items": 0, "batches": 0, "fallbacks": 0}
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"group-commit-{self.name}", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Writes what is already queued, then stops the thread. Items still
+        queued after `timeout` (the writer is stuck on a slow batch) fail with
+        RuntimeError rather than leaving their callers waiting forever.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+        pending = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP:
+                pending.append(entry)
+        if thread.is_alive():
+            # Let it exit once its current batch is done
+            self._queue.put(_STOP)
+        for _, future in pending:
+            future.set_exception(RuntimeError(f"Group commit writer {self.name} stopped before writing this item"))
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def submit(self, item) -> Future:
+        future = Future()
+        with self._lock:
+            if self._thread is None:
+                raise RuntimeError(f"Group commit writer {self.name} is not running")
+            self._queue.put((item, future))
+        return future
+
+    def write(self, item, timeout: float = None):
+        """
+        Submits `item` and blocks until its batch is committed; returns its
+        result or raises its error.
+        """
+        result = self.submit(item).result(timeout)
+        if self.on_commit is not None:
+            self.on_commit()
+        return result
+
+    def stats(self) -> dict:
+        stats = dict(self.counters)
+        stats["mean_batch_size"] = stats["items"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+    def _run(self):
+        while True:
+            entry = self._queue.get()
+            if entry is _STOP:
+                return
+            batch = [entry]
+            stopping = False
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+            self._flush(batch)
+            if stopping:
+                return
+
+    def _flush(self, batch: list):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+        self.counters["items"] += len(batch)
+        self.counters["batches"] += 1
+        db = None
+        try:
+            db = self.session_factory(expire_on_commit=False)
+            try:
+                results = self.write_batch(db, items)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                if len(items) == 1:
+                    results = [e]
+                else:
+                    # One bad item shouldn't fail everyone else's write
+                    logging.info(f"Group commit batch of {len(items)} failed ({e}); writing items one by one")
+                    self.counters["fallbacks"] += 1
+                    results = [self._write_one(db, item) for item in items]
+        except Exception as e:
+            results = [e] * len(items)
+        finally:
+            if db is not None:
+                db.close()
+        for future, result in zip(futures, results):
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _write_one(self, db, item):
+        try:
+            result = self.write_batch(db, [item])[0]
+            db.commit()
+            # Detach it, or a later item's rollback would expire it
+            db.expunge_all()
+            return result
+        except Exception as e:
+            db.rollback()
+            return e
@@ -1,20 +1,28 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import crud
 import database
+import export
+import group_commit
 import schemas
 from sqlalchemy.orm import Session
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
+from starlette.responses import FileResponse, StreamingResponse
 #from fastapi.responses import Response
-import time
-from typing import List
+from typing import List, Optional, Union
 import logging
+import metrics
+import profiling
+import models
+import pagination
+import schema_check
+import tracing
+import weather_cache
 #from dotenv import load_dotenv
 import set_env
 import os
 import uvicorn
-import uuid
 
 """
 # Load environment variables from .env
@@ -22,7 +30,26 @@ dotenv_path = os.path.join(os.path.dirname(__file__), '..', ".env")
 load_dotenv(dotenv_path)
 """
 
-app = FastAPI(debug=True)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pooled client and persistent cache for geocoding / weather lookups
+    weather_cache.start()
+    # Warn early if the database is missing indexes the hot queries rely on
+    for engine in database.registry.engines().values():
+        schema_check.warn_missing_indexes(engine, models.Base.metadata)
+    # Opt-in: concurrent creates share a transaction (see group_commit.GroupCommitWriter)
+    if group_commit.GROUP_COMMIT:
+        create_writer.start()
+    yield
+    create_writer.stop()
+    await weather_cache.close()
+
+app = FastAPI(debug=True, lifespan=lifespan)
+
+# Upper bound on (location, date) pairs accepted by the batch weather endpoint
+MAX_WEATHER_BATCH_ITEMS = int(os.getenv("MAX_WEATHER_BATCH_ITEMS", "500"))
+# Upper bound on business ids accepted by the bulk itinerary endpoints
+MAX_BULK_ITINERARIES = int(os.getenv("MAX_BULK_ITINERARIES", "10000"))
 
 # Setup CORS using environment variables, if needed
 app.add_middleware(
@@ -34,49 +61,25 @@ app.add_middleware(
 )
 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("tracing.log"),  # Log to a file
-        logging.StreamHandler(),            # Log to the console
-    ],
-)
-
-# Custom Logging, Tracing, and Correlation ID Middleware
-class TracingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Generate or extract Correlation ID
-        correlation_id = request.headers.get("X-Correlation-ID", str(uuid.uuid4()))
-        request.state.correlation_id = correlation_id
+# Structured JSON logs, written by a background thread
+tracing.configure_logging("tracing.log")
 
-        # Start timing the request
-        start_time = time.time()
+# Keeps each client's reads on the primary for a moment after it writes
+app.add_middleware(database.ReadYourWritesMiddleware, registry=database.registry)
 
-        # Log request details
-        logging.info(f"Request Start: {request.method} {request.url}")
-        logging.info(f"Correlation ID: {correlation_id} - {request.method} {request.url}")
-        logging.info(f"Headers: {request.headers}")
+# Opt-in profiling (X-Profile header or PROFILE_SAMPLE_RATE); inside tracing so profiles are named by correlation ID
+app.add_middleware(profiling.ProfilingMiddleware)
 
-        if request.method in ["POST", "PUT", "PATCH"]:
-            body = await request.body()
-            logging.info(f"Body: {body.decode('utf-8') if body else None}")
+# Logging, Tracing, and Correlation ID Middleware
+app.add_middleware(tracing.TracingMiddleware)
 
-        # Process the request and get the response
-        response = await call_next(request)
-        response.headers["X-Correlation-ID"] = correlation_id
+metrics.instrument(app, database.registry.engines())
 
-        # End timing and log response details
-        process_time = time.time() - start_time
-        logging.info(
-            f"Request End: {request.method} {request.url} - "
-            f"Status Code: {response.status_code} - Time: {process_time:.4f}s"
-        )
-
-        return response
-
-# Add the middleware to FastAPI
-app.add_middleware(TracingMiddleware)
+# Batches POST /lists/ inserts when GROUP_COMMIT is on; on_commit notes each write for its client's read routing
+create_writer = group_commit.GroupCommitWriter(
+    database.SessionLocal, crud.create_lists, name="lists", on_commit=database.registry.record_write
+)
+metrics.track_group_commit(create_writer)
 
 # Dependency to get a database session
 def get_db():
@@ -86,10 +89,39 @@ def get_db():
     finally:
         db.close()
 
+# Dependency to get a session for read-only endpoints (may be a replica)
+def get_read_db():
+    db = database.ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 @app.get("/")
 async def root():
     return {"message": "Tracing middleware is active!"}
 
+@app.get("/admin/profiles")
+def list_profiles(request: Request):
+    """
+    Lists saved request profiles, newest first. Requires `X-Profile: <PROFILE_TOKEN>`.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{file}")
+def download_profile(file: str, request: Request):
+    """
+    Downloads one profile: `.prof` files load in pstats/snakeviz, `.folded` in speedscope/flamegraph.pl.
+    """
+    if not profiling.is_authorized(request.headers.get("x-profile")):
+        raise HTTPException(status_code=403, detail="A valid X-Profile token is required.")
+    path = profiling.profile_path(file)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=file)
+
 @app.post("/lists/", response_model=schemas.List, status_code=201)
 def create_list(user_id:int,location:str,date:str,description:str, db: Session = Depends(get_db)):
     # Call the CRUD function to create the resource
@@ -99,7 +131,10 @@ def create_list(user_id:int,location:str,date:str,description:str, db: Session =
         date=date,
         description=description
     )
-    created_list = crud.create_list(db=db, list_data=list_data)
+    if create_writer.running:
+        created_list = create_writer.write(list_data)
+    else:
+        created_list = crud.create_list(db=db, list_data=list_data)
     """
     # Generate the link to the newly created resource
     resource_id = created_list.list_id
@@ -113,14 +148,55 @@ def create_list(user_id:int,location:str,date:str,description:str, db: Session =
 
 
 @app.get("/weather/", response_model=str)
-def get_weather(location: str, date: str, db: Session = Depends(get_db), request: Request = None):
+async def get_weather(location: str, date: str, request: Request):
+    correlation_id = request.state.correlation_id
+    try:
+        return await weather_cache.get_weather(location, date, correlation_id)
+    except Exception as e:
+        logging.warning(f"Correlation ID: {correlation_id} - Weather lookup failed: {e}")
+        raise HTTPException(status_code=502, detail=str(e))
+
+@app.post("/weather/batch", response_model=schemas.WeatherBatchResponse)
+async def get_weather_batch(batch: schemas.WeatherBatchRequest, request: Request):
+    """
+    Looks up the weather for many (location, date) pairs in one call.
+    Failures are reported per item instead of failing the whole batch.
+    """
+    if len(batch.items) > MAX_WEATHER_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_WEATHER_BATCH_ITEMS} items can be requested at once.")
     correlation_id = request.state.correlation_id
-    latitude, longitude = crud.fetch_lat_lon(location, correlation_id)
-    return crud.fetch_weather(latitude, longitude, date, correlation_id)
+    results = await weather_cache.get_weather_batch(
+        [(item.location, item.date) for item in batch.items], correlation_id
+    )
+    return {
+        "results": [
+            {"location": item.location, "date": item.date, **result}
+            for item, result in zip(batch.items, results)
+        ]
+    }
+
+@app.get("/weather/cache/stats")
+async def get_weather_cache_stats():
+    return weather_cache.stats()
 
-@app.get("/lists/", response_model=List[schemas.List])
-def get_lists(skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_lists(db=db, skip=skip, limit=limit)
+def check_page_size(limit: int) -> int:
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be at least 1")
+    return min(limit, pagination.MAX_PAGE_SIZE)
+
+@app.get("/lists/", response_model=Union[List[schemas.List], schemas.ListPage])
+def get_lists(skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Without `cursor`, returns a plain array using offset paging (kept for compatibility).
+    With `cursor` (empty for the first page), returns `{"items", "next_cursor"}` ordered by list_id.
+    """
+    if cursor is None:
+        return crud.get_lists(db=db, skip=skip, limit=limit)
+    try:
+        items, next_cursor = crud.get_lists_page(db=db, cursor=cursor, limit=check_page_size(limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.delete("/lists/{list_id}", response_model=schemas.List)
 def delete_list(list_id: int, db: Session = Depends(get_db)):
@@ -131,11 +207,54 @@ def delete_list(list_id: int, db: Session = Depends(get_db)):
 
 @app.post("/lists/{list_id}/itineraries/", response_model=schemas.Itinerary, status_code=202)
 def add_itinerary_to_list(list_id: int, business_id: int, db: Session = Depends(get_db)):
-    return crud.add_itinerary(db=db, list_id=list_id, business_id=business_id)
+    try:
+        return crud.add_itinerary(db=db, list_id=list_id, business_id=business_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+def check_bulk_size(batch: schemas.ItineraryBulkRequest):
+    if len(batch.business_ids) > MAX_BULK_ITINERARIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ITINERARIES} business ids can be sent at once.")
+
+@app.post("/lists/{list_id}/itineraries/bulk", response_model=schemas.ItineraryBulkAddResult)
+def add_itineraries_to_list(list_id: int, batch: schemas.ItineraryBulkRequest, db: Session = Depends(get_db)):
+    """
+    Adds every business in `business_ids` to the list in one transaction.
+    Businesses already in the list and unknown ids are reported in `duplicates`
+    and `not_found` instead of failing the batch, so retrying a request is safe.
+    """
+    check_bulk_size(batch)
+    result = crud.add_itineraries(db=db, list_id=list_id, business_ids=batch.business_ids)
+    if result is None:
+        raise HTTPException(status_code=404, detail="List not found")
+    return result
+
+@app.delete("/lists/{list_id}/itineraries/bulk", response_model=schemas.ItineraryBulkDeleteResult)
+def delete_itineraries_from_list(list_id: int, batch: schemas.ItineraryBulkRequest, db: Session = Depends(get_db)):
+    """
+    Removes every business in `business_ids` from the list in one transaction;
+    ids that weren't in the list are reported in `not_found`.
+    """
+    check_bulk_size(batch)
+    result = crud.delete_itineraries(db=db, list_id=list_id, business_ids=batch.business_ids)
+    if result is None:
+        raise HTTPException(status_code=404, detail="List not found")
+    return result
 
-@app.get("/lists/{list_id}/itineraries/", response_model=List[schemas.Itinerary])
-def get_itineraries_for_list(list_id: int, skip: int = 0, limit: int = 10, db: Session = Depends(get_db)):
-    return crud.get_itineraries(db=db, list_id=list_id, skip=skip, limit=limit)
+@app.get("/lists/{list_id}/itineraries/", response_model=Union[List[schemas.Itinerary], schemas.ItineraryPage])
+def get_itineraries_for_list(list_id: int, skip: int = 0, limit: int = 10, cursor: Optional[str] = None, db: Session = Depends(get_read_db)):
+    """
+    Same paging modes as `GET /lists/`; cursor pages are ordered by business_id.
+    """
+    if cursor is None:
+        return crud.get_itineraries(db=db, list_id=list_id, skip=skip, limit=limit)
+    try:
+        items, next_cursor = crud.get_itineraries_page(db=db, list_id=list_id, cursor=cursor, limit=check_page_size(limit))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": items, "next_cursor": next_cursor}
 
 @app.delete("/lists/{list_id}/itineraries/{business_id}", response_model=schemas.Itinerary)
 def delete_itinerary_from_list(list_id: int, business_id: int, db: Session = Depends(get_db)):
@@ -144,6 +263,29 @@ def delete_itinerary_from_list(list_id: int, business_id: int, db: Session = Dep
         raise HTTPException(status_code=404, detail="Itinerary not found")
     return itinerary
 
+def ndjson_response(statement, request: Request) -> StreamingResponse:
+    chunks = export.iter_ndjson(database.ReadSessionLocal, statement)
+    headers = {"Vary": "Accept-Encoding"}
+    if export.accepts_gzip(request.headers.get("accept-encoding")):
+        chunks = export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="application/x-ndjson", headers=headers)
+
+@app.get("/export/lists")
+def export_lists(request: Request):
+    """
+    Streams every list as NDJSON (one object per line, ordered by list_id),
+    gzipped when the client sends `Accept-Encoding: gzip`.
+    """
+    return ndjson_response(export.lists_statement(), request)
+
+@app.get("/export/itineraries")
+def export_itineraries(request: Request, list_id: Optional[int] = None):
+    """
+    Streams every itinerary (or one list's) as NDJSON, ordered by list_id and business_id.
+    """
+    return ndjson_response(export.itineraries_statement(list_id), request)
+
 @app.put("/lists/{list_id}/description", response_model=dict)
 def update_list_description(
     list_id: int,
@@ -0,0 +1,189 @@
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+# Upper bounds in seconds; requests and upstream calls share these buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram keyed by label values.
+
+    Observations are made from the event loop thread only (middleware and
+    async clients), so no lock is taken on the hot path.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series: Dict[tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                bucket_labels = _labels(self.labelnames + ("le",), labels + (_number(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            series_labels = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{series_labels} {series[-1]}")
+            lines.append(f"{self.name}_count{series_labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """
+    Gauge whose values are read at scrape time from `collect()`, which returns
+    {label values: value}.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...], collect: Callable[[], dict]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in self.collect().items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Time spent serving HTTP requests.", ("method", "route", "status")
+))
+
+
+def track_engines(engines: Dict[str, object]):
+    """
+    Exposes connection pool usage for each named SQLAlchemy engine.
+    """
+
+    def pool_stat(attribute: str):
+        def collect():
+            values = {}
+            for name, engine in engines.items():
+                stat = getattr(engine.pool, attribute, None)
+                if stat is not None:
+                    values[(name,)] = stat()
+            return values
+        return collect
+
+    registry.register(Gauge(
+        "db_pool_checked_out_connections", "Connections currently checked out of the pool.",
+        ("engine",), pool_stat("checkedout"),
+    ))
+    registry.register(Gauge(
+        "db_pool_overflow_connections", "Connections open beyond the pool size (negative while below it).",
+        ("engine",), pool_stat("overflow"),
+    ))
+    registry.register(Gauge(
+        "db_pool_size", "Configured pool size.", ("engine",), pool_stat("size"),
+    ))
+
+
+def track_group_commit(writer):
+    """
+    Exposes a group_commit.GroupCommitWriter's counters, labelled by its name.
+    """
+    registry.register(Gauge(
+        "group_commit_writes", "Creates written by the group-commit writer: items, batches and fallbacks to one by one.",
+        ("writer", "kind"), lambda: {(writer.name, kind): writer.counters[kind] for kind in ("items", "batches", "fallbacks")},
+    ))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware that times every HTTP request. Requests are labelled
+    with the matched route template (e.g. /businesses/{business_id}) rather
+    than the raw path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start_time = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.observe(
+                (scope["method"], getattr(route, "path", "unmatched"), str(status_code)),
+                time.perf_counter() - start_time,
+            )
+
+
+def metrics_response() -> Response:
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+def instrument(app, engines: Optional[Dict[str, object]] = None):
+    """
+    Wires a service up: times its requests with MetricsMiddleware, adds pool
+    gauges for `engines` and serves the registry at GET /metrics in the
+    Prometheus text format.
+    """
+    app.add_middleware(MetricsMiddleware)
+    if engines:
+        track_engines(engines)
+    app.add_api_route("/metrics", metrics_response, methods=["GET"], include_in_schema=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP, Date, Boolean
+from sqlalchemy import Column, Index, Integer, String, Text, ForeignKey, TIMESTAMP, Date, Boolean, Float
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -32,13 +32,13 @@ class List(Base):
     __tablename__ = "lists"
 
     list_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
     location = Column(String(255), nullable=False)
     date = Column(Date, nullable=False)
     description = Column(Text, nullable=True)
 
     user = relationship("User", back_populates="lists")
-    itineraries = relationship("Itinerary", back_populates="list")
+    itineraries = relationship("Itinerary", back_populates="list", cascade="all, delete-orphan")
 
 
 class Itinerary(Base):
@@ -53,6 +53,12 @@ class Itinerary(Base):
 
 class Business(Base):
     __tablename__ = "businesses"
+    __table_args__ = (
+        # get_next_business filters on location and seeks/orders by business_id
+        Index("ix_businesses_location_business_id", "location", "business_id"),
+        Index("ix_businesses_geohash", "geohash"),
+        Index("ix_businesses_address_location", "address", "location"),
+    )
 
     business_id = Column(Integer, primary_key=True, index=True)
     business_name = Column(String(255), nullable=False)
@@ -60,5 +66,18 @@ class Business(Base):
     address = Column(String(255), nullable=False)
     category = Column(String(255), nullable=False)
     description = Column(Text, nullable=False)
+    # Owned by the businesses service, which also maintains geohash
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(9), nullable=True)
+
+    itineraries = relationship("Itinerary", back_populates="business", cascade="all, delete-orphan")
+
+
+class CacheEntry(Base):
+    __tablename__ = "cache_entries"
 
-    itineraries = relationship("Itinerary", back_populates="business")
+    namespace = Column(String(32), primary_key=True)
+    key = Column(String(255), primary_key=True)
+    value = Column(Text, nullable=False)  # JSON encoded
+    expires_at = Column(Float, nullable=False)  # Unix timestamp
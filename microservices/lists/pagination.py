@@ -0,0 +1,49 @@
+import base64
+import json
+from typing import Optional
+
+# Largest page a cursor request may ask for
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(last_key: int) -> str:
+    """
+    Turns the primary key of the last row on a page into an opaque cursor.
+    """
+    raw = json.dumps({"after": last_key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """
+    Returns the key to continue after, or None for the first page (empty cursor).
+    Raises ValueError if the cursor was not produced by `encode_cursor`.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        after = json.loads(raw)["after"]
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(after, int):
+        raise ValueError("Invalid cursor")
+    return after
+
+
+def paginate(query, key_column, cursor: str, limit: int):
+    """
+    Runs `query` as one keyset page ordered by `key_column`.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    after = decode_cursor(cursor)
+    query = query.order_by(key_column)
+    if after is not None:
+        query = query.filter(key_column > after)
+
+    # Fetch one extra row to know whether another page follows
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(getattr(rows[-1], key_column.key))
@@ -1,10 +1,11 @@
+from datetime import date as Date
 from pydantic import BaseModel
 from typing import Optional
 
 class ListBase(BaseModel):
     user_id: int
     location: str
-    date: str
+    date: Date  # Sent and returned as YYYY-MM-DD
     description: Optional[str] = None
 
 class ListCreate(ListBase):
@@ -16,6 +17,10 @@ class List(ListBase):
     class Config:
         orm_mode = True
 
+class ListPage(BaseModel):
+    items: list[List]
+    next_cursor: Optional[str] = None
+
 class ListUpdate(BaseModel):
     location: Optional[str] = None
     description: Optional[str] = None
@@ -34,3 +39,35 @@ class Itinerary(ItineraryBase):
 
     class Config:
         orm_mode = True
+
+class ItineraryPage(BaseModel):
+    items: list[Itinerary]
+    next_cursor: Optional[str] = None
+
+class ItineraryBulkRequest(BaseModel):
+    business_ids: list[int]
+
+class ItineraryBulkAddResult(BaseModel):
+    list_id: int
+    added: list[int]
+    duplicates: list[int]  # Already in the list, or repeated in the request
+    not_found: list[int]  # No such business
+
+class ItineraryBulkDeleteResult(BaseModel):
+    list_id: int
+    removed: list[int]
+    not_found: list[int]  # Not in the list
+
+class WeatherQuery(BaseModel):
+    location: str
+    date: str  # YYYY-MM-DD
+
+class WeatherBatchRequest(BaseModel):
+    items: list[WeatherQuery]
+
+class WeatherResult(WeatherQuery):
+    temperature: Optional[str] = None  # Average of the daily max and min
+    error: Optional[str] = None
+
+class WeatherBatchResponse(BaseModel):
+    results: list[WeatherResult]
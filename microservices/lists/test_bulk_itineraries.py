@@ -0,0 +1,123 @@
+import time
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import crud
+import models
+
+
+def add_list_and_businesses(db, businesses):
+    db.add(models.List(user_id=1, location="NYC", date=date(2024, 6, 1)))
+    db.add_all(
+        models.Business(business_name=f"b{i}", location="NYC", address=f"{i} Main St", category="food", description="")
+        for i in range(businesses)
+    )
+    db.commit()
+
+
+def itinerary_ids(db, list_id=1):
+    return [row.business_id for row in db.query(models.Itinerary).filter_by(list_id=list_id).order_by(models.Itinerary.business_id)]
+
+
+def test_bulk_add_reports_duplicates_and_unknown_businesses(db):
+    add_list_and_businesses(db, 10)
+    crud.add_itinerary(db, 1, 3)
+
+    result = crud.add_itineraries(db, 1, [1, 2, 3, 2, 999])
+
+    assert result == {"list_id": 1, "added": [1, 2], "duplicates": [2, 3], "not_found": [999]}
+    assert itinerary_ids(db) == [1, 2, 3]
+
+
+def test_bulk_add_is_idempotent(db):
+    add_list_and_businesses(db, 5)
+
+    first = crud.add_itineraries(db, 1, [1, 2, 3])
+    second = crud.add_itineraries(db, 1, [1, 2, 3])
+
+    assert first["added"] == [1, 2, 3]
+    assert second["added"] == [] and second["duplicates"] == [1, 2, 3]
+
+
+def test_insert_skips_rows_added_concurrently(db):
+    add_list_and_businesses(db, 3)
+    crud.add_itinerary(db, 1, 2)
+
+    # As if another request added business 2 after add_itineraries classified it as new
+    crud.insert_ignoring_duplicates(db, [{"list_id": 1, "business_id": b} for b in (1, 2, 3)])
+    db.commit()
+
+    assert itinerary_ids(db) == [1, 2, 3]
+
+
+def test_rows_added_concurrently_are_reported_as_duplicates(db, monkeypatch):
+    add_list_and_businesses(db, 3)
+    insert_ignoring_duplicates = crud.insert_ignoring_duplicates
+
+    def racing_insert(db, rows):
+        # Another request adds business 2 after add_itineraries classified it as new
+        db.execute(insert(models.Itinerary).values(list_id=1, business_id=2))
+        return insert_ignoring_duplicates(db, rows)
+
+    monkeypatch.setattr(crud, "insert_ignoring_duplicates", racing_insert)
+    result = crud.add_itineraries(db, 1, [1, 2, 3])
+
+    assert result == {"list_id": 1, "added": [1, 3], "duplicates": [2], "not_found": []}
+    assert itinerary_ids(db) == [1, 2, 3]
+
+
+def test_single_add_tells_missing_rows_from_duplicates(db):
+    add_list_and_businesses(db, 2)
+    crud.add_itinerary(db, 1, 1)
+
+    with pytest.raises(ValueError):
+        crud.add_itinerary(db, 1, 1)
+    with pytest.raises(LookupError, match="Business"):
+        crud.add_itinerary(db, 1, 999)
+    with pytest.raises(LookupError, match="List"):
+        crud.add_itinerary(db, 42, 1)
+    assert itinerary_ids(db) == [1]
+
+
+def test_bulk_delete_reports_missing_itineraries(db):
+    add_list_and_businesses(db, 5)
+    crud.add_itineraries(db, 1, [1, 2, 3])
+
+    result = crud.delete_itineraries(db, 1, [2, 3, 4])
+
+    assert result == {"list_id": 1, "removed": [2, 3], "not_found": [4]}
+    assert itinerary_ids(db) == [1]
+
+
+def test_bulk_endpoints(db):
+    import main
+
+    add_list_and_businesses(db, 5)
+    client = TestClient(main.app)
+
+    response = client.post("/lists/1/itineraries/bulk", json={"business_ids": [1, 2, 2]})
+    assert response.status_code == 200
+    assert response.json()["added"] == [1, 2]
+
+    response = client.request("DELETE", "/lists/1/itineraries/bulk", json={"business_ids": [1, 5]})
+    assert response.json() == {"list_id": 1, "removed": [1], "not_found": [5]}
+
+    assert client.post("/lists/42/itineraries/bulk", json={"business_ids": [1]}).status_code == 404
+    # Duplicates through the single-row endpoint are a conflict, not a server error
+    assert client.post("/lists/1/itineraries/", params={"business_id": 2}).status_code == 409
+    assert client.post("/lists/1/itineraries/", params={"business_id": 999}).status_code == 404
+    assert client.post("/lists/42/itineraries/", params={"business_id": 1}).status_code == 404
+
+
+def test_bulk_add_handles_thousands_of_rows_per_second(db):
+    add_list_and_businesses(db, 5000)
+
+    start = time.perf_counter()
+    result = crud.add_itineraries(db, 1, list(range(1, 5001)))
+    elapsed = time.perf_counter() - start
+
+    assert len(result["added"]) == 5000
+    assert elapsed < 2.5  # Typically well under a second; generous for slow CI machines
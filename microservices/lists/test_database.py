@@ -0,0 +1,95 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import Column, MetaData, String, Table, insert, select
+
+import database
+
+metadata = MetaData()
+marker = Table("marker", metadata, Column("name", String))
+
+
+def make_registry(tmp_path, read_your_writes_seconds=0.0):
+    registry = database.EngineRegistry(
+        f"sqlite:///{tmp_path / 'primary.db'}",
+        [f"sqlite:///{tmp_path / 'replica.db'}"],
+        read_your_writes_seconds,
+    )
+    # Tag each database so a query shows which one it ran on
+    for name, engine in registry.engines().items():
+        metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(insert(marker).values(name=name))
+    return registry
+
+
+def read_marker(session):
+    try:
+        return session.execute(select(marker.c.name).limit(1)).scalar()
+    finally:
+        session.close()
+
+
+def test_reads_go_to_replica_and_writes_to_primary(tmp_path):
+    registry = make_registry(tmp_path)
+
+    assert read_marker(registry.read_session()) == "replica_0"
+    assert read_marker(registry.write_session()) == "primary"
+
+
+def make_app(registry):
+    app = FastAPI()
+    app.add_middleware(database.ReadYourWritesMiddleware, registry=registry)
+
+    @app.post("/write")
+    def write():
+        session = registry.write_session()
+        session.execute(insert(marker).values(name="written"))
+        session.commit()
+        session.close()
+
+    @app.get("/read")
+    def read():
+        return read_marker(registry.read_session())
+
+    return app
+
+
+def test_reads_stay_on_primary_right_after_the_clients_write(tmp_path):
+    app = make_app(make_registry(tmp_path, read_your_writes_seconds=60))
+    writer, other = TestClient(app), TestClient(app)
+    assert writer.get("/read").json() == "replica_0"
+
+    response = writer.post("/write")
+    assert database.LAST_WRITE_COOKIE in response.cookies
+    assert database.LAST_WRITE_HEADER in response.headers
+
+    assert writer.get("/read").json() == "primary"
+    # Another client's reads aren't pinned by that write
+    assert other.get("/read").json() == "replica_0"
+    # Service callers can forward the header instead of the cookie
+    stamp = response.headers[database.LAST_WRITE_HEADER]
+    assert other.get("/read", headers={database.LAST_WRITE_HEADER: stamp}).json() == "primary"
+
+
+def test_reads_outside_requests_use_replicas_after_a_write(tmp_path):
+    registry = make_registry(tmp_path, read_your_writes_seconds=60)
+
+    session = registry.write_session()
+    session.execute(insert(marker).values(name="written"))
+    session.commit()
+    session.close()
+
+    assert read_marker(registry.read_session()) == "replica_0"
+
+
+def test_stale_or_invalid_last_write_reads_from_replica(tmp_path):
+    client = TestClient(make_app(make_registry(tmp_path, read_your_writes_seconds=60)))
+
+    assert client.get("/read", headers={database.LAST_WRITE_HEADER: "0"}).json() == "replica_0"
+    assert client.get("/read", headers={database.LAST_WRITE_HEADER: "soon"}).json() == "replica_0"
+
+
+def test_without_replicas_reads_use_primary(tmp_path):
+    registry = database.EngineRegistry(f"sqlite:///{tmp_path / 'only.db'}")
+
+    assert registry.read_session().get_bind() is registry.primary
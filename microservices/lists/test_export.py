@@ -0,0 +1,60 @@
+import gzip
+import json
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+import database
+import export
+import models
+
+
+def add_lists(db, count, itineraries_per_list=2):
+    db.add_all(
+        models.List(user_id=1, location="NYC", date=date(2024, 6, 1), description=f"list {i}")
+        for i in range(count)
+    )
+    db.flush()
+    db.add_all(
+        models.Itinerary(list_id=list_id, business_id=business_id)
+        for list_id in range(1, count + 1)
+        for business_id in range(1, itineraries_per_list + 1)
+    )
+    db.commit()
+
+
+def test_ndjson_is_streamed_in_chunks(db):
+    add_lists(db, 50)
+
+    chunks = list(export.iter_ndjson(database.SessionLocal, export.lists_statement(), batch_size=7, chunk_bytes=500))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+
+    assert len(chunks) > 1
+    assert [row["list_id"] for row in rows] == list(range(1, 51))
+    assert rows[0]["date"] == "2024-06-01"
+
+
+def test_export_endpoint_gzips_when_accepted(db):
+    import main
+
+    add_lists(db, 5, itineraries_per_list=3)
+    client = TestClient(main.app)
+
+    response = client.get("/export/itineraries", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert len(response.text.splitlines()) == 15  # httpx decodes the gzip body
+
+    plain = client.get("/export/itineraries", params={"list_id": 2}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert [json.loads(line) for line in plain.text.splitlines()] == [
+        {"list_id": 2, "business_id": 1}, {"list_id": 2, "business_id": 2}, {"list_id": 2, "business_id": 3}
+    ]
+
+
+def test_gzip_chunks_round_trip():
+    data = b"".join(export.gzip_chunks(iter([b"a" * 1000, b"b" * 1000])))
+
+    assert gzip.decompress(data) == b"a" * 1000 + b"b" * 1000
+    assert export.accepts_gzip("deflate, gzip;q=0.8")
+    assert not export.accepts_gzip("gzip;q=0")
@@ -0,0 +1,41 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+import crud
+import database
+import group_commit
+import models
+import schemas
+
+
+def test_concurrent_list_creates_share_batches(db):
+    writer = group_commit.GroupCommitWriter(database.SessionLocal, crud.create_lists, window_ms=20, name="test")
+    writer.start()
+    try:
+        items = [schemas.ListCreate(user_id=1, location="NYC", date=date(2024, 6, i % 28 + 1)) for i in range(40)]
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            created = list(pool.map(writer.write, items))
+    finally:
+        writer.stop()
+
+    assert [c.date for c in created] == [item.date for item in items]
+    assert sorted(c.list_id for c in created) == list(range(1, 41))
+    assert db.query(models.List).count() == 40
+    assert writer.counters["batches"] < 40
+
+
+def test_create_endpoint_uses_the_writer_when_running(db):
+    import main
+
+    main.create_writer.start()
+    try:
+        client = TestClient(main.app)
+        response = client.post("/lists/", params={"user_id": 1, "location": "NYC", "date": "2024-06-01", "description": "d"})
+    finally:
+        main.create_writer.stop()
+
+    assert response.status_code == 201
+    assert response.json()["list_id"] == 1
+    assert main.create_writer.counters["items"] == 1
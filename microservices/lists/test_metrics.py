@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+import metrics
+
+
+def test_histogram_counts_requests_by_route():
+    histogram = metrics.Histogram("test_seconds", "Test.", ("route",), buckets=(0.1,))
+    histogram.observe(("/a",), 0.05)
+    histogram.observe(("/a",), 0.5)
+
+    lines = histogram.render()
+
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_count{route="/a"} 2' in lines
+
+
+def test_service_serves_its_metrics(db):
+    import main
+
+    client = TestClient(main.app)
+    client.get("/lists/", params={"limit": 1})
+
+    body = client.get("/metrics").text
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/lists/",status="200"}' in body
+    assert 'db_pool_size{engine="primary"}' in body
+    assert 'group_commit_writes{writer="lists",kind="items"}' in body
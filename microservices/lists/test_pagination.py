@@ -0,0 +1,56 @@
+from datetime import date
+
+import pytest
+
+import crud
+import models
+import pagination
+
+
+def add_lists(db, count):
+    db.add_all(
+        models.List(user_id=1, location="NYC", date=date(2024, 6, 1), description=f"list {i}")
+        for i in range(count)
+    )
+    db.commit()
+
+
+def test_cursor_pages_cover_every_list_once(db):
+    add_lists(db, 25)
+
+    seen, cursor = [], ""
+    while cursor is not None:
+        items, cursor = crud.get_lists_page(db, cursor=cursor, limit=10)
+        seen.extend(item.list_id for item in items)
+
+    assert seen == sorted(seen)
+    assert len(seen) == len(set(seen)) == 25
+
+
+def test_cursor_is_stable_across_inserts(db):
+    add_lists(db, 10)
+    first_page, cursor = crud.get_lists_page(db, cursor="", limit=5)
+
+    add_lists(db, 3)  # New rows land after the cursor, not in the middle of a page
+    second_page, _ = crud.get_lists_page(db, cursor=cursor, limit=5)
+
+    assert second_page[0].list_id == first_page[-1].list_id + 1
+
+
+def test_itinerary_pages_stay_within_list(db):
+    add_lists(db, 2)
+    db.add_all(models.Itinerary(list_id=1, business_id=i) for i in range(1, 8))
+    db.add(models.Itinerary(list_id=2, business_id=100))
+    db.commit()
+
+    items, cursor = crud.get_itineraries_page(db, list_id=1, cursor="", limit=5)
+    rest, last = crud.get_itineraries_page(db, list_id=1, cursor=cursor, limit=5)
+
+    assert [i.business_id for i in items + rest] == list(range(1, 8))
+    assert last is None
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        pagination.decode_cursor("not-a-cursor")
+    assert pagination.decode_cursor(pagination.encode_cursor(42)) == 42
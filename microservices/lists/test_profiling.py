@@ -0,0 +1,35 @@
+import os
+import pstats
+
+from fastapi.testclient import TestClient
+
+import profiling
+
+
+def service_profiler(app, directory, monkeypatch):
+    """
+    The service's own ProfilingMiddleware, pointed at `directory` with token "secret".
+    """
+    layer = app.middleware_stack
+    while not isinstance(layer, profiling.ProfilingMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, "token", b"secret")
+    monkeypatch.setattr(layer, "directory", str(directory))
+    return layer
+
+
+def test_sync_endpoint_appears_in_its_profile(db, tmp_path, monkeypatch):
+    import main
+
+    client = TestClient(main.app)
+    client.get("/")  # Builds the middleware stack
+    service_profiler(main.app, tmp_path, monkeypatch)
+
+    response = client.get("/lists/", headers={"X-Profile": "secret", "X-Correlation-ID": "lists-1"})
+
+    assert response.status_code == 200
+    [details] = profiling.list_profiles(str(tmp_path))
+    assert details["path"] == "/lists/"
+    assert details["correlation_id"] == "lists-1"
+    stats = pstats.Stats(os.path.join(tmp_path, details["file"]))
+    assert "get_lists" in {name for _, _, name in stats.stats}
@@ -0,0 +1,29 @@
+from sqlalchemy import text
+
+import crud
+import database
+import models
+import schema_check
+
+
+def test_declared_indexes_are_found_after_create_all(db):
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == []
+
+
+def test_dropped_index_is_reported(db):
+    db.execute(text("DROP INDEX ix_businesses_geohash"))
+    db.commit()
+
+    assert schema_check.missing_indexes(database.engine, models.Base.metadata) == [
+        "businesses: missing index ix_businesses_geohash (geohash)"
+    ]
+
+
+def test_itinerary_page_plan_seeks_by_list(db):
+    plans = schema_check.explain_queries(
+        database.engine, {"page": lambda: crud.get_itineraries_page(db, 1, cursor="", limit=10)}
+    )
+
+    lines = [line for _, plan in plans["page"] for line in plan]
+    assert lines
+    assert all("SCAN itineraries" not in line for line in lines)
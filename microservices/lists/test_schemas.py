@@ -0,0 +1,25 @@
+from datetime import date
+
+import pytest
+from pydantic import ValidationError
+
+import models
+import schemas
+
+
+def test_list_date_travels_as_iso_text():
+    created = schemas.ListCreate(user_id=1, location="NYC", date="2024-06-01")
+
+    assert created.date == date(2024, 6, 1)
+    assert created.model_dump(mode="json")["date"] == "2024-06-01"
+    with pytest.raises(ValidationError):
+        schemas.ListCreate(user_id=1, location="NYC", date="June 1st")
+
+
+def test_stored_lists_validate_as_responses(db):
+    db.add(models.List(user_id=1, location="NYC", date=date(2024, 6, 1)))
+    db.commit()
+
+    response = schemas.List.model_validate(db.get(models.List, 1), from_attributes=True)
+
+    assert response.model_dump(mode="json")["date"] == "2024-06-01"
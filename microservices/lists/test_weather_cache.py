@@ -0,0 +1,191 @@
+import asyncio
+from datetime import date, timedelta
+
+import httpx
+
+import crud
+import weather_cache
+
+
+def stub_upstream():
+    """
+    Local stand-in for Nominatim and open-meteo that counts calls per host.
+    """
+    calls = {"geocode": 0, "forecast": 0}
+
+    async def handler(request: httpx.Request):
+        await asyncio.sleep(0.01)  # Give concurrent requests a chance to overlap
+        if str(request.url).startswith(crud.NOMINATIM_URL):
+            calls["geocode"] += 1
+            offset = len(request.url.params["q"])  # Distinct coordinates per location
+            return httpx.Response(200, json=[{"lat": str(40.0 + offset), "lon": "-74.0060"}])
+        calls["forecast"] += 1
+        start = date.fromisoformat(request.url.params["start_date"])
+        end = date.fromisoformat(request.url.params["end_date"])
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        return httpx.Response(200, json={
+            "daily": {"time": days, "temperature_2m_max": [20.0] * len(days), "temperature_2m_min": [10.0] * len(days)}
+        })
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+def reset_caches():
+    weather_cache.geocodes = weather_cache.TTLCache("geocode", weather_cache.GEOCODE_TTL_SECONDS)
+    weather_cache.forecasts = weather_cache.TTLCache("forecast", weather_cache.FORECAST_TTL_SECONDS)
+
+
+def test_repeated_lookups_hit_the_cache(db):
+    async def run():
+        client, calls = stub_upstream()
+        weather_cache.start(client)
+        reset_caches()
+        first = await weather_cache.get_weather("New York", "2024-06-01", "cid")
+        second = await weather_cache.get_weather("new  york", "2024-06-01", "cid")
+        await weather_cache.close()
+        return first, second, calls
+
+    first, second, calls = asyncio.run(run())
+
+    assert first == second == "15.0"
+    assert calls == {"geocode": 1, "forecast": 1}
+    assert weather_cache.geocodes.stats()["hits"] == 1
+
+
+def test_concurrent_misses_share_one_upstream_call(db):
+    async def run():
+        client, calls = stub_upstream()
+        weather_cache.start(client)
+        reset_caches()
+        results = await asyncio.gather(*(
+            weather_cache.get_weather("Boston", "2024-06-01", "cid") for _ in range(10)
+        ))
+        await weather_cache.close()
+        return results, calls
+
+    results, calls = asyncio.run(run())
+
+    assert set(results) == {"15.0"}
+    assert calls == {"geocode": 1, "forecast": 1}
+    assert weather_cache.geocodes.stats()["coalesced"] == 9
+
+
+def test_entries_survive_a_restart(db):
+    async def run():
+        client, calls = stub_upstream()
+        weather_cache.start(client)
+        reset_caches()
+        await weather_cache.get_weather("Chicago", "2024-06-01", "cid")
+        reset_caches()  # Fresh in-memory caches, as after a restart
+        await weather_cache.get_weather("Chicago", "2024-06-01", "cid")
+        await weather_cache.close()
+        return calls
+
+    calls = asyncio.run(run())
+
+    assert calls == {"geocode": 1, "forecast": 1}
+    assert weather_cache.forecasts.stats()["persistent_hits"] == 1
+
+
+def test_batch_groups_dates_per_location(db):
+    async def run():
+        client, calls = stub_upstream()
+        weather_cache.start(client)
+        reset_caches()
+        await weather_cache.get_weather("Boston", "2024-06-02", "cid")  # Pre-cached pair
+        results = await weather_cache.get_weather_batch([
+            ("Boston", "2024-06-01"),
+            ("Boston", "2024-06-02"),
+            ("Boston", "2024-06-03"),
+            ("Chicago", "2024-06-01"),
+            ("Chicago", "not-a-date"),
+        ], "cid")
+        await weather_cache.close()
+        return results, calls
+
+    results, calls = asyncio.run(run())
+
+    assert [r["temperature"] for r in results[:4]] == ["15.0"] * 4
+    assert results[4]["error"] == "date must be in YYYY-MM-DD format"
+    # Boston: one single-day call plus one range call; Chicago: one range call
+    assert calls == {"geocode": 2, "forecast": 3}
+
+
+def test_split_date_ranges():
+    groups = weather_cache.split_date_ranges(["2024-06-20", "2024-06-01", "2024-06-03", "2024-06-01"])
+
+    assert groups == [["2024-06-01", "2024-06-03"], ["2024-06-20"]]
+
+
+def test_bulk_lookup_and_put_round_trip_through_the_table(db):
+    async def run():
+        weather_cache.start(stub_upstream()[0])
+        cache = weather_cache.TTLCache("test", 60)
+        await cache.put_many({"a": "1.0", "b": "2.0"})
+        await cache.put_many({"b": "2.5"})  # Overwrites the stored row
+        restarted = weather_cache.TTLCache("test", 60)
+        found = await restarted.lookup_many(["a", "b", "c", "a"])
+        await weather_cache.close()
+        return found, restarted.stats()
+
+    found, stats = asyncio.run(run())
+
+    assert found == {"a": "1.0", "b": "2.5"}
+    assert (stats["persistent_hits"], stats["misses"]) == (2, 1)
+
+
+def test_batch_reads_and_writes_forecasts_in_bulk(db, monkeypatch):
+    calls = {"load": 0, "save": 0}
+    load_many, save_many = weather_cache.TTLCache._load_many, weather_cache.TTLCache._save_many
+
+    def count(name, method):
+        def wrapper(self, *args):
+            if self.namespace == "forecast":
+                calls[name] += 1
+            return method(self, *args)
+        return wrapper
+
+    monkeypatch.setattr(weather_cache.TTLCache, "_load_many", count("load", load_many))
+    monkeypatch.setattr(weather_cache.TTLCache, "_save_many", count("save", save_many))
+
+    async def run():
+        weather_cache.start(stub_upstream()[0])
+        reset_caches()
+        results = await weather_cache.get_weather_batch(
+            [("Boston", f"2024-06-{day:02d}") for day in range(1, 11)], "cid"
+        )
+        await weather_cache.close()
+        return results
+
+    results = asyncio.run(run())
+
+    assert [r["temperature"] for r in results] == ["15.0"] * 10
+    # One query for the ten cached forecasts, one transaction for the ten fetched ones
+    assert calls == {"load": 1, "save": 1}
+    assert weather_cache.forecasts.stats()["misses"] == 10
+
+
+def test_concurrent_bulk_puts_of_the_same_keys_succeed(db):
+    async def run():
+        weather_cache.start(stub_upstream()[0])
+        caches = [weather_cache.TTLCache("test", 60) for _ in range(8)]
+        await asyncio.gather(*(cache.put_many({"a": str(i), "b": str(i)}) for i, cache in enumerate(caches)))
+        found = await weather_cache.TTLCache("test", 60).lookup_many(["a", "b"])
+        await weather_cache.close()
+        return found
+
+    found = asyncio.run(run())
+
+    assert set(found) == {"a", "b"} and found["a"] == found["b"]
+
+
+def test_concurrent_puts_of_the_same_key_succeed(db):
+    async def run():
+        weather_cache.start(stub_upstream()[0])
+        caches = [weather_cache.TTLCache("test", 60) for _ in range(8)]
+        await asyncio.gather(*(cache.put("a", str(i)) for i, cache in enumerate(caches)))
+        found = await weather_cache.TTLCache("test", 60).lookup_many(["a"])
+        await weather_cache.close()
+        return found
+
+    assert set(asyncio.run(run())) == {"a"}
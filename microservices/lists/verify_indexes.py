@@ -0,0 +1,60 @@
+"""
+Checks that the database has every index declared in models.py and prints the
+EXPLAIN plan of each hot query, so a missing index shows up at deploy time.
+
+Exits with status 1 if the primary or any replica is missing a table or index.
+
+Usage:
+    python verify_indexes.py
+    python verify_indexes.py --list-id 42
+"""
+import argparse
+import sys
+
+import crud
+import database
+import models
+import pagination
+import schema_check
+
+
+def hot_queries(db, args) -> dict:
+    cursor = pagination.encode_cursor(args.list_id)
+    return {
+        "get_lists": lambda: crud.get_lists(db, skip=0, limit=10),
+        "get_lists_page": lambda: crud.get_lists_page(db, cursor=cursor, limit=10),
+        "get_itineraries": lambda: crud.get_itineraries(db, args.list_id, skip=0, limit=10),
+        "get_itineraries_page": lambda: crud.get_itineraries_page(db, args.list_id, cursor="", limit=10),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list-id", type=int, default=1, help="List id used for the sample queries")
+    args = parser.parse_args()
+
+    problems = []
+    for name, engine in database.registry.engines().items():
+        problems += [f"[{name}] {problem}" for problem in schema_check.missing_indexes(engine, models.Base.metadata)]
+
+    if not problems:
+        # Plans are only meaningful once the schema matches the models
+        db = database.SessionLocal()
+        try:
+            plans = schema_check.explain_queries(database.engine, hot_queries(db, args))
+        finally:
+            db.close()
+        for query, statements in plans.items():
+            print(f"== {query}")
+            for statement, plan in statements:
+                print(" ".join(statement.split()))
+                for line in plan:
+                    print(f"    {line}")
+
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date as Date, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from starlette.concurrency import run_in_threadpool
+
+import crud
+import database
+import models
+
+# Geocodes rarely change; forecasts are refreshed often
+GEOCODE_TTL_SECONDS = float(os.getenv("GEOCODE_TTL_SECONDS", str(30 * 24 * 3600)))
+FORECAST_TTL_SECONDS = float(os.getenv("FORECAST_TTL_SECONDS", "3600"))
+# Forecasts are keyed by coordinates rounded to this many decimals (~1 km at 2)
+FORECAST_COORD_DECIMALS = int(os.getenv("FORECAST_COORD_DECIMALS", "2"))
+# In-memory entries kept per cache before the least recently used are dropped
+CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "10000"))
+# Upstream requests a batch lookup may have in flight at once
+WEATHER_BATCH_CONCURRENCY = int(os.getenv("WEATHER_BATCH_CONCURRENCY", "8"))
+# Longest date span requested from open-meteo in one call
+FORECAST_MAX_RANGE_DAYS = int(os.getenv("FORECAST_MAX_RANGE_DAYS", "16"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Caches values in memory and in the `cache_entries` table so they survive
+    restarts. Concurrent misses for the same key share a single upstream fetch.
+    """
+
+    def __init__(self, namespace: str, ttl: float, max_entries: int = CACHE_MAX_ENTRIES, session_factory=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._session_factory = session_factory or database.SessionLocal
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._memory.get(key)
+        if entry is not None and entry[1] >= time.time():
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        # Another request is already fetching this key; wait for its result
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value, expires_at = await run_in_threadpool(self._load, key)
+            if value is _MISSING:
+                self.misses += 1
+                value = await fetch()
+                expires_at = time.time() + self.ttl
+                await run_in_threadpool(self._save, key, value, expires_at)
+            else:
+                self.persistent_hits += 1
+            self._remember(key, value, expires_at)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else was waiting
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def lookup_many(self, keys: List[str]) -> Dict[str, Any]:
+        """
+        Returns the cached values of `keys` without fetching them: memory first,
+        then the rest from the table in one query. Keys that are not cached are
+        left out of the result and counted as misses.
+        """
+        found = {}
+        now = time.time()
+        unknown = []
+        for key in dict.fromkeys(keys):
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] >= now:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                found[key] = entry[0]
+            else:
+                unknown.append(key)
+        if unknown:
+            loaded = await run_in_threadpool(self._load_many, unknown)
+            for key in unknown:
+                if key in loaded:
+                    value, expires_at = loaded[key]
+                    self.persistent_hits += 1
+                    self._remember(key, value, expires_at)
+                    found[key] = value
+                else:
+                    self.misses += 1
+        return found
+
+    async def put(self, key: str, value: Any):
+        expires_at = time.time() + self.ttl
+        await run_in_threadpool(self._save, key, value, expires_at)
+        self._remember(key, value, expires_at)
+
+    async def put_many(self, values: Dict[str, Any]):
+        """
+        Caches many values, writing them to the table in one transaction.
+        """
+        if not values:
+            return
+        expires_at = time.time() + self.ttl
+        await run_in_threadpool(self._save_many, values, expires_at)
+        for key, value in values.items():
+            self._remember(key, value, expires_at)
+
+    def _remember(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str):
+        db = self._session_factory()
+        try:
+            entry = db.get(models.CacheEntry, (self.namespace, key))
+            if entry is None or entry.expires_at < time.time():
+                return _MISSING, None
+            return json.loads(entry.value), entry.expires_at
+        finally:
+            db.close()
+
+    def _load_many(self, keys: List[str]) -> dict:
+        db = self._session_factory()
+        try:
+            entries = db.query(models.CacheEntry).filter(
+                models.CacheEntry.namespace == self.namespace,
+                models.CacheEntry.key.in_(keys),
+                models.CacheEntry.expires_at >= time.time(),
+            )
+            return {entry.key: (json.loads(entry.value), entry.expires_at) for entry in entries}
+        finally:
+            db.close()
+
+    def _save(self, key: str, value: Any, expires_at: float):
+        # Same upsert as batches, so processes caching one key at once don't collide
+        self._save_many({key: value}, expires_at)
+
+    def _save_many(self, values: Dict[str, Any], expires_at: float):
+        """
+        Writes all values in one multi-row upsert (ON CONFLICT DO UPDATE on
+        SQLite and PostgreSQL, ON DUPLICATE KEY UPDATE on MySQL), so batches
+        caching the same keys at once don't fail; elsewhere rows are merged
+        one by one in a single transaction.
+        """
+        rows = [
+            {"namespace": self.namespace, "key": key, "value": json.dumps(value), "expires_at": expires_at}
+            for key, value in values.items()
+        ]
+        table = models.CacheEntry.__table__
+        db = self._session_factory()
+        try:
+            dialect = db.get_bind().dialect.name
+            if dialect in ("sqlite", "postgresql"):
+                statement = (sqlite if dialect == "sqlite" else postgresql).insert(table)
+                statement = statement.on_conflict_do_update(
+                    index_elements=["namespace", "key"],
+                    set_={"value": statement.excluded.value, "expires_at": statement.excluded.expires_at},
+                )
+                db.execute(statement.values(rows))
+            elif dialect == "mysql":
+                statement = mysql.insert(table)
+                statement = statement.on_duplicate_key_update(
+                    value=statement.inserted.value, expires_at=statement.inserted.expires_at
+                )
+                db.execute(statement.values(rows))
+            else:
+                for row in rows:
+                    db.merge(models.CacheEntry(**row))
+            db.commit()
+        finally:
+            db.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.persistent_hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else None,
+        }
+
+
+geocodes = TTLCache("geocode", GEOCODE_TTL_SECONDS)
+forecasts = TTLCache("forecast", FORECAST_TTL_SECONDS)
+
+# Shared upstream client, created in the app lifespan
+_client: Optional[httpx.AsyncClient] = None
+
+
+def start(client: Optional[httpx.AsyncClient] = None):
+    """
+    Creates the cache table if needed and the pooled client used for upstream calls.
+    """
+    global _client
+    models.CacheEntry.__table__.create(bind=database.engine, checkfirst=True)
+    _client = client or httpx.AsyncClient(
+        timeout=httpx.Timeout(10.0, connect=5.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+        headers={"User-Agent": "business-list-weather/1.0"},
+    )
+
+
+async def close():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_client() -> httpx.AsyncClient:
+    if _client is None:
+        raise RuntimeError("Weather client is not started; is the app lifespan running?")
+    return _client
+
+
+def geocode_key(location: str) -> str:
+    return " ".join(location.lower().split())
+
+
+def forecast_key(latitude: float, longitude: float, date: str) -> str:
+    return f"{round(latitude, FORECAST_COORD_DECIMALS)},{round(longitude, FORECAST_COORD_DECIMALS)},{date}"
+
+
+async def get_lat_lon(location: str, correlation_id: str) -> tuple:
+    latitude, longitude = await geocodes.get_or_fetch(
+        geocode_key(location),
+        lambda: crud.fetch_lat_lon_async(get_client(), location, correlation_id),
+    )
+    return latitude, longitude
+
+
+async def get_weather(location: str, date: str, correlation_id: str) -> str:
+    latitude, longitude = await get_lat_lon(location, correlation_id)
+
+    async def fetch():
+        temperatures = await crud.fetch_weather_range_async(
+            get_client(), latitude, longitude, date, date, correlation_id
+        )
+        return temperatures[date]
+
+    return await forecasts.get_or_fetch(forecast_key(latitude, longitude, date), fetch)
+
+
+def split_date_ranges(dates: List[str]) -> List[List[str]]:
+    """
+    Groups sorted ISO dates into runs that each fit in one open-meteo range request.
+    """
+    groups = []
+    for day in sorted(set(dates)):
+        if groups and Date.fromisoformat(day) - Date.fromisoformat(groups[-1][0]) < timedelta(days=FORECAST_MAX_RANGE_DAYS):
+            groups[-1].append(day)
+        else:
+            groups.append([day])
+    return groups
+
+
+async def get_weather_batch(items: List[tuple], correlation_id: str) -> List[dict]:
+    """
+    Resolves the average temperature for many (location, date) pairs.
+
+    Locations are deduplicated and geocoded concurrently; dates that are not
+    cached are grouped per coordinate into one open-meteo range request. Returns
+    one {"temperature", "error"} dict per item, in input order.
+    """
+    semaphore = asyncio.Semaphore(WEATHER_BATCH_CONCURRENCY)
+    results = [{"temperature": None, "error": None} for _ in items]
+
+    # Step 1: Validate dates and geocode each distinct location once
+    locations = {}
+    for index, (location, day) in enumerate(items):
+        try:
+            Date.fromisoformat(day)
+        except ValueError:
+            results[index]["error"] = "date must be in YYYY-MM-DD format"
+            continue
+        locations.setdefault(geocode_key(location), location)
+
+    async def geocode(location):
+        async with semaphore:
+            return await get_lat_lon(location, correlation_id)
+
+    coordinates = dict(zip(
+        locations,
+        await asyncio.gather(*(geocode(location) for location in locations.values()), return_exceptions=True),
+    ))
+
+    # Step 2: Answer from the forecast cache in one lookup, collecting the misses per coordinate
+    keys = {}  # index -> forecast key
+    for index, (location, day) in enumerate(items):
+        if results[index]["error"]:
+            continue
+        coordinate = coordinates[geocode_key(location)]
+        if isinstance(coordinate, Exception):
+            results[index]["error"] = str(coordinate)
+            continue
+        keys[index] = forecast_key(*coordinate, day)
+    cached = await forecasts.lookup_many(list(keys.values()))
+
+    missing = defaultdict(list)  # (latitude, longitude) -> [index, ...]
+    for index, key in keys.items():
+        if key in cached:
+            results[index]["temperature"] = cached[key]
+        else:
+            missing[tuple(coordinates[geocode_key(items[index][0])])].append(index)
+
+    # Step 3: One range request per coordinate and run of dates
+    async def fetch_range(coordinate, days):
+        async with semaphore:
+            return await crud.fetch_weather_range_async(
+                get_client(), coordinate[0], coordinate[1], days[0], days[-1], correlation_id
+            )
+
+    requests = [
+        (coordinate, days)
+        for coordinate, indexes in missing.items()
+        for days in split_date_ranges([items[i][1] for i in indexes])
+    ]
+    responses = await asyncio.gather(
+        *(fetch_range(coordinate, days) for coordinate, days in requests), return_exceptions=True
+    )
+
+    temperatures = {}
+    for (coordinate, days), response in zip(requests, responses):
+        for day in days:
+            temperatures[(coordinate, day)] = response
+
+    for coordinate, indexes in missing.items():
+        for index in indexes:
+            day = items[index][1]
+            response = temperatures[(coordinate, day)]
+            if isinstance(response, Exception):
+                results[index]["error"] = str(response)
+            elif day not in response:
+                results[index]["error"] = "No forecast available for this date"
+            else:
+                results[index]["temperature"] = response[day]
+
+    # Step 4: Cache what was fetched, in one transaction
+    await forecasts.put_many({
+        forecast_key(*coordinate, day): response[day]
+        for (coordinate, day), response in temperatures.items()
+        if not isinstance(response, Exception) and day in response
+    })
+
+    return results
+
+
+def stats() -> dict:
+    return {"geocode": geocodes.stats(), "forecast": forecasts.stats()}